@@ -0,0 +1,62 @@
+"""
+admin_users_import_http_test
+
+Testing that admin_users_import works with
+http implementation
+"""
+
+
+import requests
+from echo_http_test import url
+from conftest_http import user_a, user_b
+from http_other_functions import http_admin_users_import
+
+
+def test_admin_users_import_success(url, user_a):
+    """
+    Test 1 - Imported users are registered and can log in
+    """
+    rows = [
+        {"email": "jamalmurray@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jamal", "name_last": "Murray"},
+        {"email": "jeffsmith@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jeff", "name_last": "Smith"},
+    ]
+    result = http_admin_users_import(url, user_a["token"], rows).json()
+    assert result == {"u_ids": [2, 3], "errors": []}
+
+    login = requests.post(
+        f"{url}/auth/login", json={"email": "jeffsmith@gmail.com", "password": "w89rfh@fk"}
+    )
+    assert login.json()["u_id"] == 3
+
+    requests.delete(f"{url}/clear")
+
+
+def test_admin_users_import_errors(url, user_a):
+    """
+    Test 2 - A bad row is reported and no user is registered
+    """
+    rows = [
+        {"email": "jamalmurray@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jamal", "name_last": "Murray"},
+        {"email": "jeffsmith", "password": "w89rfh@fk",
+         "name_first": "Jeff", "name_last": "Smith"},
+    ]
+    result = http_admin_users_import(url, user_a["token"], rows).json()
+    assert result == {"u_ids": [], "errors": [{"line": 2, "error": "Email is invalid"}]}
+
+    requests.delete(f"{url}/clear")
+
+
+def test_admin_users_import_not_admin(url, user_a, user_b):
+    """
+    Test 3 - Only an admin can import users
+    """
+    rows = [
+        {"email": "jamalmurray@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jamal", "name_last": "Murray"},
+    ]
+    assert http_admin_users_import(url, user_b["token"], rows).status_code == 400
+
+    requests.delete(f"{url}/clear")
@@ -0,0 +1,102 @@
+"""
+admin_users_import
+
+Takes in parameters `token`, `lines`
+Returns dictionary {u_ids, errors}
+
+Description: Registers every user in a batch of JSON lines, or none of
+them if any line has an error, reporting the error on each of those lines
+
+Exceptions:
+- AccessError - authorised user is not an owner
+"""
+
+
+import json
+import pytest
+from auth import auth_login
+from error import AccessError, InputError
+from other import admin_users_import, clear
+from user import user_profile
+from conftest import user_a, user_b
+
+
+def rows_to_lines(rows):
+    """
+    Returns each row as a line of JSON
+    """
+    return [json.dumps(row) + "\n" for row in rows]
+
+
+def test_admin_users_import_success(user_a):
+    """
+    Test 1 - Every user is registered with a unique handle and can log in
+    """
+    rows = [
+        {"email": "jerrychan@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "jerrychan2@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "kentrell@gmail.com", "password": "youngboynba123",
+         "name_first": "Kentrell", "name_last": "Gaulden"},
+    ]
+    result = admin_users_import(user_a["token"], rows_to_lines(rows))
+    assert result == {"u_ids": [2, 3, 4], "errors": []}
+
+    handles = [
+        user_profile(user_a["token"], u_id)["user"]["handle_str"] for u_id in result["u_ids"]
+    ]
+    assert handles == ["jerrychan", "jerrychan01", "kentrellgaulden01"]
+    assert auth_login("jerrychan2@gmail.com", "w89rfh@fk")["u_id"] == 3
+
+    clear()
+
+
+def test_admin_users_import_errors(user_a):
+    """
+    Test 2 - Each bad row is reported and no user is registered
+    """
+    lines = rows_to_lines([
+        {"email": "jerrychan@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "nbayoungboy@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "jerrychan@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "notanemail", "password": "w89rfh@fk",
+         "name_first": "Jerry", "name_last": "Chan"},
+        {"email": "jamal@gmail.com", "password": "short",
+         "name_first": "Jamal", "name_last": "Murray"},
+        {"email": "jamal@gmail.com", "password": "w89rfh@fk", "name_first": "Jamal"},
+    ])
+    lines.append("{not json\n")
+
+    assert admin_users_import(user_a["token"], lines) == {
+        "u_ids": [],
+        "errors": [
+            {"line": 2, "error": "Email taken by another user"},
+            {"line": 3, "error": "Email taken by another user"},
+            {"line": 4, "error": "Email is invalid"},
+            {"line": 5, "error": "Invalid password; too little characters"},
+            {"line": 6, "error": "Missing name_last"},
+            {"line": 7, "error": "Invalid JSON"},
+        ],
+    }
+    with pytest.raises(InputError, match=r"Email does not belong to a user"):
+        auth_login("jerrychan@gmail.com", "w89rfh@fk")
+
+    clear()
+
+
+def test_admin_users_import_not_admin(user_a, user_b):
+    """
+    Test 3 - Only an admin can import users
+    """
+    lines = rows_to_lines([
+        {"email": "jamal@gmail.com", "password": "w89rfh@fk",
+         "name_first": "Jamal", "name_last": "Murray"},
+    ])
+    with pytest.raises(AccessError, match=r"User is not an admin"):
+        admin_users_import(user_b["token"], lines)
+
+    clear()
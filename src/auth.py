@@ -8,7 +8,6 @@ import hashlib
 import jwt
 import time
 from error import InputError
-from data import DATA
 from auth_helper import (
     check_email_format,
     check_email_unique,
@@ -19,10 +18,15 @@ from auth_helper import (
     create_handle,
     encode_token,
     decode_token,
+    forget_token,
     create_user,
     authenticate,
 )
 from find import find_user_from_token
+from hashing import hash_password
+from locks import USERS_LOCK
+from sessions import start_session, end_session, end_user_sessions
+from store import add_user, set_password, set_reset_code
 
 
 ########################################################################
@@ -44,18 +48,24 @@ def auth_login(email, password):
     # Check email has valid format
     check_email_format(email)
 
-    # Hashing the password
-    password = hashlib.sha256(password.encode()).hexdigest()
-
     # Checks if the email exists and if so the password also matches the user
-    user = authenticate(email, password)
-
+    user, outdated = authenticate(email, password)
     u_id = user["u_id"]
-    # Adding token back to DATA
-    user["token"] = str(u_id)
+
+    # Rehash a password stored with an older KDF now that it is known,
+    # unless it was reset while this login was checking it
+    if outdated:
+        old_hash = user["password"]
+        new_hash = hash_password(password)
+        with USERS_LOCK:
+            if user["password"] == old_hash:
+                set_password(u_id, new_hash)
+
+    # Start a new session, any the user already has carry on
+    session_id = start_session(u_id)
 
     # Generate the unique # for the token
-    token = encode_token(u_id)
+    token = encode_token(session_id)
 
     return {
         "u_id": u_id,
@@ -77,14 +87,11 @@ def auth_logout(token):
     # AccessError if token passed in is not a valid token
     find_user_from_token(decoded_token)
 
-    is_success = False
-    for user in DATA["users"]:
-        if user["token"] == decoded_token:
-            # remove token
-            user["token"] = ""
-            is_success = True
+    # end the token's session
+    end_session(decoded_token)
+    forget_token(token)
 
-    return { "is_success": is_success }
+    return { "is_success": True }
 
 
 def auth_register(email, password, name_first, name_last):
@@ -113,16 +120,21 @@ def auth_register(email, password, name_first, name_last):
     check_name(name_first)
     check_name(name_last)
 
-    # Hashing the password
-    password = hashlib.sha256(password.encode()).hexdigest()
+    # Hashing the password, before taking the lock so registrations
+    # don't wait on each other's hashes
+    password = hash_password(password)
 
-    # All input to register is valid -> add the user to DATA
-    new_user = create_user(email, password, name_first, name_last)
-    DATA["users"].append(new_user)
+    with USERS_LOCK:
+        # Check again, another registration may have taken it meanwhile
+        check_email_unique(email)
+
+        # All input to register is valid -> add the user to DATA
+        new_user = create_user(email, password, name_first, name_last)
+        add_user(new_user)
 
     u_id = new_user["u_id"]
     # Call function to encode token using jwt
-    token = encode_token(u_id)
+    token = encode_token(start_session(u_id))
 
     return {
         "u_id": u_id,
@@ -139,7 +151,7 @@ def auth_passwordreset_request(email):
     # Encode the reset_code to make it more complex
     reset_code = hashlib.sha256(code.encode()).hexdigest()
 
-    user["reset_code"] = reset_code
+    set_reset_code(user["u_id"], reset_code)
 
     # Return reset_code to be sent via email
     return reset_code
@@ -147,14 +159,24 @@ def auth_passwordreset_request(email):
 
 def auth_passwordreset_reset(reset_code, new_password):
     # Check the reset code exists
-    user = check_valid_reset_code(reset_code)
+    check_valid_reset_code(reset_code)
     # Check new password is valid
     check_password(new_password)
 
-    # Encode and set the new password
-    user["password"] = hashlib.sha256(new_password.encode()).hexdigest()
+    # Hash the new password before taking the lock
+    password_hash = hash_password(new_password)
+
+    with USERS_LOCK:
+        # Check again, the code may have been used while hashing
+        user = check_valid_reset_code(reset_code)
+
+        # Set the new password
+        set_password(user["u_id"], password_hash)
+
+        # Invalidate the reset_code
+        set_reset_code(user["u_id"], None)
 
-    # Invalidate the reset_code
-    user["reset_code"] = None
+    # Log the user out everywhere, their old password may have been known
+    end_user_sessions(user["u_id"])
 
     return {}
@@ -4,29 +4,67 @@ helper functions for auth.py and user.py are sourced from here
 """
 
 
+import io
 import jwt
 import re
 import requests
+import threading
+import time
+from collections import OrderedDict
 from error import InputError
 from data import DATA
+from hashing import check_password_hash
+from index import INDEX
 from PIL import Image
+from requests.adapters import HTTPAdapter
 
 
 AUTH_KEY = "grapewindowljwbclwubcixkwdcuiwbsdlxuwscbwlsducbslcbjks"
 
+"""
+tokens that have already been verified, so a client presenting the same
+token on every request only pays for the signature check once in a while
+"""
+global TOKEN_CACHE
+TOKEN_CACHE = {
+    "lock": threading.Lock(),
+    # encoded token -> (decoded token, time it was verified), least
+    # recently used first
+    "entries": OrderedDict(),
+    # Most tokens kept, and how many seconds a verified token is trusted for
+    "size": 4096,
+    "ttl": 300,
+    "hits": 0,
+    "misses": 0,
+}
+
+
+"""
+the session profile photos are fetched through, pooled so uploads reuse
+connections, with timeouts and a cap on how much of an image is read
+"""
+global IMAGE_FETCH
+IMAGE_FETCH = {
+    "session": requests.Session(),
+    # (connect, read) seconds
+    "timeout": (3.05, 10),
+    "max_bytes": 10 * 1024 * 1024,
+}
+IMAGE_FETCH["session"].mount("http://", HTTPAdapter(pool_maxsize=16))
+IMAGE_FETCH["session"].mount("https://", HTTPAdapter(pool_maxsize=16))
+
 
 def check_handle_unique(handle_str):
     """
-    Utilises a loop to check if the handle is already in use
+    Looks the handle up in the handle index to check it isn't already in use
     Parameters:
         handle_str as a string
     Returns:
         (bool): True if handle is unique or raise InputError if not
     """
 
-    for user in DATA["users"]:
-        if user["handle_str"] == handle_str:
-            raise InputError(description="Handle taken by another user")
+    if handle_str in INDEX["users_by_handle"]:
+        raise InputError(description="Handle taken by another user")
 
     return True
 
@@ -71,9 +109,8 @@ def check_email_unique(email):
         (bool): 'True' if the email is unique or raise an InputError if not
     """
     # Check: Email already used
-    for user in DATA["users"]:
-        if user["email"] == email:
-            raise InputError(description="Email taken by another user")
+    if email in INDEX["users_by_email"]:
+        raise InputError(description="Email taken by another user")
 
     return True
 
@@ -108,70 +145,105 @@ def check_name(name):
         raise InputError(description="Name must be between 1 and 50 characters inclusive")
 
 
-def check_valid_http_status(img_url):
+def fetch_image(img_url):
     """
-    Uses requests library to check if the img_url returns a valid HTTP status code
+    Fetches an image once through the pooled session, reading its body
+    only if it is a JPEG, and no more than max_bytes of it
     Parameters:
         img_url (str): url in string form for image
     Return:
-        (bool): 'True' if url returns a valid HTTP status code
+        fetched (dict): status, content_type and body (bytes or None)
     """
-    # Retrieve image from internet
-    payload = requests.get(img_url, stream = True)
+    try:
+        with IMAGE_FETCH["session"].get(
+            img_url, stream=True, timeout=IMAGE_FETCH["timeout"]
+        ) as payload:
+            fetched = {
+                "status": payload.status_code,
+                "content_type": payload.headers.get("Content-Type"),
+                "body": None,
+            }
+            if fetched["status"] != 200 or fetched["content_type"] != "image/jpeg":
+                return fetched
+
+            max_bytes = IMAGE_FETCH["max_bytes"]
+            if int(payload.headers.get("Content-Length") or 0) > max_bytes:
+                raise InputError(description="Image is too large")
+            body = bytearray()
+            for chunk in payload.iter_content(64 * 1024):
+                body += chunk
+                if len(body) > max_bytes:
+                    raise InputError(description="Image is too large")
+            fetched["body"] = bytes(body)
+            return fetched
+    except requests.RequestException as err:
+        raise InputError(description="Image could not be fetched") from err
+
+
+def decode_image(body):
+    """
+    Decodes a fetched JPEG body
+    Parameters:
+        body (bytes)
+    Return:
+        image (Image)
+    """
+    try:
+        image = Image.open(io.BytesIO(body))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as err:
+        raise InputError(description="Image could not be decoded") from err
+    return image
+
 
-    # Check status code
-    if payload.status_code != 200:
+def check_fetched_status(fetched):
+    """
+    Checks that a fetched image came back with status 200
+    Parameters:
+        fetched (dict): as returned by fetch_image
+    Return:
+        (bool): 'True' if the status code is 200
+    """
+    if fetched["status"] != 200:
         raise InputError(description="Invalid HTTP status code")
 
     return True
 
 
-def check_if_jpeg(img_url):
+def check_fetched_jpeg(fetched):
     """
-    Uses requests library to check if the image provided is in JPEG format
+    Checks that a fetched image is in JPEG format
     Parameters:
-        img_url (str): url in string form for image
+        fetched (dict): as returned by fetch_image
     Return:
         (bool): 'True' if the image is a valid format
     """
-    # Retrieve image from internet
-    payload = requests.get(img_url, stream = True)
-
-    # Check image format
-    if payload.headers["Content-Type"] != "image/jpeg":
+    if fetched["content_type"] != "image/jpeg":
         raise InputError(description="Image uploaded is not a JPG")
 
     return True
 
 
-def check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end):
+def check_crop_valid(size, x_start, y_start, x_end, y_end):
     """
-    Uses Image from PIL library as well as requests to find
-    image dimensions and check against user input
+    Checks that the crop lies within an image's dimensions
     Parameters:
-        img_url (str): url in string form for image
+        size (tuple): the image's width and height
         x_start (int)
         y_start (int)
         x_end (int)
         y_end (int)
     Return:
-        (bool): 'True' if the image is a valid format
+        (bool): 'True' if the dimensions are valid
     """
-    # Retrieve image from internet
-    payload = requests.get(img_url, stream = True)
-    payload.raw.decode_content = True
-
-    # Retrieve image dimensions
-    image = Image.open(payload.raw)
-
     error = False
-    if x_start < 0 or x_start >= image.size[0]:
+    if x_start < 0 or x_start >= size[0]:
         error = True
-    elif x_end <= 0 or x_end > image.size[0]:
+    elif x_end <= 0 or x_end > size[0]:
         error = True
-    elif y_start < 0 or y_start >= image.size[1]:
+    elif y_start < 0 or y_start >= size[1]:
         error = True
-    elif y_end <= 0 or y_end > image.size[1]:
+    elif y_end <= 0 or y_end > size[1]:
         error = True
 
     if error == True:
@@ -188,9 +260,9 @@ def check_valid_user_email(email):
     Returns: user from data structure if they exist
     if the email does not belong to any user it will raise an error
     '''
-    for user in DATA["users"]:
-        if user["email"] == email:
-            return user
+    user = INDEX["users_by_email"].get(email)
+    if user:
+        return user
     raise InputError(description="Email does not exist")
 
 
@@ -209,64 +281,128 @@ def check_valid_reset_code(reset_code):
     raise InputError(description="Invalid password reset code")
 
 
-def create_handle(name_first, name_last):
+def base_handle(name_first, name_last):
     """
-    Creates a handle and ensures it is unique
     Parameters:
-        name_first (str): The first name entered by user
-        name_last (str): The last name entered by user
+        name_first (str)
+        name_last (str)
     Returns:
         handle (str): concatentation of a lowercase-only
                       first name and last name cut-off at 20 characters
     """
     handle = name_first.replace(" ", "") + name_last.replace(" ", "")
 
-    # Change handle to all lowercase
-    handle = handle.lower()
+    # Change handle to all lowercase and ensure it is under 20 characters
+    return handle.lower()[:20]
 
-    # Ensure handle is under 20 characters
-    if len(handle) > 20:
-        length = int(len(handle) - 20)
-        handle = handle[:len(handle) - length]
 
-    # Check handle is unique
-    match = 0
-    for user in DATA["users"]:
-        while user["handle_str"] == handle:
-            # Handle already exists for another user
-            match = match + 1
-            # Ensure by adding digits handle won"t exceed 20 characters
-            if len(handle) > 18:
-                length2 = int(len(handle) - 18)
-                handle = handle[:len(handle) - length2]
-            # Removing any digits from handle
-            handle = "".join(filter(lambda character: not character.isdigit(), handle))
-            if match < 10:
-                handle = handle + "0" + str(match)
-            else:
-                handle = handle + str(match)
-
-    return handle
+def create_handle(name_first, name_last):
+    """
+    Creates a handle and ensures it is unique
+    Parameters:
+        name_first (str): The first name entered by user
+        name_last (str): The last name entered by user
+    Returns:
+        handle (str): concatentation of a lowercase-only
+                      first name and last name cut-off at 20 characters,
+                      numbered if another user already has it
+    """
+    return free_handle(
+        base_handle(name_first, name_last), INDEX["users_by_handle"], INDEX["handle_matches"]
+    )
 
 
-def encode_token(uid):
+def free_handle(handle, taken, next_match=None):
     """
-    Returned encoded token to store in DATA structure
+    Finds a free handle for a base handle, numbering it from 01 if it is
+    already taken
+    Parameters:
+        handle (str): lowercase, at most 20 characters
+        taken (mapping): of handles already in use
+        next_match (dict): stem -> number to try first, kept across calls
+            so numbering a batch of the same name doesn't start over each time
+    Returns:
+        handle (str)
     """
-    return jwt.encode({"token": str(uid)}, AUTH_KEY, algorithm="HS256").decode("utf-8")
+    if handle not in taken:
+        return handle
+
+    # Digits are removed and at least two are added, the stem is cut short
+    # to keep it within 20 characters
+    stem = "".join(filter(lambda character: not character.isdigit(), handle[:18]))
+    match = 1 if next_match is None else next_match.get(stem, 1)
+    while True:
+        suffix = f"{match:02d}"
+        handle = stem[:20 - len(suffix)] + suffix
+        match = match + 1
+        if handle not in taken:
+            if next_match is not None:
+                next_match[stem] = match
+            return handle
+
+
+def encode_token(session_id):
+    """
+    Returns the token handed to the user for a session, the signed session_id
+    """
+    return jwt.encode({"token": str(session_id)}, AUTH_KEY, algorithm="HS256").decode("utf-8")
 
 
 def decode_token(encoded_token):
     """
-    Returns decoded token
+    Returns decoded token, from the token cache if it was verified recently
+    """
+    encoded_token = str(encoded_token)
+    now = time.monotonic()
+    entries = TOKEN_CACHE["entries"]
+    with TOKEN_CACHE["lock"]:
+        entry = entries.get(encoded_token)
+        if entry is not None and now - entry[1] < TOKEN_CACHE["ttl"]:
+            entries.move_to_end(encoded_token)
+            TOKEN_CACHE["hits"] += 1
+            return entry[0]
+        TOKEN_CACHE["misses"] += 1
+
+    decoded_token = verify_token(encoded_token)
+    # Invalid tokens aren't kept, so junk can't push valid tokens out
+    if decoded_token != "not_a_token":
+        with TOKEN_CACHE["lock"]:
+            entries[encoded_token] = (decoded_token, now)
+            entries.move_to_end(encoded_token)
+            while len(entries) > TOKEN_CACHE["size"]:
+                entries.popitem(last=False)
+    return decoded_token
+
+
+def verify_token(encoded_token):
+    """
+    Checks the token's signature and returns the decoded token
     """
     try:
-        structure = jwt.decode(str(encoded_token).encode("utf-8"), AUTH_KEY, algorithms=["HS256"])
+        structure = jwt.decode(encoded_token.encode("utf-8"), AUTH_KEY, algorithms=["HS256"])
         return str(structure["token"])
     except:
         return "not_a_token"
 
 
+def forget_token(encoded_token):
+    """
+    Drops a token from the token cache, once it has been logged out
+    """
+    with TOKEN_CACHE["lock"]:
+        TOKEN_CACHE["entries"].pop(str(encoded_token), None)
+
+
+def clear_token_cache():
+    """
+    Empties the token cache and resets its counters
+    """
+    with TOKEN_CACHE["lock"]:
+        TOKEN_CACHE["entries"].clear()
+        TOKEN_CACHE["hits"] = 0
+        TOKEN_CACHE["misses"] = 0
+
+
 def create_user(email, password, name_first, name_last):
     """
     Creates a user and returns all information about a new user in a dictionary
@@ -275,9 +411,8 @@ def create_user(email, password, name_first, name_last):
         password (str): password entered by user
         name_first (str): first name entered by user
         name_last (str): last name entered by user
-    Returns: new_user (dictionary of parameters + token, u_id, handle)
+    Returns: new_user (dictionary of parameters + u_id, handle)
         u_id (int)
-        token (str)
         handle (str): concatentation of a lowercase-only first name and last name
     """
     handle = create_handle(name_first, name_last)
@@ -296,7 +431,6 @@ def create_user(email, password, name_first, name_last):
         "name_first": name_first,
         "name_last": name_last,
         "u_id": (index+1),
-        "token": str(index+1),
         "handle_str": handle,
         "permission_id": p_id,
         "user_message_id": [],
@@ -313,14 +447,16 @@ def authenticate(email, password):
     Parameters:
         email (str): entered by user
         password (str): entered by user
-    Returns: (dict)
+    Returns: (tuple)
         user (dict): if the password is valid or
         - raises InputError if not valid password/email
+        outdated (bool): True if the user's password hash should be redone
     """
-    for user in DATA["users"]:
-        if user["email"] == email:
-            if user["password"] != password:
-                raise InputError(description="Incorrect password")
-            return user
+    user = INDEX["users_by_email"].get(email)
+    if user:
+        matches, outdated = check_password_hash(password, user["password"])
+        if not matches:
+            raise InputError(description="Incorrect password")
+        return user, outdated
     # No user was found with email
     raise InputError(description="Email does not belong to a user")
@@ -44,10 +44,10 @@ def test_login_logout_loop_http(url, user_c):
     http_auth_logout(url, user_c["token"])
     
     # Log back in again 
-    http_auth_login(url, "jamalmurray27@gmail.com", "NuggetsInFive41")
+    token = http_auth_login(url, "jamalmurray27@gmail.com", "NuggetsInFive41").json()["token"]
 
     # Logout
-    payload = http_auth_logout(url, user_c["token"])
+    payload = http_auth_logout(url, token)
     user_c_logout = payload.json()
     
     assert user_c_logout == {"is_success" : True}
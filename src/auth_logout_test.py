@@ -11,6 +11,8 @@ Description: Given an active token, invalidates the token to log the user out.
 
 import pytest
 from auth import auth_register, auth_login, auth_logout
+from auth_helper import TOKEN_CACHE
+from user import user_profile
 from other import clear
 from error import AccessError
 
@@ -43,13 +45,11 @@ def testlogin_logout_loop():
     auth_logout(token_2)
 
     # Logging in and out first time
-    auth_login("jamalmurray27@gmail.com", "NuggetsInFive41")
-    token_2 = user_b["token"]
+    token_2 = auth_login("jamalmurray27@gmail.com", "NuggetsInFive41")["token"]
     auth_logout(token_2)
 
     # Logging in and out second time
-    auth_login("jamalmurray27@gmail.com", "NuggetsInFive41")
-    token_2 = user_b["token"]
+    token_2 = auth_login("jamalmurray27@gmail.com", "NuggetsInFive41")["token"]
     assert auth_logout(token_2) == {"is_success": True}
 
     # Token now invalidated -> raise error
@@ -89,3 +89,24 @@ def test_logout_empty_token():
         auth_logout(" ")
 
     clear()
+
+
+def test_logout_cached_token():
+    """
+    Test 5 - A token that was verified from the cache is rejected once logged out
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_profile(user_a["token"], user_a["u_id"])
+    user_profile(user_a["token"], user_a["u_id"])
+    assert TOKEN_CACHE["hits"] >= 1
+    assert user_a["token"] in TOKEN_CACHE["entries"]
+
+    auth_logout(user_a["token"])
+    assert user_a["token"] not in TOKEN_CACHE["entries"]
+
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        user_profile(user_a["token"], user_a["u_id"])
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        auth_logout(user_a["token"])
+
+    clear()
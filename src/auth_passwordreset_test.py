@@ -32,7 +32,7 @@ def test_passwordreset_request_success(user_a):
     reset_check = auth_login("nbayoungboy@gmail.com", "youngboynba321")
 
     # Assert the user has been able to log in 
-    assert reset_check == {"u_id": user_a["u_id"] , "token": user_a["token"]}
+    assert reset_check["u_id"] == user_a["u_id"]
 
     clear()
 
@@ -55,7 +55,7 @@ def test_password_reset_success_2(user_a, user_b):
     reset_check = auth_login("jerrychan@gmail.com", "w89rfh@fk69")
 
     # Assert the user has been able to log in
-    assert reset_check == {"u_id": user_b["u_id"], "token": user_b["token"]}
+    assert reset_check["u_id"] == user_b["u_id"]
 
     clear()
 
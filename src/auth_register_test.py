@@ -19,7 +19,7 @@ InputError should occur when:
 import pytest
 from auth import auth_register
 from error import InputError
-from user import user_profile
+from user import user_profile, user_profile_sethandle
 from other import users_all
 from other import clear
 
@@ -172,6 +172,26 @@ def test_handle_duplicate_large():
     clear()
 
 
+def test_handle_duplicate_taken():
+    """
+    Test 5.3 - Check handle numbering skips handles users have set themselves
+    """
+    user_a = auth_register("h@gmail.com", "password0", "John", "Smith")
+    user_profile_sethandle(user_a["token"], "johnsmith01")
+    user_b = auth_register("h1@gmail.com", "password1", "John", "Smith")
+    assert user_profile(user_b["token"], user_b["u_id"])["user"]["handle_str"] == "johnsmith"
+    user_c = auth_register("h2@gmail.com", "password2", "John", "Smith")
+    assert user_profile(user_c["token"], user_c["u_id"])["user"]["handle_str"] == "johnsmith02"
+
+    # A handle freed by a change of handle can be taken again
+    user_profile_sethandle(user_b["token"], "jsmith")
+    user_profile_sethandle(user_c["token"], "johnsmith")
+    with pytest.raises(InputError, match=r"Handle taken by another user"):
+        user_profile_sethandle(user_a["token"], "johnsmith")
+
+    clear()
+
+
 #InputError Tests
 
 # Tests 6: Email Cases
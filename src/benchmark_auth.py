@@ -0,0 +1,54 @@
+"""
+benchmark_auth.py
+compares the cost of authenticating a request when its token is verified
+by PyJWT every time against when it is found in the token cache, as it is
+for a client presenting the same token on every request
+
+Run from the repo root with: python3 src/benchmark_auth.py
+"""
+
+
+from timeit import timeit
+from auth import auth_register
+from auth_helper import TOKEN_CACHE, decode_token, verify_token
+from find import find_user_from_token
+from other import clear
+
+
+REQUESTS = 100000
+
+
+def authenticate_uncached(token):
+    """
+    Authenticates a request the way every request was before the token cache
+    """
+    return find_user_from_token(verify_token(token))
+
+
+def authenticate_cached(token):
+    """
+    Authenticates a request through the token cache
+    """
+    return find_user_from_token(decode_token(token))
+
+
+def run_benchmark():
+    """
+    Prints microseconds per request, and the cache's hits and misses
+    """
+    clear()
+    token = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")["token"]
+
+    uncached = timeit(lambda: authenticate_uncached(token), number=REQUESTS)
+    cached = timeit(lambda: authenticate_cached(token), number=REQUESTS)
+
+    print(f"{'':>9} {'us/request':>11}")
+    print(f"{'uncached':>9} {uncached / REQUESTS * 1e6:>11.2f}")
+    print(f"{'cached':>9} {cached / REQUESTS * 1e6:>11.2f}")
+    print(f"\n{uncached / cached:.1f}x faster, "
+          f"{TOKEN_CACHE['hits']} hits, {TOKEN_CACHE['misses']} misses")
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
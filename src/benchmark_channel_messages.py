@@ -0,0 +1,60 @@
+"""
+benchmark_channel_messages.py
+times channel_messages as a channel's history grows, a page should
+cost the same no matter how many messages came before it, and so should
+removing one of the oldest messages
+
+Run from the repo root with: python3 src/benchmark_channel_messages.py
+"""
+
+
+from timeit import timeit
+from auth import auth_register
+from channel import channel_messages
+from channels import channels_create
+from message import message_send, message_remove
+from other import clear
+
+
+SIZES = (1000, 10000, 100000)
+REPEAT = 200
+REMOVES = 100
+
+
+def run_benchmark():
+    """
+    Fills a channel up to each size and times fetching a page from the
+    start, middle and end of its history, then removing the oldest messages
+    """
+    clear()
+    token = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")["token"]
+    c_id = channels_create(token, "benchmark", True)["channel_id"]
+
+    m_ids = []
+    print(f"{'messages':>10} {'start':>10} {'usec/page':>10}")
+    for size in SIZES:
+        while len(m_ids) < size:
+            m_ids.append(message_send(token, c_id, f"message {len(m_ids)}")["message_id"])
+
+        for start in (0, size // 2, size - 50):
+            seconds = timeit(lambda: channel_messages(token, c_id, start), number=REPEAT)
+            print(f"{size:>10} {start:>10} {seconds / REPEAT * 1e6:>10.1f}")
+
+    print(f"{'messages':>10} {'usec/remove':>12}")
+    for size in SIZES:
+        clear()
+        token = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")["token"]
+        c_id = channels_create(token, "benchmark", True)["channel_id"]
+        m_ids = [message_send(token, c_id, "message")["message_id"] for _ in range(size)]
+        # Oldest first, the furthest from the end of every list they are in.
+        # The first removal builds each list's positions, so is left untimed
+        oldest = iter(m_ids)
+        message_remove(token, next(oldest))
+        seconds = timeit(lambda: message_remove(token, next(oldest)), number=REMOVES)
+        print(f"{size:>10} {seconds / REMOVES * 1e6:>12.1f}")
+
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,70 @@
+"""
+benchmark_etag.py
+Requests per second for the read-heavy routes when a client fetches an
+unchanged resource in full, against when it sends the ETag of its copy
+and is answered 304 Not Modified
+
+Run from the repo root with: python3 src/benchmark_etag.py
+"""
+
+
+import time
+from auth import auth_register
+from channel import channel_join
+from channels import channels_create
+from other import clear
+from server import APP
+
+
+MEMBERS = 500
+CHANNELS = 200
+REQUESTS = 2000
+
+
+def rate(client, route, params, headers):
+    """
+    Returns:
+        (float): requests per second for REQUESTS requests of the route
+    """
+    began = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get(route, query_string=params, headers=headers)
+    assert response.status_code == (304 if headers else 200)
+    return REQUESTS / (time.perf_counter() - began)
+
+
+def run_benchmark():
+    """
+    Prints requests per second for each route, both ways
+    """
+    clear()
+    owner = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")
+    channel_id = channels_create(owner["token"], "bench", True)["channel_id"]
+    for i in range(1, CHANNELS):
+        channels_create(owner["token"], f"bench {i}", True)
+    for i in range(MEMBERS):
+        token = auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", "Mark")["token"]
+        channel_join(token, channel_id)
+
+    token = owner["token"]
+    routes = [
+        ("/channel/details", {"token": token, "channel_id": channel_id}),
+        ("/channels/list", {"token": token}),
+        ("/channels/listall", {"token": token}),
+        ("/users/all", {"token": token}),
+        ("/user/profile", {"token": token, "u_id": owner["u_id"]}),
+    ]
+
+    client = APP.test_client()
+    print(f"{MEMBERS} members, {CHANNELS} channels, {REQUESTS} requests each")
+    print(f"{'':>18} {'full req/s':>11} {'304 req/s':>11}")
+    for route, params in routes:
+        etag = client.get(route, query_string=params).headers["ETag"]
+        full = rate(client, route, params, None)
+        cached = rate(client, route, params, {"If-None-Match": etag})
+        print(f"{route:>18} {full:>11.0f} {cached:>11.0f}")
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
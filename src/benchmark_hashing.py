@@ -0,0 +1,94 @@
+"""
+benchmark_hashing.py
+a burst of logins at once, with the KDF run on each request thread against
+it run in the hashing pool, reporting login latency percentiles and how
+deep the pool's queue got
+
+Run from the repo root with: python3 src/benchmark_hashing.py
+"""
+
+
+import hmac
+import threading
+import time
+from auth import auth_login, auth_register
+from hashing import derive, parse_hash, queue_depth
+from index import INDEX
+from other import clear
+from sessions import start_session
+
+
+BURSTS = (8, 64, 256)
+PASSWORD = "benchmark"
+
+
+def inline_login(email, password):
+    """
+    Logs in running the KDF on the calling thread, as it would be without the pool
+    """
+    user = INDEX["users_by_email"][email]
+    kdf, params, salt, key = parse_hash(user["password"])
+    assert hmac.compare_digest(derive(kdf, params, password, salt), key)
+    return start_session(user["u_id"])
+
+
+def pool_login(email, password):
+    """
+    Logs in through auth_login, which runs the KDF in the pool
+    """
+    return auth_login(email, password)
+
+
+def burst(login, logins):
+    """
+    Starts logins threads at once
+    Returns:
+        latencies (list): seconds each login took, sorted
+    """
+    latencies = []
+    start = threading.Barrier(logins)
+
+    def run(i):
+        start.wait()
+        began = time.perf_counter()
+        login(f"bench{i % 8}@gmail.com", PASSWORD)
+        latencies.append(time.perf_counter() - began)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(logins)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def percentile(latencies, fraction):
+    """
+    Returns:
+        (float): milliseconds
+    """
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+
+def run_benchmark():
+    """
+    Prints p50 and p99 login latency for each burst size, both ways
+    """
+    clear()
+    for i in range(8):
+        auth_register(f"bench{i}@gmail.com", PASSWORD, "Bench", "Mark")
+
+    print(f"{'logins':>7} {'mode':>7} {'p50 ms':>8} {'p99 ms':>8} {'max queued':>11}")
+    for logins in BURSTS:
+        for mode, login in (("inline", inline_login), ("pool", pool_login)):
+            latencies = burst(login, logins)
+            queued = queue_depth()["max_waiting"] if mode == "pool" else "-"
+            print(
+                f"{logins:>7} {mode:>7} {percentile(latencies, 0.5):>8.1f} "
+                f"{percentile(latencies, 0.99):>8.1f} {queued:>11}"
+            )
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
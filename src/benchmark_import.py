@@ -0,0 +1,77 @@
+"""
+benchmark_import.py
+registering a batch of users one auth_register at a time against importing
+them in one admin_users_import, reporting users per second. Both run with
+a cheap KDF so the figures show the checks and the commit, the hashing
+throughput at the real KDF cost is measured separately on a sample
+
+Run from the repo root with: python3 src/benchmark_import.py
+"""
+
+
+import json
+import time
+from auth import auth_register
+from hashing import HASHING, hash_passwords, stop_pool
+from other import admin_users_import, clear
+
+
+IMPORTED = 100000
+REGISTERED = 2000
+SURNAMES = ("Mark", "Chan", "Smith", "Murray", "Jones")
+HASHED = 32
+
+
+def rows(count):
+    """
+    Returns count users as JSON lines, with a few names shared so handles collide
+    """
+    return [
+        json.dumps({
+            "email": f"bench{i}@gmail.com",
+            "password": "benchmark",
+            "name_first": "Bench",
+            "name_last": SURNAMES[i % len(SURNAMES)],
+        }) + "\n"
+        for i in range(count)
+    ]
+
+
+def run_benchmark():
+    """
+    Prints users per second registering one at a time and importing
+    """
+    params = HASHING["params"]["scrypt"]
+    HASHING["params"]["scrypt"] = (2 ** 2, 1, 1)
+    try:
+        clear()
+        token = auth_register("admin@gmail.com", "benchmark", "Ad", "Min")["token"]
+        began = time.perf_counter()
+        for i in range(REGISTERED):
+            auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", SURNAMES[i % len(SURNAMES)])
+        registered = REGISTERED / (time.perf_counter() - began)
+
+        clear()
+        token = auth_register("admin@gmail.com", "benchmark", "Ad", "Min")["token"]
+        lines = rows(IMPORTED)
+        began = time.perf_counter()
+        result = admin_users_import(token, lines)
+        imported = IMPORTED / (time.perf_counter() - began)
+        assert len(result["u_ids"]) == IMPORTED
+    finally:
+        HASHING["params"]["scrypt"] = params
+
+    began = time.perf_counter()
+    hash_passwords(["benchmark"] * HASHED)
+    hashed = HASHED / (time.perf_counter() - began)
+
+    print(f"{'':>28} {'users/s':>9}")
+    print(f"{f'auth_register x{REGISTERED}':>28} {registered:>9.0f}")
+    print(f"{f'admin_users_import x{IMPORTED}':>28} {imported:>9.0f}")
+    print(f"{'real KDF hashing':>28} {hashed:>9.0f}  ({HASHING['workers']} workers)")
+    clear()
+    stop_pool()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,144 @@
+"""
+benchmark_journal.py
+measures journaled write throughput with group commit, and how long
+replaying a journal of millions of records takes
+
+Run from the repo root with: python3 src/benchmark_journal.py
+"""
+
+
+import json
+import os
+import tempfile
+import threading
+import time
+from copy import deepcopy
+from journal import JOURNAL, open_journal, close_journal, replay_journal
+from message import send_message
+from other import clear
+from store import add_user, add_channel, add_member, allocate_message_id
+
+
+WRITERS = (1, 4, 16)
+WRITES_PER_WRITER = 2000
+REPLAY_SIZES = (100000, 1000000)
+USER = {
+    "email": "bench@gmail.com",
+    "password": "",
+    "reset_code": None,
+    "name_first": "Bench",
+    "name_last": "Mark",
+    "u_id": 1,
+    "handle_str": "benchmark",
+    "permission_id": 1,
+    "user_message_id": [],
+    "profile_img_url": None,
+}
+CHANNEL = {
+    "all_members": [],
+    "channel_id": 1,
+    "is_public": True,
+    "messages": [],
+    "name": "benchmark",
+    "owner_members": [],
+}
+
+
+def seed():
+    """
+    Adds a user and a channel for the benchmark messages to go to
+    """
+    add_user(deepcopy(USER))
+    add_channel(deepcopy(CHANNEL))
+    add_member(1, 1)
+
+
+def write_throughput(path, writers):
+    """
+    Has each writer thread send messages through the journal at once
+    Returns:
+        (records per second, records per fsync)
+    """
+    clear()
+    if os.path.exists(path):
+        os.remove(path)
+    open_journal(path)
+    seed()
+
+    def writer():
+        for _ in range(WRITES_PER_WRITER):
+            send_message(1, 1, "Throw it out the window", allocate_message_id())
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    commits = JOURNAL["commits"]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    records = 2 * writers * WRITES_PER_WRITER
+    commits = JOURNAL["commits"] - commits
+    close_journal()
+    return records / seconds, records / commits
+
+
+def write_journal(path, size):
+    """
+    Writes a journal of size records straight to disk: a user, a channel
+    and then messages with every tenth one edited and reacted to
+    """
+    with open(path, "w") as journal_file:
+        journal_file.write(json.dumps(["user", USER], separators=(",", ":")) + "\n")
+        journal_file.write(json.dumps(["channel", CHANNEL], separators=(",", ":")) + "\n")
+        written = 2
+        m_id = 1
+        while written < size:
+            message = {
+                "message_id": m_id,
+                "u_id": 1,
+                "message": f"message number {m_id}",
+                "time_created": 1605000000 + m_id,
+                "reacts": [{"react_id": 1, "u_ids": [], "is_this_user_reacted": False}],
+                "is_pinned": False,
+            }
+            lines = [
+                json.dumps(["message_id"]) + "\n",
+                json.dumps(["message", message, 1], separators=(",", ":")) + "\n",
+            ]
+            if m_id % 10 == 0:
+                lines.append(json.dumps(["edit", m_id, f"edited {m_id}"]) + "\n")
+                lines.append(json.dumps(["react", m_id, 1]) + "\n")
+            journal_file.writelines(lines)
+            written += len(lines)
+            m_id += 1
+
+
+def run_benchmark():
+    """
+    Prints write throughput for each number of writers, then replay time
+    for each journal size
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flockr.journal")
+
+        print(f"{'writers':>8} {'records/s':>12} {'records/fsync':>14}")
+        for writers in WRITERS:
+            per_second, per_commit = write_throughput(path, writers)
+            print(f"{writers:>8} {per_second:>12.0f} {per_commit:>14.1f}")
+
+        print(f"\n{'records':>10} {'MB':>8} {'replay s':>10} {'records/s':>12}")
+        for size in REPLAY_SIZES:
+            write_journal(path, size)
+            clear()
+            start = time.perf_counter()
+            replay_journal(path)
+            seconds = time.perf_counter() - start
+            megabytes = os.path.getsize(path) / 1e6
+            print(f"{size:>10} {megabytes:>8.1f} {seconds:>10.2f} {size / seconds:>12.0f}")
+            clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,80 @@
+"""
+benchmark_json.py
+Time spent serialising the largest route responses, users_all,
+channels_listall, channel_messages and channel_details, with the json
+module as the routes used to, and with each encoder in encoder.py
+
+Run from the repo root with: python3 src/benchmark_json.py
+"""
+
+
+import json
+import time
+from auth import auth_register
+from channel import channel_details, channel_join, channel_messages
+from channels import channels_create, channels_listall
+from encoder import ENCODERS
+from hashing import HASHING
+from message import message_send
+from other import clear, users_all
+
+
+USERS = 2000
+CHANNELS = 2000
+MESSAGES = 50
+REPEATS = 200
+
+
+def timed(serialise, data):
+    """
+    Returns:
+        (float): microseconds to serialise data once, the best of REPEATS runs
+    """
+    best = float("inf")
+    for _ in range(REPEATS):
+        began = time.perf_counter()
+        serialise(data)
+        best = min(best, time.perf_counter() - began)
+    return best * 1e6
+
+
+def run_benchmark():
+    """
+    Prints microseconds per response for each route and encoder
+    """
+    clear()
+    # Registering is only setup here, so passwords are hashed cheaply
+    params = HASHING["params"]["scrypt"]
+    HASHING["params"]["scrypt"] = (2 ** 2, 1, 1)
+    try:
+        owner = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")["token"]
+        channel_id = channels_create(owner, "bench", True)["channel_id"]
+        for i in range(1, CHANNELS):
+            channels_create(owner, f"bench {i}", True)
+        for i in range(USERS):
+            token = auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", "Mark")["token"]
+            channel_join(token, channel_id)
+    finally:
+        HASHING["params"]["scrypt"] = params
+    for i in range(MESSAGES):
+        message_send(owner, channel_id, f"message {i} ✓")
+
+    responses = {
+        "users/all": users_all(owner),
+        "channels/listall": channels_listall(owner),
+        "channel/messages": channel_messages(owner, channel_id, 0),
+        "channel/details": channel_details(owner, channel_id),
+    }
+    serialisers = {"dumps": lambda data: json.dumps(data).encode(), **ENCODERS}
+
+    print(f"{USERS} users, {CHANNELS} channels, {MESSAGES} messages, best of {REPEATS}")
+    print(f"{'':>17} {'bytes':>8}" + "".join(f" {name + ' us':>10}" for name in serialisers))
+    for route, data in responses.items():
+        size = len(json.dumps(data))
+        times = [timed(serialise, data) for serialise in serialisers.values()]
+        print(f"{route:>17} {size:>8}" + "".join(f" {taken:>10.0f}" for taken in times))
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
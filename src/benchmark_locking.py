@@ -0,0 +1,166 @@
+"""
+benchmark_locking.py
+stress test of many threads sending messages at once, comparing the
+per-channel locks with one global lock held around every request,
+and checking no message or message_id is lost or duplicated either way
+
+Each workload is run with messages journaled, as on a server run with
+FLOCKR_JOURNAL, and without. Journaled, each request waits for its message
+to be fsynced. Under one global lock the waits queue up behind each
+other; with per-channel locks requests to different channels share
+fsyncs. Every change is still applied under the journal's lock, journal
+or not, so without a journal there are no fsyncs to share and the
+per-channel locks gain next to nothing.
+
+Run from the repo root with: python3 src/benchmark_locking.py
+"""
+
+
+import os
+import tempfile
+import threading
+import time
+from auth import auth_register
+from channel import channel_join
+from channels import channels_create
+from data import DATA
+from journal import open_journal, close_journal
+from message import message_send, message_react
+from other import clear
+
+
+THREADS = (1, 4, 16)
+SENDS_PER_THREAD = 500
+GLOBAL_LOCK = threading.Lock()
+
+
+def global_lock(function, *args):
+    """
+    Runs a request under the one global lock
+    """
+    with GLOBAL_LOCK:
+        return function(*args)
+
+
+def no_lock(function, *args):
+    """
+    Runs a request relying on the locks in the request itself
+    """
+    return function(*args)
+
+
+def register(threads):
+    """
+    Registers a user per thread
+    Returns:
+        tokens (list)
+    """
+    return [
+        auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", "Mark")["token"]
+        for i in range(threads)
+    ]
+
+
+def run_threads(threads, work):
+    """
+    Runs work(i) on threads threads at once
+    Returns:
+        seconds (float)
+    """
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+def check_no_lost_updates(channel_ids, sends):
+    """
+    Checks every message sent arrived exactly once with its own message_id
+    """
+    m_ids = [message["message_id"] for message in DATA["message_log"]["messages"]]
+    assert len(m_ids) == sends
+    assert len(set(m_ids)) == sends
+    assert DATA["message_log"]["msg_counter"] == sends + 1
+    channel_messages = [m_id for c_id in channel_ids for m_id in DATA["channels"][c_id - 1]["messages"]]
+    assert sorted(channel_messages) == sorted(m_ids)
+
+
+def separate_channels(path, threads, run):
+    """
+    Each thread sends to its own channel, journaling to path unless it is None
+    Returns:
+        requests per second (float)
+    """
+    clear()
+    if path:
+        open_journal(path)
+    tokens = register(threads)
+    channel_ids = [channels_create(token, "bench", True)["channel_id"] for token in tokens]
+
+    def work(i):
+        for _ in range(SENDS_PER_THREAD):
+            run(message_send, tokens[i], channel_ids[i], "Throw it out the window")
+
+    seconds = run_threads(threads, work)
+    if path:
+        close_journal()
+    check_no_lost_updates(channel_ids, threads * SENDS_PER_THREAD)
+    return threads * SENDS_PER_THREAD / seconds
+
+
+def shared_channel(path, threads, run):
+    """
+    Every thread sends to the same channel and reacts to its own messages,
+    journaling to path unless it is None
+    Returns:
+        requests per second (float)
+    """
+    clear()
+    if path:
+        open_journal(path)
+    tokens = register(threads)
+    c_id = channels_create(tokens[0], "bench", True)["channel_id"]
+    for token in tokens[1:]:
+        channel_join(token, c_id)
+
+    def work(i):
+        for _ in range(SENDS_PER_THREAD // 2):
+            m_id = run(message_send, tokens[i], c_id, "I like trains")["message_id"]
+            run(message_react, tokens[i], m_id, 1)
+
+    seconds = run_threads(threads, work)
+    if path:
+        close_journal()
+    sends = threads * (SENDS_PER_THREAD // 2)
+    check_no_lost_updates([c_id], sends)
+    assert all(len(message["reacts"][0]["u_ids"]) == 1 for message in DATA["message_log"]["messages"])
+    return 2 * sends / seconds
+
+
+def run_benchmark():
+    """
+    Prints requests per second under each locking model for each workload,
+    with the journal on and off
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        journal_path = os.path.join(directory, "flockr.journal")
+        for name, workload in (("a channel each", separate_channels), ("one channel", shared_channel)):
+            for journal, path in (("journal on", journal_path), ("journal off", None)):
+                print(f"{name}, {journal}")
+                print(f"{'threads':>8} {'global req/s':>13} {'per-channel req/s':>18}")
+                for threads in THREADS:
+                    global_rate = workload(path, threads, global_lock)
+                    if path:
+                        os.remove(path)
+                    fine_rate = workload(path, threads, no_lock)
+                    if path:
+                        os.remove(path)
+                    print(f"{threads:>8} {global_rate:>13.0f} {fine_rate:>18.0f}")
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
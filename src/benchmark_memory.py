@@ -0,0 +1,101 @@
+"""
+benchmark_memory.py
+measures with tracemalloc how many bytes each message and user
+takes as the dicts DATA used to hold against the records it holds now,
+and how many bytes each message costs once stored with its indexes
+
+Run from the repo root with: python3 src/benchmark_memory.py
+"""
+
+
+import tracemalloc
+from benchmark_journal import seed
+from message import send_message
+from other import clear
+from records import User, Message
+from store import allocate_message_id
+
+
+COUNT = 100000
+
+
+def message_dict(m_id):
+    """
+    A message as DATA used to hold it
+    """
+    return {
+        "message_id": m_id,
+        "u_id": 1,
+        "message": "Throw it out the window",
+        "time_created": 1605000000 + m_id,
+        "reacts": [{"react_id": 1, "u_ids": [], "is_this_user_reacted": False}],
+        "is_pinned": False,
+    }
+
+
+def user_dict(u_id):
+    """
+    A user as DATA used to hold it
+    """
+    return {
+        "email": f"user{u_id}@gmail.com",
+        "password": "0" * 64,
+        "reset_code": None,
+        "name_first": "Kentrell",
+        "name_last": "Gaulden",
+        "u_id": u_id,
+        "handle_str": f"kentrellgaulden{u_id}",
+        "permission_id": 2,
+        "user_message_id": [],
+        "profile_img_url": None,
+    }
+
+
+def bytes_each(make):
+    """
+    Returns:
+        (float): bytes allocated per object made by make(i), kept alive
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    kept = [make(i) for i in range(1, COUNT + 1)]
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del kept
+    return used / COUNT
+
+
+def bytes_per_stored_message():
+    """
+    Returns:
+        (float): bytes per message sent through the store, including the
+            message_id lists and every index entry, search postings too
+    """
+    clear()
+    seed()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for _ in range(COUNT):
+        send_message(1, 1, "Throw it out the window", allocate_message_id())
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    clear()
+    return used / COUNT
+
+
+def run_benchmark():
+    """
+    Prints bytes per object as dicts and as records
+    """
+    rows = (
+        ("message", message_dict, lambda i: Message.from_dict(message_dict(i))),
+        ("user", user_dict, lambda i: User.from_dict(user_dict(i))),
+    )
+    print(f"{'':>8} {'dict bytes':>11} {'record bytes':>13}")
+    for name, make_dict, make_record in rows:
+        print(f"{name:>8} {bytes_each(make_dict):>11.0f} {bytes_each(make_record):>13.0f}")
+    print(f"\nstored message, with indexes: {bytes_per_stored_message():.0f} bytes")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,142 @@
+"""
+benchmark_search.py
+compares search through the trigram index against scanning the message
+log, the scan grows with the log while the index grows with the
+number of results
+
+With one user every message is the caller's. With many users, search is
+also compared against the scan it replaced, which walks the whole log for
+each of the caller's messages, and a common query matches far more of
+everyone's messages than of the caller's
+
+Run from the repo root with: python3 src/benchmark_search.py
+"""
+
+
+import random
+import time
+from timeit import timeit
+from auth import auth_register, decode_token
+from channels import channels_create
+from data import DATA
+from find import find_uid_from_token
+from message import send_message
+from other import clear, search
+
+
+SIZES = (100000, 1000000)
+# Many users share the log, it is kept small for the search being replaced
+USERS = 100
+MULTI_SIZES = (20000, 100000)
+REPEAT = 5
+WORDS = (
+    "throw it out the window billionaire records grapefruit standup channel "
+    "meeting lunch deploy review merge branch release notes tomorrow today"
+).split()
+QUERIES = ("zebracorn", "billionaire records", "window")
+
+
+def scan_search(token, query_str):
+    """
+    Searches by testing every message in the log once, cheaper than the
+    search being replaced, so it can run on large logs
+    """
+    u_id = find_uid_from_token(decode_token(token))
+    return [
+        message for message in DATA["message_log"]["messages"]
+        if message["u_id"] == u_id and query_str in message["message"]
+    ]
+
+
+def baseline_search(token, query_str):
+    """
+    Searches the way search did before the trigram index, walking the
+    whole log for each of the caller's messages
+    """
+    u_id = find_uid_from_token(decode_token(token))
+    message_match = []
+    for user_m_id in DATA["users"][u_id - 1]["user_message_id"]:
+        for message in DATA["message_log"]["messages"]:
+            if message["message_id"] == user_m_id and query_str in message["message"]:
+                message_match.append(message)
+    return message_match
+
+
+def fill_messages(u_ids, c_id, count):
+    """
+    Sends count messages of random words from each user in turn, every
+    10000th one containing a rare word, bypassing message_send to keep set
+    up quick
+    """
+    rng = random.Random(1531)
+    start = DATA["message_log"]["msg_counter"]
+    for m_id in range(start, start + count):
+        text = " ".join(rng.choice(WORDS) for _ in range(6))
+        if m_id % 10000 == 0:
+            text += " zebracorn"
+        send_message(u_ids[m_id % len(u_ids)], c_id, text, m_id)
+    DATA["message_log"]["msg_counter"] = start + count
+
+
+def run_benchmark():
+    """
+    Grows the log to each size and times both searches for a rare, a
+    common phrase and a very common word
+    """
+    clear()
+    user = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")
+    c_id = channels_create(user["token"], "benchmark", True)["channel_id"]
+
+    print(f"{'messages':>10} {'query':>20} {'results':>8} {'scan ms':>10} {'index ms':>10}")
+    for size in SIZES:
+        fill_messages([user["u_id"]], c_id, size - len(DATA["message_log"]["messages"]))
+
+        for query in QUERIES:
+            results = len(search(user["token"], query)["messages"])
+            assert results == len(scan_search(user["token"], query))
+            scan = timeit(lambda: scan_search(user["token"], query), number=REPEAT)
+            indexed = timeit(lambda: search(user["token"], query), number=REPEAT)
+            print(
+                f"{size:>10} {query:>20} {results:>8} "
+                f"{scan / REPEAT * 1e3:>10.2f} {indexed / REPEAT * 1e3:>10.2f}"
+            )
+
+    clear()
+
+
+def run_multi_user_benchmark():
+    """
+    Spreads the log over USERS users and times searches by one of them
+    against the search being replaced, for each size
+    """
+    clear()
+    users = [
+        auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", "Mark") for i in range(USERS)
+    ]
+    user = users[0]
+    c_id = channels_create(user["token"], "benchmark", True)["channel_id"]
+    u_ids = [other["u_id"] for other in users]
+
+    print(f"\n{USERS} users, searching as one of them")
+    print(f"{'messages':>10} {'query':>20} {'results':>8} {'before ms':>10} {'index ms':>10}")
+    for size in MULTI_SIZES:
+        fill_messages(u_ids, c_id, size - len(DATA["message_log"]["messages"]))
+
+        for query in QUERIES:
+            began = time.perf_counter()
+            expected = baseline_search(user["token"], query)
+            before = time.perf_counter() - began
+            results = len(search(user["token"], query)["messages"])
+            assert results == len(expected)
+            indexed = timeit(lambda: search(user["token"], query), number=REPEAT)
+            print(
+                f"{size:>10} {query:>20} {results:>8} "
+                f"{before * 1e3:>10.2f} {indexed / REPEAT * 1e3:>10.2f}"
+            )
+
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
+    run_multi_user_benchmark()
@@ -0,0 +1,147 @@
+"""
+benchmark_snapshot.py
+measures writing a snapshot and cold starting from it, for workspaces
+of up to a million messages with a short journal written after the snapshot
+
+Snapshots are encoded by a forked copy of the server, a writer sending
+messages all through the snapshot shows how long writes are held up
+
+The first search after a cold start scans the user's messages and starts
+rebuilding the trigram index in the background, a message sent while it
+builds shows writes aren't held up by it
+
+Run from the repo root with: python3 src/benchmark_snapshot.py
+"""
+
+
+import os
+import tempfile
+import threading
+import time
+from auth import encode_token
+from benchmark_journal import seed
+from index import drop_trigrams, wait_trigrams
+from journal import open_journal, close_journal
+from message import send_message
+from other import clear, search
+from sessions import start_session
+from snapshot import write_snapshot, load_snapshot
+from store import allocate_message_id, set_pinned
+
+
+MESSAGES = (100000, 1000000)
+TAIL = 1000
+
+
+def fill(count):
+    """
+    Sends count messages to the benchmark channel, every tenth one is pinned
+    """
+    # The trigram index is left for the first search, as after a cold start
+    drop_trigrams()
+    for _ in range(count):
+        m_id = allocate_message_id()
+        send_message(1, 1, "Throw it out the window", m_id)
+        if m_id % 10 == 0:
+            set_pinned(m_id, True)
+
+
+def slowest_send(done):
+    """
+    Sends messages until done is set
+    Returns:
+        (float): ms taken by the slowest of them
+    """
+    slowest = 0
+    while not done.is_set():
+        sent = time.perf_counter()
+        send_message(1, 1, "I like trains", allocate_message_id())
+        slowest = max(slowest, time.perf_counter() - sent)
+    return slowest * 1e3
+
+
+def cold_start(directory, count):
+    """
+    Snapshots a workspace of count messages, journals TAIL more and restarts
+    Returns:
+        (snapshot seconds, slowest send during snapshot ms, snapshot MB,
+            cold start seconds, first search seconds, index build seconds,
+            send during build ms)
+    """
+    journal_path = os.path.join(directory, "flockr.journal")
+    snapshot_path = os.path.join(directory, "flockr.snapshot")
+    for path in (journal_path, snapshot_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    clear()
+    seed()
+    fill(count)
+    # Snapshotted along with everything else, so it is still logged in after
+    token = encode_token(start_session(1))
+    open_journal(journal_path)
+
+    done = threading.Event()
+    slowest = []
+    writer = threading.Thread(target=lambda: slowest.append(slowest_send(done)))
+    writer.start()
+    start = time.perf_counter()
+    write_snapshot(snapshot_path)
+    snapshot_seconds = time.perf_counter() - start
+    done.set()
+    writer.join()
+
+    for _ in range(TAIL):
+        send_message(1, 1, "I like trains", allocate_message_id())
+    close_journal()
+    clear()
+
+    start = time.perf_counter()
+    open_journal(journal_path, load_snapshot(snapshot_path))
+    start_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    search(token, "trains")
+    search_seconds = time.perf_counter() - start
+
+    sent = time.perf_counter()
+    send_message(1, 1, "I like trains", allocate_message_id())
+    send_ms = (time.perf_counter() - sent) * 1e3
+    wait_trigrams()
+    build_seconds = time.perf_counter() - start
+
+    close_journal()
+    megabytes = os.path.getsize(snapshot_path) / 1e6
+    return (
+        snapshot_seconds,
+        slowest[0],
+        megabytes,
+        start_seconds,
+        search_seconds,
+        build_seconds,
+        send_ms,
+    )
+
+
+def run_benchmark():
+    """
+    Prints snapshot and cold start times for each workspace size
+    """
+    print(
+        f"{'messages':>10} {'snapshot s':>11} {'slowest send ms':>16} {'MB':>8} "
+        f"{'cold start s':>13} {'first search s':>15} {'index built s':>14} {'send ms':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for count in MESSAGES:
+            snapshot_s, slowest_ms, megabytes, start_s, search_s, build_s, send_ms = cold_start(
+                directory, count
+            )
+            print(
+                f"{count:>10} {snapshot_s:>11.2f} {slowest_ms:>16.1f} {megabytes:>8.1f} "
+                f"{start_s:>13.2f} {search_s:>15.2f} {build_s:>14.2f} {send_ms:>8.1f}"
+            )
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
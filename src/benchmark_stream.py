@@ -0,0 +1,123 @@
+"""
+benchmark_stream.py
+CPU spent on idle clients, each with a channel open, when they poll
+channel_messages every second against when they hold a channel stream
+open or long-poll channel_messages_since, with nothing being sent
+
+Run from the repo root with: python3 src/benchmark_stream.py
+"""
+
+
+import threading
+import time
+from json import dumps
+from auth import auth_register
+from channel import channel_join, channel_messages, channel_messages_since, channel_stream
+from channels import channels_create
+from message import message_send
+from other import clear
+from streams import STREAMS
+
+
+CLIENTS = 200
+SECONDS = 5
+HEARTBEAT = 1
+
+
+def poll(clients, channel_id):
+    """
+    Every client polls the channel once a second for SECONDS
+    Returns:
+        (float): CPU seconds used
+    """
+    began = time.process_time()
+    for _ in range(SECONDS):
+        second = time.time() + 1
+        for token in clients:
+            dumps(channel_messages(token, channel_id, 0))
+        time.sleep(max(0, second - time.time()))
+    return time.process_time() - began
+
+
+def stream(clients):
+    """
+    Every client holds a stream open for SECONDS, reading keepalives
+    Returns:
+        (float): CPU seconds used
+    """
+    streams = [channel_stream(token) for token in clients]
+    stop = threading.Event()
+
+    def read(events):
+        for _ in events:
+            if stop.is_set():
+                break
+        events.close()
+
+    threads = [threading.Thread(target=read, args=(events,)) for events in streams]
+    for thread in threads:
+        thread.start()
+    began = time.process_time()
+    time.sleep(SECONDS)
+    used = time.process_time() - began
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return used
+
+
+def long_poll(clients, channel_id):
+    """
+    Every client long-polls for changes for SECONDS
+    Returns:
+        (float): CPU seconds used
+    """
+    seq = channel_messages_since(clients[0], channel_id, 0, 0)["seq"]
+
+    def wait(token):
+        dumps(channel_messages_since(token, channel_id, seq, SECONDS))
+
+    threads = [threading.Thread(target=wait, args=(token,)) for token in clients]
+    began = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.process_time() - began
+
+
+def run_benchmark():
+    """
+    Prints CPU milliseconds per idle client per second, both ways
+    """
+    clear()
+    owner = auth_register("bench@gmail.com", "benchmark", "Bench", "Mark")["token"]
+    channel_id = channels_create(owner, "bench", True)["channel_id"]
+    for i in range(50):
+        message_send(owner, channel_id, f"message {i}")
+    clients = []
+    for i in range(CLIENTS):
+        token = auth_register(f"bench{i}@gmail.com", "benchmark", "Bench", "Mark")["token"]
+        channel_join(token, channel_id)
+        clients.append(token)
+
+    heartbeat = STREAMS["heartbeat"]
+    STREAMS["heartbeat"] = HEARTBEAT
+    try:
+        polled = poll(clients, channel_id)
+        streamed = stream(clients)
+        long_polled = long_poll(clients, channel_id)
+    finally:
+        STREAMS["heartbeat"] = heartbeat
+
+    per_client = 1000 / (CLIENTS * SECONDS)
+    print(f"{CLIENTS} idle clients for {SECONDS}s")
+    print(f"{'':>8} {'CPU ms/client/s':>16}")
+    print(f"{'polling':>8} {polled * per_client:>16.3f}")
+    print(f"{'stream':>8} {streamed * per_client:>16.3f}  (keepalive every {HEARTBEAT}s)")
+    print(f"{'since':>8} {long_polled * per_client:>16.3f}  (one {SECONDS}s long-poll each)")
+    clear()
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -7,6 +7,11 @@ channel functions and properties
 from data import DATA
 from auth import decode_token
 from find import find_uid_from_token, find_user_from_token, find_user_from_uid
+from index import INDEX, find_member_views
+from locks import with_channel_lock
+from message_helper import message_view
+from store import add_member, remove_member, add_owner, remove_owner
+from streams import changes_since, event_stream, subscribe
 from channel_helper import (
         check_user_in_channel,
         check_u_id_in_channel,
@@ -27,6 +32,7 @@ from channel_helper import (
 ########################################################################
 
 
+@with_channel_lock
 def channel_invite(token, channel_id, u_id):
     """
     Invites a user to join a channel, the user is immediately added
@@ -43,10 +49,10 @@ def channel_invite(token, channel_id, u_id):
     find_user_from_token(decoded_token)
 
     # InputError: Check if the user ID is valid
-    user = find_user_from_uid(u_id)
+    find_user_from_uid(u_id)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # AccessError: Check if user (token) is in the channel - must be in channel
     check_user_in_channel(decoded_token, channel_id)
@@ -54,18 +60,12 @@ def channel_invite(token, channel_id, u_id):
     # AccessError: Check if user (u_id) is already in the channel - should not be in channel
     check_u_id_in_channel(u_id, channel_id)
 
-    new_member = {
-        "u_id": u_id,
-        "name_first": user["name_first"],
-        "name_last": user["name_last"],
-        "profile_img_url": user["profile_img_url"],
-    }
-
-    channel["all_members"].append(new_member)
+    add_member(channel_id, u_id)
 
     return {}
 
 
+@with_channel_lock
 def channel_details(token, channel_id):
     """
     Returns key information about a channel the user is a part of
@@ -88,10 +88,11 @@ def channel_details(token, channel_id):
     # AccessError: Check if user is in the channel
     check_user_in_channel(decoded_token, channel_id)
 
+    owner_members, all_members = find_member_views(channel)
     return {
         "name": channel["name"],
-        "owner_members": channel["owner_members"],
-        "all_members": channel["all_members"],
+        "owner_members": owner_members,
+        "all_members": all_members,
     }
 
 
@@ -122,40 +123,28 @@ def channel_messages(token, channel_id, start):
     # InputError: Check if start > total number of messages in channel
     check_valid_message_count(channel_id, start)
 
-    messages = []
-    # Get message_id's of messages in the channel
+    # Get message_id's of messages in the channel, oldest first
     c_message_ids = DATA["channels"][channel_id - 1]["messages"]
 
-    # Go through DATA's messages and match message_id
-    message_counter = 0
-    for message in DATA["message_log"]["messages"]:
-        if message_counter in (50, len(c_message_ids) - start):
-            break
-        for m_id in c_message_ids:
-            if message["message_id"] == m_id:
-                messages.insert(0, message)
-                message_counter += 1
-
-    # end = -1 when all least recent message has been returned
-    if not c_message_ids:
-        # There are no messages in the channel
-        end = -1
-    elif c_message_ids[-1] == messages[0]["message_id"]:
-        # Least recent message has been returned
+    # Slice out the requested page and return it most recent first, as
+    # the caller sees it. A removed message leaves a gap in its page until
+    # the channel's list is compacted, so later pages don't shift, and one
+    # removed since the slice is skipped too
+    u_id = find_uid_from_token(decoded_token)
+    page = c_message_ids[start:start + 50]
+    messages = [
+        message_view(message, u_id)
+        for message in map(INDEX["messages_by_id"].get, reversed(page))
+        if message is not None
+    ]
+
+    # end = -1 when the page reaches the end of the channel's messages
+    if start + 50 >= len(c_message_ids):
         end = -1
     else:
         # There are more messages to return
         end = start + 50
 
-    # For each message being returned, check whether or not the user calling
-    # channel_messages has reacted to them
-    u_id = find_uid_from_token(decoded_token)
-    for message in messages:
-        if u_id in message["reacts"][0]["u_ids"]:
-            message["reacts"][0]["is_this_user_reacted"] = True
-        else:
-            message["reacts"][0]["is_this_user_reacted"] = False
-
     return {
         "messages": messages,
         "start": start,
@@ -163,6 +152,7 @@ def channel_messages(token, channel_id, start):
     }
 
 
+@with_channel_lock
 def channel_leave(token, channel_id):
     """
     Remove a user as a member from the channel
@@ -178,28 +168,23 @@ def channel_leave(token, channel_id):
     find_user_from_token(decoded_token)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # AccessError: Check if user is in the channel
     check_user_in_channel(decoded_token, channel_id)
 
     # Remove the user from the channel all member list
-    index = 0
-    for member in channel["all_members"]:
-        if member["u_id"] == find_uid_from_token(decoded_token):
-            del channel["all_members"][index]
-        index += 1
+    u_id = find_uid_from_token(decoded_token)
+    remove_member(channel_id, u_id)
 
     # Remove the user from the channel owner list (if they were an owner)
-    index = 0
-    for member in channel["owner_members"]:
-        if member["u_id"] == find_uid_from_token(decoded_token):
-            del channel["owner_members"][index]
-        index += 1
+    if u_id in INDEX["owners_by_channel"][channel_id]:
+        remove_owner(channel_id, u_id)
 
     return {}
 
 
+@with_channel_lock
 def channel_join(token, channel_id):
     """
     Add a user as a member of the channel
@@ -212,29 +197,27 @@ def channel_join(token, channel_id):
     decoded_token = decode_token(token)
 
     # AccessError: token/u_id passed in is not a valid token
-    user = find_user_from_token(decoded_token)
+    find_user_from_token(decoded_token)
     u_id = find_uid_from_token(decoded_token)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # AccessError: Check if the channel is public or private, if it is private
     # the user can only join if they are authorised
     if not check_channel_priv_pub(channel_id):
         check_user_authorised(u_id, channel_id)
 
-    new_member = {
-        "u_id": u_id,
-        "name_first": user["name_first"],
-        "name_last": user["name_last"],
-        "profile_img_url": user["profile_img_url"],
-    }
+    # Joining a channel the user is already in changes nothing
+    if u_id in INDEX["members_by_channel"][channel_id]:
+        return {}
 
-    channel["all_members"].append(new_member)
+    add_member(channel_id, u_id)
 
     return {}
 
 
+@with_channel_lock
 def channel_addowner(token, channel_id, u_id):
     """
     Make a user an owner member of the specified channel
@@ -251,7 +234,7 @@ def channel_addowner(token, channel_id, u_id):
     find_user_from_token(decoded_token)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # InputError: Check if user being made owner is already an owner
     check_user_is_already_owner(u_id, channel_id)
@@ -261,20 +244,15 @@ def channel_addowner(token, channel_id, u_id):
     if not check_is_admin(find_uid_from_token(decoded_token)):
         check_user_is_owner(find_uid_from_token(decoded_token), channel_id)
 
-    user = find_user_from_uid(u_id)
-
-    new_owner_member = {
-        "u_id": u_id,
-        "name_first": user["name_first"],
-        "name_last": user["name_last"],
-        "profile_img_url": user["profile_img_url"],
-    }
+    # InputError: Check the user being made owner exists
+    find_user_from_uid(u_id)
 
-    channel["owner_members"].append(new_owner_member)
+    add_owner(channel_id, u_id)
 
     return {}
 
 
+@with_channel_lock
 def channel_removeowner(token, channel_id, u_id):
     """
     Remove a user as an owner member of the specified channel
@@ -291,7 +269,7 @@ def channel_removeowner(token, channel_id, u_id):
     find_user_from_token(decoded_token)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # AccessError: Check if user executing command is an owner of the channel
     # First check if they are an admin since they have channel owner rights
@@ -301,13 +279,12 @@ def channel_removeowner(token, channel_id, u_id):
     # InputError: Check if the user being removed is an owner of the channel to begin with
     check_user_remove_owner(u_id, channel_id)
 
-    for member in channel["owner_members"]:
-        if member["u_id"] == u_id:
-            channel["owner_members"].remove(member)
+    remove_owner(channel_id, u_id)
 
     return {}
 
 
+@with_channel_lock
 def channel_removemember(token, channel_id, u_id):
     """
     Remove a user from the specified channel
@@ -325,7 +302,7 @@ def channel_removemember(token, channel_id, u_id):
     find_user_from_uid(u_id)
 
     # InputError: Check if the channel ID is valid
-    channel = check_valid_channel_id(channel_id)
+    check_valid_channel_id(channel_id)
 
     # AccessError: Check if user executing command is an owner of the channel
     # First check if they are an admin since they have channel owner rights
@@ -336,12 +313,60 @@ def channel_removemember(token, channel_id, u_id):
     check_remove_self(decoded_token, u_id)
 
     # Completely remove user from channel
-    for member in channel["owner_members"]:
-        if member["u_id"] == u_id:
-            channel["owner_members"].remove(member)
+    if u_id in INDEX["owners_by_channel"][channel_id]:
+        remove_owner(channel_id, u_id)
 
-    for member in channel["all_members"]:
-        if member["u_id"] == u_id:
-            channel["all_members"].remove(member)
+    if u_id in INDEX["members_by_channel"][channel_id]:
+        remove_member(channel_id, u_id)
 
     return {}
+
+
+def channel_messages_since(token, channel_id, seq, timeout):
+    """
+    Retrieves only what has changed in a channel since the client last
+    looked, waiting for a change if there hasn't been one yet
+    Parameters:
+        token (str)
+        channel_id (int)
+        seq (int): the seq returned by the client's last call, or 0 on
+            the first call
+        timeout (float): seconds to wait for a change
+    Returns: (dict)
+        seq (int): the channel's latest sequence number, to pass next time
+        changes (list): send, edit, remove, react, unreact and pin changes
+            after seq, oldest first, each with its seq, event and message_id
+        reset (bool): True if the changes can't all be given and the
+            client should fetch the channel again with channel_messages
+    """
+    decoded_token = decode_token(token)
+
+    # AccessError: token passed in is not a valid token
+    find_user_from_token(decoded_token)
+
+    # InputError: Check if the channel ID is valid
+    check_valid_channel_id(channel_id)
+
+    # AccessError: Check if user is in the channel
+    check_user_in_channel(decoded_token, channel_id)
+
+    # Waits without the channel's lock, so changes can still be made
+    return changes_since(channel_id, seq, timeout)
+
+
+def channel_stream(token):
+    """
+    Opens a stream of the message activity in every channel the user is a
+    member of, for as long as they are one
+    Parameters:
+        token (str)
+    Returns:
+        events (generator): of Server-Sent Events, send, edit, remove,
+        react, unreact and pin, each with its channel_id and message_id
+    """
+    decoded_token = decode_token(token)
+    u_id = find_uid_from_token(decoded_token)
+
+    # Subscribed now rather than when the stream is first read, so nothing
+    # sent in between is missed
+    return event_stream(subscribe(u_id, decoded_token))
@@ -17,8 +17,9 @@ import pytest
 from channel import channel_join, channel_details
 from channels import channels_create
 from error import InputError, AccessError
+from index import VERSIONS
 from other import clear
-from user import user_profile
+from user import user_profile, user_profile_setname
 from conftest import user_a, user_b, user_c
 
 
@@ -113,3 +114,27 @@ def test_channel_detail_invalid_token(user_a):
         channel_details(invalid_token, c_id_1)
 
     clear()
+
+
+def test_channel_detail_rename(user_a, user_b):
+    """
+    Test 5 - A rename shows in the details of every channel the user is in,
+    without the rename itself touching any of those channels
+    """
+    channel_ids = [
+        channels_create(user_a["token"], f"channel {i}", True)["channel_id"]
+        for i in range(5)
+    ]
+    for c_id in channel_ids:
+        channel_join(user_b["token"], c_id)
+        channel_details(user_a["token"], c_id)
+
+    channel_versions = dict(VERSIONS["by_channel"])
+    user_profile_setname(user_b["token"], "Jerry", "Chen")
+    assert VERSIONS["by_channel"] == channel_versions
+
+    for c_id in channel_ids:
+        all_members = channel_details(user_a["token"], c_id)["all_members"]
+        assert [member["name_last"] for member in all_members] == ["Gaulden", "Chen"]
+
+    clear()
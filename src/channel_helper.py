@@ -7,6 +7,7 @@ helper functions for channel.py are sourced here
 from data import DATA
 from error import AccessError, InputError
 from find import find_uid_from_token
+from index import INDEX
 
 
 def check_user_in_channel(token, channel_id):
@@ -19,9 +20,8 @@ def check_user_in_channel(token, channel_id):
         (bool): "True" if the user is inside the channel or AccessError
                 if the user is not
     """
-    for member in DATA["channels"][channel_id - 1]["all_members"]:
-        if member["u_id"] == find_uid_from_token(token):
-            return True
+    if find_uid_from_token(token) in INDEX["members_by_channel"].get(channel_id, ()):
+        return True
 
     raise AccessError(description="You must be a member of the channel to view its details")
 
@@ -36,9 +36,8 @@ def check_u_id_in_channel(u_id, channel_id):
         (bool): InputError if the user is already inside the channel or "True"
                 if the user is not
     """
-    for member in DATA["channels"][channel_id - 1]["all_members"]:
-        if member["u_id"] == u_id:
-            raise InputError(description="User already a member of this channel")
+    if u_id in INDEX["members_by_channel"].get(channel_id, ()):
+        raise InputError(description="User already a member of this channel")
 
     return True
 
@@ -53,13 +52,12 @@ def check_user_authorised(u_id, channel_id):
         (bool): "True" if the user is authorised to join the channel
                 and AccessError if the user is not
     """
-    for user in DATA["users"]:
-        if user["u_id"] == u_id and user["permission_id"] == 1:
-            return True
+    user = INDEX["users_by_uid"].get(u_id)
+    if user and user["permission_id"] == 1:
+        return True
 
-    for member in DATA["channels"][channel_id - 1]["owner_members"]:
-        if member["u_id"] == u_id:
-            return True
+    if u_id in INDEX["owners_by_channel"].get(channel_id, ()):
+        return True
 
     raise AccessError(description="User is not authorised to join channel")
 
@@ -75,9 +73,8 @@ def check_user_is_already_owner(u_id, channel_id):
         (void): raises InputError if the user is already an owner of
                 the channel
     """
-    for member in DATA["channels"][channel_id - 1]["owner_members"]:
-        if member["u_id"] == u_id:
-            raise InputError(description="User is already an owner")
+    if u_id in INDEX["owners_by_channel"].get(channel_id, ()):
+        raise InputError(description="User is already an owner")
 
 
 def check_user_is_owner(u_id, channel_id):
@@ -91,9 +88,8 @@ def check_user_is_owner(u_id, channel_id):
         (bool): returns "True" if the user is an owner or raises
                 AccessError if the user is not
     """
-    for member in DATA["channels"][channel_id - 1]["owner_members"]:
-        if member["u_id"] == u_id:
-            return True
+    if u_id in INDEX["owners_by_channel"].get(channel_id, ()):
+        return True
 
     raise AccessError(description="User is not an owner")
 
@@ -109,9 +105,8 @@ def check_user_remove_owner(u_id, channel_id):
         (bool): returns "True" if the user is an owner or raises
                 AccessError if the user is not
     """
-    for member in DATA["channels"][channel_id - 1]["owner_members"]:
-        if member["u_id"] == u_id:
-            return True
+    if u_id in INDEX["owners_by_channel"].get(channel_id, ()):
+        return True
 
     raise InputError(description="User being removed as owner is not an owner")
 
@@ -131,9 +126,9 @@ def check_is_admin(u_id):
                 raises an AccessError if not and the user is being removed
                 as an owner
     """
-    for user in DATA["users"]:
-        if user["u_id"] == u_id and user["permission_id"] == 1:
-            return True
+    user = INDEX["users_by_uid"].get(u_id)
+    if user and user["permission_id"] == 1:
+        return True
 
     return False
 
@@ -156,9 +151,8 @@ def check_valid_channel_id(channel_id):
                 if it does not
     """
 
-    for channel in DATA["channels"]:
-        if channel["channel_id"] == channel_id:
-            return channel
+    if channel_id in INDEX["members_by_channel"]:
+        return DATA["channels"][channel_id - 1]
 
     raise InputError(description=f"Channel: {channel_id} does not exist")
 
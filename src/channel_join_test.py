@@ -16,7 +16,7 @@ Exceptions:
 
 import pytest
 from auth import auth_register
-from channel import channel_join, channel_details
+from channel import channel_join, channel_details, channel_leave
 from channels import channels_create, channels_list
 from error import InputError, AccessError
 from other import clear
@@ -138,3 +138,23 @@ def test_channel_join_invalid_token(user_a):
         channel_join(invalid_token, c_id_1)
 
     clear()
+
+
+def test_channel_join_twice(user_a, user_b):
+    """
+    Test 6 - Joining a channel twice only adds the user once, so a
+    single leave removes them
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    channel_join(user_b["token"], c_id_1)
+    channel_join(user_b["token"], c_id_1)
+
+    members = channel_details(user_a["token"], c_id_1)["all_members"]
+    assert [member["u_id"] for member in members] == [user_a["u_id"], user_b["u_id"]]
+
+    channel_leave(user_b["token"], c_id_1)
+    assert channels_list(user_b["token"]) == {"channels": []}
+
+    clear()
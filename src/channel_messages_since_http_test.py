@@ -0,0 +1,44 @@
+"""
+channel_messages_since_http_test
+
+Testing that channel_messages_since works with
+http implementation
+"""
+
+
+import requests
+from echo_http_test import url
+from conftest_http import user_a
+from http_channel_functions import http_channel_messages_since
+from http_channels_functions import http_channels_create
+from http_message_functions import http_message_send
+
+
+def test_channel_messages_since_http_success(url, user_a):
+    """
+    Test 1 - Only the message sent since seq is returned
+    """
+    channel_1 = http_channels_create(url, user_a["token"], "billionaire records", True).json()
+    c_id_1 = channel_1["channel_id"]
+    http_message_send(url, user_a["token"], c_id_1, "Before")
+
+    seq = http_channel_messages_since(url, user_a["token"], c_id_1, 0, 0).json()["seq"]
+    m_id = http_message_send(url, user_a["token"], c_id_1, "After").json()["message_id"]
+
+    result = http_channel_messages_since(url, user_a["token"], c_id_1, seq, 5).json()
+    assert result["reset"] is False
+    assert [(change["event"], change["message_id"]) for change in result["changes"]] == [
+        ("send", m_id)
+    ]
+
+    requests.delete(f"{url}/clear")
+
+
+def test_channel_messages_since_http_invalid_channel(url, user_a):
+    """
+    Test 2 - System Error - Invalid channel
+    """
+    payload = http_channel_messages_since(url, user_a["token"], 5, 0, 0)
+    assert payload.status_code == 400
+
+    requests.delete(f"{url}/clear")
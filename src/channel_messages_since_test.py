@@ -0,0 +1,121 @@
+"""
+channel_messages_since
+
+Takes in (token, channel_id, seq, timeout)
+Returns { seq, changes, reset }
+
+Description: Given a Channel with ID channel_id that the authorised user is
+part of, return the changes to its messages since seq, waiting up to
+timeout seconds if there are none yet. reset is True when the changes
+since seq are no longer all kept, and the channel should be fetched again
+
+Exceptions:
+- InputError when the Channel ID is not a valid channel
+- AccessError when the authorised user is not a member of channel with channel_id
+"""
+
+
+import threading
+import time
+import pytest
+from channel import channel_join, channel_messages_since
+from channels import channels_create
+from error import InputError, AccessError
+from message import message_send, message_edit, message_remove, message_react
+from other import clear
+from streams import STREAMS
+from conftest import user_a, user_b
+
+
+def test_channel_messages_since_changes(user_a, user_b):
+    """
+    Test 1 - Only the changes since seq are returned, oldest first
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], channel_1)
+    message_send(user_a["token"], channel_1, "Before")
+
+    # The first call has nothing to go from
+    first = channel_messages_since(user_b["token"], channel_1, 0, 0)
+    assert first["reset"] is True
+    seq = first["seq"]
+
+    m_id = message_send(user_a["token"], channel_1, "Throw it out the window")["message_id"]
+    message_edit(user_a["token"], m_id, "Out the window")
+    message_react(user_b["token"], m_id, 1)
+    message_remove(user_a["token"], m_id)
+
+    result = channel_messages_since(user_b["token"], channel_1, seq, 0)
+    assert result["reset"] is False
+    assert result["seq"] == seq + 4
+    assert [change["seq"] for change in result["changes"]] == [seq + 1, seq + 2, seq + 3, seq + 4]
+    assert [change["event"] for change in result["changes"]] == [
+        "send", "edit", "react", "remove"
+    ]
+    assert result["changes"][0]["message"] == "Throw it out the window"
+    assert result["changes"][1] == {
+        "seq": seq + 2, "event": "edit", "message_id": m_id, "message": "Out the window"
+    }
+    assert result["changes"][2]["u_id"] == user_b["u_id"]
+
+    # Nothing new since the latest seq
+    assert channel_messages_since(user_b["token"], channel_1, seq + 4, 0) == {
+        "seq": seq + 4, "changes": [], "reset": False
+    }
+
+    clear()
+
+
+def test_channel_messages_since_waits(user_a):
+    """
+    Test 2 - With nothing new it waits for a change, up to the timeout
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    seq = channel_messages_since(user_a["token"], channel_1, 0, 0)["seq"]
+
+    began = time.monotonic()
+    assert channel_messages_since(user_a["token"], channel_1, seq, 0.1)["changes"] == []
+    assert time.monotonic() - began >= 0.1
+
+    sender = threading.Timer(0.05, message_send, (user_a["token"], channel_1, "Woken up"))
+    sender.start()
+    began = time.monotonic()
+    result = channel_messages_since(user_a["token"], channel_1, seq, 10)
+    assert time.monotonic() - began < 5
+    assert [change["message"] for change in result["changes"]] == ["Woken up"]
+    sender.join()
+
+    clear()
+
+
+def test_channel_messages_since_reset(user_a, monkeypatch):
+    """
+    Test 3 - Changes older than the log, or a seq from elsewhere, reset
+    """
+    monkeypatch.setitem(STREAMS, "log_size", 3)
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    seq = channel_messages_since(user_a["token"], channel_1, 0, 0)["seq"]
+    for i in range(4):
+        message_send(user_a["token"], channel_1, f"message {i}")
+
+    assert channel_messages_since(user_a["token"], channel_1, seq, 0) == {
+        "seq": seq + 4, "changes": [], "reset": True
+    }
+    assert len(channel_messages_since(user_a["token"], channel_1, seq + 1, 0)["changes"]) == 3
+    assert channel_messages_since(user_a["token"], channel_1, seq + 5, 0)["reset"] is True
+
+    clear()
+
+
+def test_channel_messages_since_invalid(user_a, user_b):
+    """
+    Test 4 - InputError and AccessError - Invalid channel, and not a member
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+
+    with pytest.raises(InputError, match=r"Channel: 5 does not exist"):
+        channel_messages_since(user_a["token"], 5, 0, 0)
+    with pytest.raises(AccessError):
+        channel_messages_since(user_b["token"], channel_1, 0, 0)
+
+    clear()
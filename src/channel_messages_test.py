@@ -19,12 +19,13 @@ Exceptions:
 """
 
 
+import threading
 import pytest
 from auth import auth_register
 from channel import channel_join, channel_messages
 from channels import channels_create
 from data import DATA
-from message import message_send
+from message import message_send, message_react
 from error import InputError, AccessError
 from other import clear, search
 from conftest import user_a, user_b
@@ -172,3 +173,69 @@ def test_channel_message_greater_channel(user_a, user_b):
         channel_messages(user_b["token"], c_id_1, 60)
 
     clear()
+
+
+def test_channel_message_second_page(user_a):
+    """
+    Test 6 - Testing that a page starting after the first 50 messages is retrieved
+    """
+    # User_a makes a channel
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    # Send 51 messages so that the second page holds just the last one
+    for i in range(0, 51):
+        msg = message_send(user_a["token"], c_id_1, str(i))
+        m_id = msg["message_id"]
+
+    assert channel_messages(user_a["token"], c_id_1, 50) == {
+        "messages": [
+            {
+                "message_id": m_id,
+                "u_id": user_a["u_id"],
+                "message": "50",
+                "time_created": get_time_created(m_id),
+                "reacts": [
+                    {
+                        "react_id": 1,
+                        "u_ids": [],
+                        "is_this_user_reacted": False,
+                    }
+                ],
+                "is_pinned": False,
+            }
+        ],
+        "start": 50,
+        "end": -1,
+    }
+
+    clear()
+
+
+def test_channel_message_parallel_reacted(user_a, user_b):
+    """
+    Test 7 - Two users reading the same page at once each see whether they reacted
+    """
+    # User_a makes a channel that user_b joins, and only user_a reacts
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    channel_join(user_b["token"], c_id_1)
+    m_id = message_send(user_a["token"], c_id_1, "Throw it out the window")["message_id"]
+    message_react(user_a["token"], m_id, 1)
+
+    flags = {user_a["u_id"]: set(), user_b["u_id"]: set()}
+
+    def read(user):
+        for _ in range(200):
+            react = channel_messages(user["token"], c_id_1, 0)["messages"][0]["reacts"][0]
+            flags[user["u_id"]].add(react["is_this_user_reacted"])
+
+    readers = [threading.Thread(target=read, args=(user,)) for user in (user_a, user_b)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert flags == {user_a["u_id"]: {True}, user_b["u_id"]: {False}}
+
+    clear()
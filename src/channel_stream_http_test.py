@@ -0,0 +1,57 @@
+"""
+channel_stream_http_test
+
+Testing that channel_stream works with
+http implementation
+"""
+
+
+import json
+import requests
+from echo_http_test import url
+from conftest_http import user_a, user_b
+from http_channel_functions import http_channel_join
+from http_channels_functions import http_channels_create
+from http_message_functions import http_message_send, http_message_edit
+
+
+def test_channel_stream_http_success(url, user_a, user_b):
+    """
+    Test 1 - Messages sent to the user's channels are streamed to them
+    """
+    channel_1 = http_channels_create(url, user_a["token"], "billionaire records", True).json()
+    c_id_1 = channel_1["channel_id"]
+    http_channel_join(url, user_b["token"], c_id_1)
+
+    stream = requests.get(
+        f"{url}/channel/stream", params={"token": user_b["token"]}, stream=True, timeout=10
+    )
+    assert stream.headers["Content-Type"].startswith("text/event-stream")
+    lines = stream.iter_lines(chunk_size=1, decode_unicode=True)
+    assert next(lines) == ": connected"
+
+    m_id = http_message_send(url, user_a["token"], c_id_1, "Throw it out the window").json()
+    http_message_edit(url, user_a["token"], m_id["message_id"], "Out the window")
+
+    events = []
+    for line in lines:
+        if line.startswith("data: "):
+            events.append(json.loads(line[len("data: "):]))
+            if len(events) == 2:
+                break
+    stream.close()
+
+    assert events[0]["message"] == "Throw it out the window"
+    assert events[1] == {
+        "channel_id": c_id_1, "message_id": m_id["message_id"], "message": "Out the window"
+    }
+
+    requests.delete(f"{url}/clear")
+
+
+def test_channel_stream_http_invalid_token(url):
+    """
+    Test 2 - System Error - Invalid Token
+    """
+    payload = requests.get(f"{url}/channel/stream", params={"token": "randomtoken"})
+    assert payload.status_code == 400
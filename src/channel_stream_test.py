@@ -0,0 +1,172 @@
+"""
+channel_stream
+
+Takes in (token)
+Returns a stream of Server-Sent Events
+
+Description: Streams the message activity of every channel the user is a
+member of, send, edit, remove, react, unreact and pin, for as long as
+they are a member of it
+
+Exceptions:
+- AccessError when the token is invalid
+"""
+
+
+import json
+import pytest
+from auth import auth_logout
+from channel import channel_join, channel_leave, channel_stream
+from channels import channels_create
+from error import AccessError
+from message import message_send, message_edit, message_remove, message_react
+from message import message_unreact, message_pin, message_unpin
+from other import clear
+from streams import STREAMS
+from conftest import user_a, user_b
+
+
+def next_event(events):
+    """
+    Reads the stream up to its next event, skipping comments
+    Returns:
+        (event, data) (tuple): data decoded from JSON
+    """
+    for chunk in events:
+        if not chunk.startswith(":"):
+            event, data = chunk.strip().split("\n")
+            return event[len("event: "):], json.loads(data[len("data: "):])
+    return None
+
+
+def test_channel_stream_events(user_a, user_b):
+    """
+    Test 1 - Every kind of message change is streamed, in order
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], channel_1)
+    events = channel_stream(user_b["token"])
+
+    m_id = message_send(user_a["token"], channel_1, "Throw it out the window")["message_id"]
+    message_edit(user_a["token"], m_id, "Out the window")
+    message_react(user_b["token"], m_id, 1)
+    message_unreact(user_b["token"], m_id, 1)
+    message_pin(user_a["token"], m_id)
+    message_unpin(user_a["token"], m_id)
+    message_remove(user_a["token"], m_id)
+
+    event, data = next_event(events)
+    assert event == "send"
+    assert data["channel_id"] == channel_1
+    assert data["message_id"] == m_id
+    assert data["message"] == "Throw it out the window"
+    assert data["u_id"] == user_a["u_id"]
+    assert next_event(events) == (
+        "edit", {"channel_id": channel_1, "message_id": m_id, "message": "Out the window"}
+    )
+    assert next_event(events) == (
+        "react", {"channel_id": channel_1, "message_id": m_id, "u_id": user_b["u_id"]}
+    )
+    assert next_event(events) == (
+        "unreact", {"channel_id": channel_1, "message_id": m_id, "u_id": user_b["u_id"]}
+    )
+    assert next_event(events) == (
+        "pin", {"channel_id": channel_1, "message_id": m_id, "is_pinned": True}
+    )
+    assert next_event(events) == (
+        "pin", {"channel_id": channel_1, "message_id": m_id, "is_pinned": False}
+    )
+    assert next_event(events) == ("remove", {"channel_id": channel_1, "message_id": m_id})
+
+    events.close()
+    assert STREAMS["subscribers"] == {}
+
+    clear()
+
+
+def test_channel_stream_members_only(user_a, user_b):
+    """
+    Test 2 - Only channels the user is a member of at the time are streamed
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_2 = channels_create(user_a["token"], "never broke again", True)["channel_id"]
+    events = channel_stream(user_b["token"])
+
+    message_send(user_a["token"], channel_1, "Not a member yet")
+    channel_join(user_b["token"], channel_2)
+    m_id = message_send(user_a["token"], channel_2, "Member now")["message_id"]
+    channel_leave(user_b["token"], channel_2)
+    message_send(user_a["token"], channel_2, "Not a member anymore")
+    channel_join(user_b["token"], channel_1)
+    m_id_2 = message_send(user_a["token"], channel_1, "Member of the first")["message_id"]
+
+    assert next_event(events)[1]["message_id"] == m_id
+    assert next_event(events)[1]["message_id"] == m_id_2
+
+    events.close()
+    clear()
+
+
+def test_channel_stream_overflow(user_a, user_b, monkeypatch):
+    """
+    Test 3 - A subscriber that falls too far behind is told to fetch again
+    """
+    monkeypatch.setitem(STREAMS, "queue_size", 4)
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], channel_1)
+    events = channel_stream(user_b["token"])
+
+    for i in range(6):
+        message_send(user_a["token"], channel_1, f"message {i}")
+
+    assert next_event(events) == ("overflow", {})
+    assert next_event(events) is None
+    assert STREAMS["subscribers"] == {}
+
+    clear()
+
+
+def test_channel_stream_logout(user_a, monkeypatch):
+    """
+    Test 4 - The stream ends once its session has been logged out
+    """
+    monkeypatch.setitem(STREAMS, "heartbeat", 0.01)
+    events = channel_stream(user_a["token"])
+    assert next(events) == ": connected\n\n"
+    assert next(events) == ": keepalive\n\n"
+
+    auth_logout(user_a["token"])
+    assert next_event(events) is None
+    assert STREAMS["subscribers"] == {}
+
+    clear()
+
+
+def test_channel_stream_logout_busy(user_a, user_b):
+    """
+    Test 5 - Once its session is logged out the stream ends straight away,
+    and nothing sent to a busy channel after that is streamed
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], channel_1)
+    events = channel_stream(user_b["token"])
+    message_send(user_a["token"], channel_1, "Before logout")
+    assert next_event(events)[1]["message"] == "Before logout"
+
+    auth_logout(user_b["token"])
+    for i in range(5):
+        message_send(user_a["token"], channel_1, f"secret after logout {i}")
+    assert [chunk for chunk in events if "secret" in chunk] == []
+    assert STREAMS["subscribers"] == {}
+
+    clear()
+
+
+def test_channel_stream_invalid_token():
+    """
+    Test 6 - AccessError - The token is invalid
+    """
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        channel_stream("not a token")
+
+    clear()
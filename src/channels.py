@@ -11,8 +11,10 @@ from find import find_uid_from_token, find_user_from_token
 from channels_helper import (
     check_name_length,
     make_channel,
-    check_user_in_channel,
 )
+from index import INDEX
+from locks import CHANNELS_LOCK
+from store import add_channel, add_owner
 
 
 ########################################################################
@@ -40,21 +42,16 @@ def channels_create(token, name, is_public):
     # Test for invalid name length - raise exception if invalid
     check_name_length(name)
 
-    # Make a new channel dict and add it to the DATA for channels
-    new_channel = make_channel(name, is_public)
-    DATA["channels"].append(new_channel)
+    # Make a new channel dict and add it to the DATA for channels,
+    # under the lock so no other channel is given the same channel_id
+    with CHANNELS_LOCK:
+        new_channel = make_channel(name, is_public)
+        add_channel(new_channel)
     c_id = new_channel["channel_id"]
 
     # Once channel is made, user should become owner of channel then join
     owner = find_user_from_token(decoded_token)
-    DATA["channels"][c_id - 1]["owner_members"].append(
-        {
-            "u_id": owner["u_id"],
-            "name_first": owner["name_first"],
-            "name_last": owner["name_last"],
-            "profile_img_url": owner["profile_img_url"],
-        }
-    )
+    add_owner(c_id, owner["u_id"])
     channel_join(token, c_id)
 
     return {"channel_id": c_id}
@@ -78,12 +75,13 @@ def channels_list(token):
     # Create a dictionary that will contain all channels user is in
     channels_in = {"channels": []}
 
-    # Loop through channels, if user part of channel add details to channels_in
-    for channel in DATA["channels"]:
-        if check_user_in_channel(find_uid_from_token(decoded_token), channel):
-            channels_in["channels"].append(
-                {"channel_id": channel["channel_id"], "name": channel["name"]}
-            )
+    # Loop through only the channels the user is part of and add their details
+    u_id = find_uid_from_token(decoded_token)
+    for c_id in sorted(INDEX["channels_by_user"].get(u_id, ())):
+        channel = DATA["channels"][c_id - 1]
+        channels_in["channels"].append(
+            {"channel_id": channel["channel_id"], "name": channel["name"]}
+        )
 
     return channels_in
 
@@ -5,6 +5,7 @@ helper functions for channel.py are sourced here
 
 from data import DATA
 from error import InputError
+from index import INDEX
 
 def check_name_length(name):
     """
@@ -53,8 +54,4 @@ def check_user_in_channel(u_id, channel):
     Returns:
         (bool): True if user is part of channel, otherwise false
     """
-    for member in channel["all_members"]:
-        if member["u_id"] == u_id:
-            return True
-
-    return False
+    return u_id in INDEX["members_by_channel"].get(channel["channel_id"], ())
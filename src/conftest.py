@@ -3,8 +3,22 @@ Pytest fixtures thar register users
 """
 
 
+import os
 import pytest
 from auth import auth_register
+from hashing import HASHING
+from sqlite_store import open_sqlite
+
+
+def pytest_configure(config):
+    """
+    Runs the suite against the SQLite backend when FLOCKR_SQLITE is set,
+    the server started by the http tests picks it up too. Passwords are
+    hashed at a low cost so the suite doesn't spend its time hashing
+    """
+    HASHING["params"]["scrypt"] = (2 ** 8, 8, 1)
+    if os.environ.get("FLOCKR_SQLITE"):
+        open_sqlite(os.environ["FLOCKR_SQLITE"])
 
 
 @pytest.fixture
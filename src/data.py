@@ -4,15 +4,21 @@ data storage for runtime persistence
 for all functions
 """
 
+from records import MessageList
+
 global DATA
 DATA = {
     "users": [],
     "channels": [],
     "message_log": {
-        "messages": [],
+        "messages": MessageList(),
         "msg_counter": 1,
     },
     "standup": [],
+    # session_id -> Session, for every user that is logged in
+    "sessions": {},
+    # message_id -> message waiting to be sent by message_sendlater
+    "scheduled": {},
 }
 
 """
@@ -0,0 +1,69 @@
+"""
+encoder.py
+turns the dicts the routes return into the JSON bytes sent back
+
+orjson is used when it is installed, it serialises several times faster
+than the json module, which is used otherwise. Both give the same JSON,
+compact, with non-ASCII characters left as they are, so a client can't
+tell which one the server used.
+"""
+
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def encode_json(data):
+    """
+    Returns:
+        (bytes): data as compact JSON, using the json module
+    """
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_orjson(data):
+    """
+    Returns:
+        (bytes): data as compact JSON, using orjson
+    """
+    # Keys that aren't strings are turned into strings, as the json module does
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+ENCODERS = {"json": encode_json}
+if orjson is not None:
+    ENCODERS["orjson"] = encode_orjson
+
+global ENCODER
+ENCODER = {
+    "name": "orjson" if orjson is not None else "json",
+    "mimetype": "application/json",
+}
+
+
+def encode(data):
+    """
+    Serialises a response with the chosen encoder
+    Parameters:
+        data (dict)
+    Returns:
+        (bytes): JSON
+    """
+    return ENCODERS[ENCODER["name"]](data)
+
+
+def set_encoder(name):
+    """
+    Chooses the encoder responses are serialised with
+    Parameters:
+        name (str): "orjson" or "json"
+    Returns:
+        None
+    """
+    if name not in ENCODERS:
+        raise ValueError(f"No {name} encoder, choose from {', '.join(ENCODERS)}")
+    ENCODER["name"] = name
@@ -0,0 +1,44 @@
+"""
+encoder
+
+Responses are serialised to the same JSON bytes whichever encoder is
+chosen, orjson when it is installed or the json module
+"""
+
+
+import json
+import pytest
+from encoder import ENCODER, ENCODERS, encode, set_encoder
+from other import users_all, clear
+from conftest import user_a, user_b
+
+
+def test_encoders_agree(user_a, user_b):
+    """
+    Test 1 - Every encoder gives the same bytes, that parse back to the data
+    """
+    data = users_all(user_a["token"])
+    data["extra"] = {1: "Ünïcödé ✓", "nested": [1.5, None, True, (2, 3)]}
+
+    encoded = {name: encoder(data) for name, encoder in ENCODERS.items()}
+    for result in encoded.values():
+        assert isinstance(result, bytes)
+        assert result == encoded["json"]
+    assert json.loads(encoded["json"]) == json.loads(json.dumps(data))
+
+    clear()
+
+
+def test_set_encoder():
+    """
+    Test 2 - The chosen encoder is the one used, and only known ones can be chosen
+    """
+    name = ENCODER["name"]
+    try:
+        set_encoder("json")
+        assert encode({"data": "hello"}) == b'{"data":"hello"}'
+        with pytest.raises(ValueError):
+            set_encoder("pickle")
+        assert ENCODER["name"] == "json"
+    finally:
+        set_encoder(name)
@@ -0,0 +1,66 @@
+"""
+etags.py
+ETags for the read-heavy routes, made from the version counters in
+index.py, so a client's copy can be checked against them without
+rebuilding the response it came from
+
+Each function checks what it cheaply can, the token, and membership for a
+channel's details, and raises the error the route's own function would
+otherwise. The route then calls that function, which raises the error
+in the usual way.
+"""
+
+
+from auth import decode_token
+from channel_helper import check_user_in_channel
+from data import DATA
+from find import find_uid_from_token
+from index import VERSIONS, channel_version
+
+
+def make_etag(*parts):
+    """
+    Returns:
+        (str): the parts joined, after the epoch
+    """
+    return "-".join(map(str, (VERSIONS["epoch"],) + parts))
+
+
+def channel_details_etag(token, channel_id):
+    """
+    Changes when the channel's members, owners or their profiles change
+    """
+    check_user_in_channel(decode_token(token), channel_id)
+    return make_etag("details", channel_id, *channel_version(DATA["channels"][channel_id - 1]))
+
+
+def channels_list_etag(token):
+    """
+    Changes when channels are created or anyone joins or leaves a channel
+    """
+    u_id = find_uid_from_token(decode_token(token))
+    return make_etag("list", u_id, VERSIONS["channels"], VERSIONS["members"])
+
+
+def channels_listall_etag(token):
+    """
+    Changes when channels are created, channel names never change
+    """
+    find_uid_from_token(decode_token(token))
+    return make_etag("listall", VERSIONS["channels"])
+
+
+def users_all_etag(token):
+    """
+    Changes when users register or any profile changes
+    """
+    find_uid_from_token(decode_token(token))
+    return make_etag("users", VERSIONS["users"])
+
+
+def user_profile_etag(token, u_id):
+    """
+    Changes when the user's profile changes
+    """
+    find_uid_from_token(decode_token(token))
+    return make_etag("profile", u_id, VERSIONS["by_user"].get(u_id, 0))
@@ -0,0 +1,75 @@
+"""
+etags_http_test
+
+Testing that the read-heavy routes answer with 304 Not Modified while the
+client's copy, named in If-None-Match, is still current, with http
+implementation
+"""
+
+
+import requests
+from echo_http_test import url
+from conftest_http import user_a, user_b
+from http_channel_functions import http_channel_join
+from http_channels_functions import http_channels_create
+
+
+def test_etags_http_not_modified(url, user_a, user_b):
+    """
+    Test 1 - An unchanged channel's details are 304 Not Modified, until a
+    member joins
+    """
+    channel_1 = http_channels_create(url, user_a["token"], "billionaire records", True).json()
+    params = {"token": user_a["token"], "channel_id": channel_1["channel_id"]}
+
+    first = requests.get(f"{url}/channel/details", params=params)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = {"If-None-Match": etag}
+    second = requests.get(f"{url}/channel/details", params=params, headers=cached)
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+    http_channel_join(url, user_b["token"], channel_1["channel_id"])
+    third = requests.get(f"{url}/channel/details", params=params, headers=cached)
+    assert third.status_code == 200
+    assert third.headers["ETag"] != etag
+    assert len(third.json()["all_members"]) == 2
+
+    requests.delete(f"{url}/clear")
+
+
+def test_etags_http_routes(url, user_a):
+    """
+    Test 2 - Every tagged route answers its own ETag with 304
+    """
+    http_channels_create(url, user_a["token"], "billionaire records", True)
+    routes = [
+        ("channels/list", {}),
+        ("channels/listall", {}),
+        ("users/all", {}),
+        ("user/profile", {"u_id": user_a["u_id"]}),
+    ]
+    for route, params in routes:
+        params["token"] = user_a["token"]
+        first = requests.get(f"{url}/{route}", params=params)
+        assert first.status_code == 200
+        second = requests.get(
+            f"{url}/{route}", params=params, headers={"If-None-Match": first.headers["ETag"]}
+        )
+        assert second.status_code == 304
+
+    requests.delete(f"{url}/clear")
+
+
+def test_etags_http_invalid_token(url, user_a):
+    """
+    Test 3 - Access Error - An invalid token is refused, whatever ETag it sends
+    """
+    params = {"token": "not_a_token"}
+    payload = requests.get(f"{url}/users/all", params=params, headers={"If-None-Match": "*"})
+    assert payload.status_code == 400
+
+    requests.delete(f"{url}/clear")
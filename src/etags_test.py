@@ -0,0 +1,115 @@
+"""
+etags
+
+Each read-heavy route's ETag changes when, and only when, what the route
+returns could have changed, and the token and membership are checked
+before an ETag is given
+"""
+
+
+import pytest
+from auth import auth_register
+from channel import channel_join, channel_leave
+from channels import channels_create
+from error import AccessError
+from etags import (
+    channel_details_etag,
+    channels_list_etag,
+    channels_listall_etag,
+    users_all_etag,
+    user_profile_etag,
+)
+from message import message_send
+from other import clear
+from user import user_profile_setname, user_profile_sethandle
+from conftest import user_a, user_b
+
+
+def etags(user_a, user_b, channel_id):
+    """
+    Returns:
+        (tuple): every ETag user_a can be given
+    """
+    return (
+        channel_details_etag(user_a["token"], channel_id),
+        channels_list_etag(user_a["token"]),
+        channels_listall_etag(user_a["token"]),
+        users_all_etag(user_a["token"]),
+        user_profile_etag(user_a["token"], user_b["u_id"]),
+    )
+
+
+def test_etags_unchanged(user_a, user_b):
+    """
+    Test 1 - ETags stay the same while nothing they cover changes, sending
+    a message doesn't change a channel's details
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    before = etags(user_a, user_b, channel_1)
+    message_send(user_a["token"], channel_1, "Hello")
+    assert etags(user_a, user_b, channel_1) == before
+
+    clear()
+
+
+def test_etags_changed(user_a, user_b):
+    """
+    Test 2 - ETags change with the channels, members and profiles they cover
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+
+    before = etags(user_a, user_b, channel_1)
+    channel_join(user_b["token"], channel_1)
+    after = etags(user_a, user_b, channel_1)
+    # Details and list change, listall, users and user_b's profile don't
+    assert [old == new for old, new in zip(before, after)] == [False, False, True, True, True]
+
+    before = after
+    user_profile_setname(user_b["token"], "Jerry", "Chen")
+    after = etags(user_a, user_b, channel_1)
+    assert [old == new for old, new in zip(before, after)] == [False, True, True, False, False]
+
+    before = after
+    channels_create(user_b["token"], "top dawg", True)
+    after = etags(user_a, user_b, channel_1)
+    assert [old == new for old, new in zip(before, after)] == [True, False, False, True, True]
+
+    before = after
+    user_profile_sethandle(user_b["token"], "jerrychen")
+    channel_leave(user_b["token"], channel_1)
+    after = etags(user_a, user_b, channel_1)
+    assert [old == new for old, new in zip(before, after)] == [False, False, True, False, False]
+
+    clear()
+
+
+def test_etags_clear(user_a, user_b):
+    """
+    Test 3 - No ETag from before a clear is given out again afterwards
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    before = etags(user_a, user_b, channel_1)
+    clear()
+
+    # The same users and channel again, made the same way
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    assert not set(before) & set(etags(user_a, user_b, channel_1))
+
+    clear()
+
+
+def test_etags_access(user_a, user_b):
+    """
+    Test 4 - Access Error - Invalid token, or not a member of the channel
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    with pytest.raises(AccessError):
+        channel_details_etag(user_b["token"], channel_1)
+    with pytest.raises(AccessError):
+        users_all_etag("not_a_token")
+    with pytest.raises(AccessError):
+        channels_list_etag("not_a_token")
+
+    clear()
@@ -4,13 +4,33 @@ find functions used in various files are sourced from here
 """
 
 
+import time
 from data import DATA
 from error import InputError, AccessError
+from index import INDEX
 
 
 # _____________________________Find token______________________________#
 
 
+def find_session(token):
+    """
+    Finds the session of the token passed in, marking it as just used so
+    it isn't expired while the user is active
+    Parameters:
+        token (str): the session_id, as decoded from the token
+    Returns:
+        session (Session): if the session is found, otherwise
+        raise AccessError for invalid user token
+    """
+    session = DATA["sessions"].get(token)
+    if session is None:
+        raise AccessError(description="Invalid Token")
+
+    session.last_seen = time.time()
+    return session
+
+
 def find_uid_from_token(token):
     """
     Finds the uid of a user from the token passed in
@@ -20,11 +40,7 @@ def find_uid_from_token(token):
         user["u_id"] (int): if token match is found, otherwise
         raise AccessError for invalid user token
     """
-    for user in DATA["users"]:
-        if user["token"] == token:
-            return user["u_id"]
-
-    raise AccessError(description="Invalid Token")
+    return find_session(token).u_id
 
 
 # ______________________________Find User______________________________#
@@ -39,11 +55,7 @@ def find_user_from_token(token):
         user (dictionary): contains all the details of the user
         otherwise nothing if token match is not found
     """
-    for user in DATA["users"]:
-        if user["token"] == token:
-            return user
-
-    raise AccessError(description="Invalid Token")
+    return INDEX["users_by_uid"][find_session(token).u_id]
 
 
 def find_user_from_uid(u_id):
@@ -54,9 +66,9 @@ def find_user_from_uid(u_id):
     Returns:
         user (dict): details of the user
     """
-    for user in DATA["users"]:
-        if user["u_id"] == u_id:
-            return user
+    user = INDEX["users_by_uid"].get(u_id)
+    if user:
+        return user
 
     raise InputError(description="Invalid User ID")
 
@@ -72,9 +84,4 @@ def find_cid_from_mid(m_id):
     Returns:
         channel["channel_id"], otherwise if not found then False
     """
-    for channel in DATA["channels"]:
-        for message_id in channel["messages"]:
-            if message_id == m_id:
-                m_id_match = channel["channel_id"]
-
-    return m_id_match
+    return INDEX["channel_by_message"].get(m_id, False)
@@ -0,0 +1,265 @@
+"""
+hashing.py
+hashes and checks passwords with a slow key derivation function, run in a
+pool of worker processes so request threads aren't held up by it
+
+At most limit jobs are handed to the pool at once, any more wait their
+turn, which keeps a burst of logins or a big import from queueing up
+unbounded work behind the ones already running. A job is one hash, or a
+small chunk of a batch. waiting and running give the queue depth, in hashes.
+
+Hashes are stored as "kdf$params$salt$hash". Passwords hashed before this,
+with a single unsalted sha256, are still accepted and are rehashed with
+the current KDF the next time the user logs in.
+"""
+
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+
+global HASHING
+HASHING = {
+    # "scrypt" or "pbkdf2_sha256", with the parameters new hashes are made with
+    "kdf": "scrypt",
+    "params": {
+        "scrypt": (2 ** 14, 8, 1),
+        "pbkdf2_sha256": (600000,),
+    },
+    "workers": os.cpu_count() or 1,
+    # Most hashes handed to the pool at once, None for twice the workers
+    "limit": None,
+    "pool": None,
+    "slots": None,
+    # Most hashes of a batch handed to the pool as one job, so a login
+    # never waits long behind an import
+    "chunk": 16,
+    # Held while the pool is started or stopped and the counters change
+    "lock": threading.Lock(),
+    "waiting": 0,
+    "running": 0,
+    "max_waiting": 0,
+    "hashed": 0,
+}
+
+
+# _________________________________KDFs__________________________________#
+
+
+def derive(kdf, params, password, salt):
+    """
+    Runs the KDF, in a worker process
+    Parameters:
+        kdf (str)
+        params (tuple)
+        password (str)
+        salt (bytes)
+    Returns:
+        (str): the derived key in hex
+    """
+    if kdf == "scrypt":
+        n, r, p = params
+        key = hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32
+        )
+    else:
+        key = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params[0])
+    return key.hex()
+
+
+def derive_many(kdf, params, passwords, salts):
+    """
+    Runs the KDF over a chunk of passwords, in a worker process
+    Returns:
+        (list): the derived keys in hex, in the same order
+    """
+    return [derive(kdf, params, password, salt) for password, salt in zip(passwords, salts)]
+
+
+def format_hash(kdf, params, salt, key):
+    """
+    Returns:
+        (str): the hash as it is stored, "kdf$params$salt$hash"
+    """
+    return "$".join((kdf, ",".join(map(str, params)), salt.hex(), key))
+
+
+def parse_hash(password_hash):
+    """
+    Parameters:
+        password_hash (str): as stored
+    Returns:
+        (kdf, params, salt, key) (tuple): None for a legacy sha256 hash
+    """
+    if "$" not in password_hash:
+        return None
+    kdf, params, salt, key = password_hash.split("$")
+    return kdf, tuple(map(int, params.split(","))), bytes.fromhex(salt), key
+
+
+# _________________________________Pool__________________________________#
+
+
+def start_pool():
+    """
+    Starts the worker processes if they aren't running yet, the caller
+    must hold the hashing lock
+    """
+    if HASHING["pool"] is None:
+        # Spawned rather than forked, since the server has threads running
+        HASHING["pool"] = ProcessPoolExecutor(
+            max_workers=HASHING["workers"], mp_context=get_context("spawn")
+        )
+        HASHING["slots"] = threading.BoundedSemaphore(
+            HASHING["limit"] or 2 * HASHING["workers"]
+        )
+
+
+def stop_pool():
+    """
+    Stops the worker processes, the next hash starts them again
+    """
+    with HASHING["lock"]:
+        pool = HASHING["pool"]
+        HASHING["pool"] = None
+    if pool is not None:
+        pool.shutdown()
+
+
+def enter_pool(count):
+    """
+    Starts the pool if needed and counts count hashes as waiting for a slot
+    Returns:
+        (pool, slots) (tuple)
+    """
+    with HASHING["lock"]:
+        start_pool()
+        HASHING["waiting"] += count
+        HASHING["max_waiting"] = max(HASHING["max_waiting"], HASHING["waiting"])
+        return HASHING["pool"], HASHING["slots"]
+
+
+def submit_kdf(pool, slots, count, function, *args):
+    """
+    Hands a job of count hashes to the pool once a slot is free, the slot
+    is given back as soon as the job finishes
+    Returns:
+        (Future): of what function returns
+    """
+    slots.acquire()
+    with HASHING["lock"]:
+        HASHING["waiting"] -= count
+        HASHING["running"] += count
+
+    def finish(_future):
+        with HASHING["lock"]:
+            HASHING["running"] -= count
+            HASHING["hashed"] += count
+        slots.release()
+
+    try:
+        future = pool.submit(function, *args)
+    except BaseException:
+        finish(None)
+        raise
+    future.add_done_callback(finish)
+    return future
+
+
+def run_kdf(kdf, params, password, salt):
+    """
+    Runs the KDF in the pool, waiting for a free slot first
+    Returns:
+        (str): the derived key in hex
+    """
+    pool, slots = enter_pool(1)
+    return submit_kdf(pool, slots, 1, derive, kdf, params, password, salt).result()
+
+
+def queue_depth():
+    """
+    Returns:
+        (dict): hashes waiting for a slot, hashes running, the most that
+            have waited at once and how many have been hashed
+    """
+    with HASHING["lock"]:
+        return {
+            field: HASHING[field] for field in ("waiting", "running", "max_waiting", "hashed")
+        }
+
+
+# _______________________________Passwords_______________________________#
+
+
+def hash_password(password):
+    """
+    Hashes a password with the current KDF and a new salt
+    Parameters:
+        password (str)
+    Returns:
+        (str): the hash to store
+    """
+    kdf = HASHING["kdf"]
+    params = HASHING["params"][kdf]
+    salt = secrets.token_bytes(16)
+    return format_hash(kdf, params, salt, run_kdf(kdf, params, password, salt))
+
+
+def hash_passwords(passwords):
+    """
+    Hashes a batch of passwords in chunks, as many at once as there are free slots
+    Parameters:
+        passwords (list)
+    Returns:
+        (list): the hashes to store, in the same order
+    """
+    if not passwords:
+        return []
+    kdf = HASHING["kdf"]
+    params = HASHING["params"][kdf]
+    salts = [secrets.token_bytes(16) for _ in passwords]
+
+    # Each chunk takes a slot like any other hash, so a big import shares
+    # the pool with logins instead of queueing its whole batch ahead of them
+    size = min(HASHING["chunk"], max(1, len(passwords) // (4 * HASHING["workers"])))
+    chunks = [
+        (passwords[start:start + size], salts[start:start + size])
+        for start in range(0, len(passwords), size)
+    ]
+    pool, slots = enter_pool(len(passwords))
+    futures = []
+    try:
+        for chunk, chunk_salts in chunks:
+            futures.append(
+                submit_kdf(pool, slots, len(chunk), derive_many, kdf, params, chunk, chunk_salts)
+            )
+    finally:
+        with HASHING["lock"]:
+            HASHING["waiting"] -= sum(len(chunk) for chunk, _ in chunks[len(futures):])
+    keys = [key for future in futures for key in future.result()]
+    return [format_hash(kdf, params, salt, key) for salt, key in zip(salts, keys)]
+
+
+def check_password_hash(password, password_hash):
+    """
+    Checks a password against its stored hash
+    Parameters:
+        password (str)
+        password_hash (str): as stored
+    Returns:
+        (matches, outdated) (tuple): whether the password matches, and
+            whether the hash should be replaced with one made by hash_password
+    """
+    parsed = parse_hash(password_hash)
+    if parsed is None:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, password_hash), True
+
+    kdf, params, salt, key = parsed
+    matches = hmac.compare_digest(run_kdf(kdf, params, password, salt), key)
+    return matches, (kdf, params) != (HASHING["kdf"], HASHING["params"][HASHING["kdf"]])
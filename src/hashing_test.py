@@ -0,0 +1,128 @@
+"""
+hashing
+
+Passwords are stored as salted KDF hashes computed in a pool of worker
+processes. Passwords still stored as a plain sha256 are rehashed with the
+current KDF when the user next logs in
+"""
+
+
+import hashlib
+import threading
+import pytest
+from auth import auth_login, auth_register
+from data import DATA
+from error import InputError
+from hashing import HASHING, hash_password, hash_passwords, check_password_hash, queue_depth
+from hashing import stop_pool
+from other import clear
+from store import set_password
+
+
+def test_hashing_register():
+    """
+    Test 1 - Registering stores a salted scrypt hash that logging in checks
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_b = auth_register("jerrychan@gmail.com", "youngboynba123", "Jerry", "Chan")
+
+    hash_a = DATA["users"][user_a["u_id"] - 1]["password"]
+    hash_b = DATA["users"][user_b["u_id"] - 1]["password"]
+    assert hash_a.startswith("scrypt$")
+    # Same password, different salts
+    assert hash_a != hash_b
+
+    assert auth_login("nbayoungboy@gmail.com", "youngboynba123")["u_id"] == user_a["u_id"]
+    with pytest.raises(InputError, match=r"Incorrect password"):
+        auth_login("nbayoungboy@gmail.com", "youngboynba124")
+
+    clear()
+
+
+def test_hashing_upgrade_legacy():
+    """
+    Test 2 - A legacy sha256 hash is replaced on the next login
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    set_password(user_a["u_id"], hashlib.sha256("youngboynba123".encode()).hexdigest())
+
+    with pytest.raises(InputError, match=r"Incorrect password"):
+        auth_login("nbayoungboy@gmail.com", "youngboynba124")
+    assert "$" not in DATA["users"][0]["password"]
+
+    auth_login("nbayoungboy@gmail.com", "youngboynba123")
+    assert DATA["users"][0]["password"].startswith("scrypt$")
+    assert auth_login("nbayoungboy@gmail.com", "youngboynba123")["u_id"] == user_a["u_id"]
+
+    clear()
+
+
+def test_hashing_change_kdf():
+    """
+    Test 3 - Hashes made with another KDF still match but are outdated
+    """
+    password_hash = hash_password("youngboynba123")
+    pbkdf2 = HASHING["params"]["pbkdf2_sha256"]
+    HASHING["kdf"] = "pbkdf2_sha256"
+    HASHING["params"]["pbkdf2_sha256"] = (1000,)
+    try:
+        assert check_password_hash("youngboynba123", password_hash) == (True, True)
+
+        new_hash = hash_password("youngboynba123")
+        assert new_hash.startswith("pbkdf2_sha256$1000$")
+        assert check_password_hash("youngboynba123", new_hash) == (True, False)
+        assert check_password_hash("youngboynba124", new_hash) == (False, False)
+    finally:
+        HASHING["kdf"] = "scrypt"
+        HASHING["params"]["pbkdf2_sha256"] = pbkdf2
+
+
+def test_hashing_queue_depth():
+    """
+    Test 4 - Every hash of a burst is counted and none are left queued
+    """
+    hashed = queue_depth()["hashed"]
+    threads = [threading.Thread(target=hash_password, args=("password",)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    depth = queue_depth()
+    assert depth["hashed"] == hashed + 20
+    assert depth["waiting"] == 0
+    assert depth["running"] == 0
+
+
+def test_hashing_bulk_bounded():
+    """
+    Test 5 - A batch of passwords never has more hashes running than the
+    limit, and every one is counted
+    """
+    stop_pool()
+    limit, chunk = HASHING["limit"], HASHING["chunk"]
+    HASHING["limit"] = 2
+    HASHING["chunk"] = 1
+    try:
+        hashed = queue_depth()["hashed"]
+        most_running = []
+        done = threading.Event()
+
+        def watch():
+            while not done.is_set():
+                most_running.append(queue_depth()["running"])
+
+        watcher = threading.Thread(target=watch)
+        watcher.start()
+        hashes = hash_passwords([f"password{i}" for i in range(12)])
+        done.set()
+        watcher.join()
+
+        assert max(most_running) <= 2
+        assert check_password_hash("password11", hashes[11])[0]
+        depth = queue_depth()
+        assert depth["hashed"] == hashed + 12 + 1
+        assert (depth["waiting"], depth["running"]) == (0, 0)
+    finally:
+        stop_pool()
+        HASHING["limit"], HASHING["chunk"] = limit, chunk
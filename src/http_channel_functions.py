@@ -146,6 +146,29 @@ def http_channel_messages(url, token, channel_id, start):
     return requests.get(f"{url}/channel/messages", params=channel_messages_info)
 
 
+def http_channel_messages_since(url, token, channel_id, seq, timeout):
+    """
+    Function that makes a HTTP request for the changes to a channel's
+    messages since seq, waiting up to timeout seconds for one
+    Parameters:
+        url
+        token (str)
+        channel_id (int)
+        seq (int)
+        timeout (float)
+    Returns:
+        JSON data returned from request
+    """
+    channel_messages_since_info = {
+        "token": token,
+        "channel_id": channel_id,
+        "seq": seq,
+        "timeout": timeout,
+    }
+
+    return requests.get(f"{url}/channel/messages/since", params=channel_messages_since_info)
+
+
 def http_channel_removemember(url, token, channel_id, u_id):
     """
     Function that makes a HTTP request for a user to view the channel's messages
@@ -92,6 +92,44 @@ def http_message_sendlater(url, token, channel_id, message, time_sent):
     return requests.post(f"{url}/message/sendlater", json=message_sendlater_info)
 
 
+def http_message_sendlater_list(url, token, channel_id):
+    """
+    Function that makes a HTTP request to list the messages waiting
+    to be sent later to a channel
+    Parameters:
+        url
+        token (str)
+        channel_id (int)
+    Returns:
+        messages (list)
+    """
+    message_sendlater_list_info = {
+        "token": token,
+        "channel_id": channel_id,
+    }
+
+    return requests.get(f"{url}/message/sendlater/list", params=message_sendlater_list_info)
+
+
+def http_message_sendlater_cancel(url, token, m_id):
+    """
+    Function that makes a HTTP request to cancel a message waiting
+    to be sent later
+    Parameters:
+        url
+        token (str)
+        m_id (int)
+    Returns:
+        None
+    """
+    message_sendlater_cancel_info = {
+        "token": token,
+        "message_id": m_id,
+    }
+
+    return requests.post(f"{url}/message/sendlater/cancel", json=message_sendlater_cancel_info)
+
+
 def http_message_react(url, token, m_id, react_id):
     """
     Function that makes a HTTP request to react to a message
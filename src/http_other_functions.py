@@ -5,6 +5,7 @@ HTTP functions of other functions for testing
 """
 
 
+import json
 import requests
 
 
@@ -28,6 +29,21 @@ def http_admin_userpermission_change(url, token, u_id, permission_id):
     return requests.post(f"{url}/admin/userpermission/change", json=admin_userpermission_change_info)
 
 
+def http_admin_users_import(url, token, rows):
+    """
+    Function that makes a HTTP request to import a batch of users
+    Parameters:
+        url
+        token (str)
+        rows (list): of dicts, sent as JSON lines
+    Returns:
+        u_ids and errors (dict)
+    """
+    lines = "".join(json.dumps(row) + "\n" for row in rows)
+
+    return requests.post(f"{url}/admin/users/import", params={"token": token}, data=lines)
+
+
 def http_search(url, token, query_str):
     """
     Function that makes a HTTP request to search for messages
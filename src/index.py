@@ -0,0 +1,712 @@
+"""
+index.py
+lookup indexes over DATA, kept in step with DATA by the
+functions that mutate it so finds don't need to scan
+"""
+
+
+import threading
+import time
+from journal import JOURNAL
+
+
+global INDEX
+INDEX = {
+    "users_by_uid": {},
+    "users_by_email": {},
+    "users_by_handle": {},
+    # handle stem -> number to try first when numbering a taken handle,
+    # so the Nth user with the same name doesn't retry the N-1 before them
+    "handle_matches": {},
+    "messages_by_id": {},
+    "channel_by_message": {},
+    # u_id -> message_ids that user has sent, so search starts from them
+    "messages_by_user": {},
+    "members_by_channel": {},
+    "owners_by_channel": {},
+    "channels_by_user": {},
+    # channel_id -> (version, (owner_members, all_members)) as
+    # channel_details returns them, only used while the epoch and the
+    # channel's version, see channel_version, are still the ones they
+    # were rendered at
+    "member_views_by_channel": {},
+    "messages_by_trigram": {},
+    # message_id -> u_ids who have reacted, only for messages with a react
+    "reacts_by_message": {},
+    "standups_by_channel": {},
+    # channel_id -> message_ids waiting to be sent to it by message_sendlater
+    "scheduled_by_channel": {},
+    "sessions_by_user": {},
+}
+
+# Version counters for what the read-heavy routes return, so a client's
+# copy can be checked against them without rebuilding the response.
+# Counters only go up, and epoch changes on startup and on clear, so a
+# version is never handed out twice for different contents
+global VERSIONS
+VERSIONS = {
+    "epoch": time.time_ns() // 1000,
+    # Users registered or profiles changed, channels created, and
+    # members joining or leaving any channel
+    "users": 0,
+    "channels": 0,
+    "members": 0,
+    # u_id -> changes to that user's profile
+    "by_user": {},
+    # channel_id -> changes to that channel's members, see channel_version
+    # for its members' profiles
+    "by_channel": {},
+}
+
+# The trigram index is dropped when DATA is loaded in one go, so startup
+# doesn't wait on it, and rebuilt by a background builder without holding
+# the journal lock. Changes made while it builds are logged in pending and
+# applied before it is switched over to, until then searches scan
+global TRIGRAMS
+TRIGRAMS = {
+    "built": True,
+    # (added, m_id, text) for each change made during a build, None when
+    # no build is running
+    "pending": None,
+    # Bumped whenever the index is dropped or cleared, a build started
+    # before then is thrown away
+    "generation": 0,
+    # Held while the builder is started
+    "lock": threading.Lock(),
+    "builder": None,
+}
+
+
+# _____________________________User Index______________________________#
+
+
+def index_user(user):
+    """
+    Adds a newly registered user to the user indexes
+    Parameters:
+        user (User): the user as stored in DATA["users"]
+    Returns:
+        None
+    """
+    INDEX["users_by_uid"][user["u_id"]] = user
+    INDEX["users_by_email"].setdefault(user["email"], user)
+    INDEX["users_by_handle"].setdefault(user["handle_str"], user)
+    touch_user(user["u_id"])
+
+
+def reindex_email(user, old_email):
+    """
+    Moves a user to their new email in the email index
+    Parameters:
+        user (User): user whose email has already been changed
+        old_email (str)
+    Returns:
+        None
+    """
+    if INDEX["users_by_email"].get(old_email) is user:
+        del INDEX["users_by_email"][old_email]
+    INDEX["users_by_email"].setdefault(user["email"], user)
+    touch_user(user["u_id"])
+
+
+def reindex_handle(user, old_handle):
+    """
+    Moves a user to their new handle in the handle index
+    Parameters:
+        user (User): user whose handle has already been changed
+        old_handle (str)
+    Returns:
+        None
+    """
+    if INDEX["users_by_handle"].get(old_handle) is user:
+        del INDEX["users_by_handle"][old_handle]
+    INDEX["users_by_handle"].setdefault(user["handle_str"], user)
+    touch_user(user["u_id"])
+
+
+def touch_user(u_id):
+    """
+    Bumps the versions a change to a user's profile makes stale
+    Parameters:
+        u_id (int)
+    Returns:
+        None
+    """
+    VERSIONS["users"] += 1
+    VERSIONS["by_user"][u_id] = VERSIONS["by_user"].get(u_id, 0) + 1
+
+
+# ____________________________Message Index____________________________#
+
+
+def index_message(message, channel_id):
+    """
+    Adds a sent message to the message indexes
+    Parameters:
+        message (Message): the message as stored in DATA["message_log"]
+        channel_id (int): the channel the message was sent to
+    Returns:
+        None
+    """
+    INDEX["messages_by_id"][message["message_id"]] = message
+    INDEX["channel_by_message"][message["message_id"]] = channel_id
+    INDEX["messages_by_user"].setdefault(message.u_id, set()).add(message.message_id)
+    if message.react_u_ids:
+        INDEX["reacts_by_message"][message.message_id] = set(message.react_u_ids)
+    index_trigrams(message["message_id"], message["message"])
+
+
+def unindex_message(m_id):
+    """
+    Removes a message from the message indexes
+    Parameters:
+        m_id (int)
+    Returns:
+        None
+    """
+    message = INDEX["messages_by_id"].pop(m_id, None)
+    INDEX["channel_by_message"].pop(m_id, None)
+    INDEX["reacts_by_message"].pop(m_id, None)
+    if message:
+        INDEX["messages_by_user"].get(message.u_id, set()).discard(m_id)
+        unindex_trigrams(m_id, message["message"])
+
+
+def index_messages(messages, channels):
+    """
+    Indexes every message at once, leaving the trigram index to be built
+    by the first search
+    Parameters:
+        messages (list): as stored in DATA["message_log"]
+        channels (list): as stored in DATA["channels"]
+    Returns:
+        None
+    """
+    INDEX["messages_by_id"].update({message["message_id"]: message for message in messages})
+    messages_by_user = INDEX["messages_by_user"]
+    for message in messages:
+        messages_by_user.setdefault(message.u_id, set()).add(message.message_id)
+    INDEX["reacts_by_message"].update(
+        {
+            message.message_id: set(message.react_u_ids)
+            for message in messages
+            if message.react_u_ids
+        }
+    )
+    channel_by_message = INDEX["channel_by_message"]
+    for channel in channels:
+        channel_by_message.update(dict.fromkeys(channel["messages"], channel["channel_id"]))
+    drop_trigrams()
+
+
+def reindex_message_text(message, old_text):
+    """
+    Moves an edited message's postings from its old text to its new text
+    Parameters:
+        message (Message): message whose text has already been changed
+        old_text (str)
+    Returns:
+        None
+    """
+    unindex_trigrams(message["message_id"], old_text)
+    index_trigrams(message["message_id"], message["message"])
+
+
+def index_react(m_id, u_id):
+    """
+    Records a user reacting to a message
+    Parameters:
+        m_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    INDEX["reacts_by_message"].setdefault(m_id, set()).add(u_id)
+
+
+def unindex_react(m_id, u_id):
+    """
+    Records a user taking their react off a message
+    Parameters:
+        m_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    reactors = INDEX["reacts_by_message"].get(m_id)
+    if reactors is not None:
+        reactors.discard(u_id)
+        if not reactors:
+            del INDEX["reacts_by_message"][m_id]
+
+
+# _____________________________Search Index____________________________#
+
+
+def trigrams(text):
+    """
+    Splits text into its distinct overlapping 3 character substrings
+    Parameters:
+        text (str)
+    Returns:
+        (set): empty if the text is shorter than 3 characters
+    """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def index_trigrams(m_id, text):
+    """
+    Adds a message to the posting list of every trigram in its text
+    Parameters:
+        m_id (int)
+        text (str)
+    Returns:
+        None
+    """
+    if TRIGRAMS["built"]:
+        add_postings(INDEX["messages_by_trigram"], m_id, text)
+    elif TRIGRAMS["pending"] is not None:
+        TRIGRAMS["pending"].append((True, m_id, text))
+
+
+def add_postings(postings, m_id, text):
+    """
+    Adds a message to the posting list of every trigram in its text
+    Parameters:
+        postings (dict): trigram -> message ids
+        m_id (int)
+        text (str)
+    Returns:
+        None
+    """
+    for trigram in trigrams(text):
+        posting = postings.get(trigram)
+        if posting is None:
+            postings[trigram] = {m_id}
+        else:
+            posting.add(m_id)
+
+
+def unindex_trigrams(m_id, text):
+    """
+    Removes a message from the posting list of every trigram in its text,
+    dropping posting lists that become empty
+    Parameters:
+        m_id (int)
+        text (str)
+    Returns:
+        None
+    """
+    if TRIGRAMS["built"]:
+        remove_postings(INDEX["messages_by_trigram"], m_id, text)
+    elif TRIGRAMS["pending"] is not None:
+        TRIGRAMS["pending"].append((False, m_id, text))
+
+
+def remove_postings(postings, m_id, text):
+    """
+    Removes a message from the posting list of every trigram in its text,
+    dropping posting lists that become empty
+    Parameters:
+        postings (dict): trigram -> message ids
+        m_id (int)
+        text (str)
+    Returns:
+        None
+    """
+    for trigram in trigrams(text):
+        posting = postings.get(trigram)
+        if posting is not None:
+            posting.discard(m_id)
+            if not posting:
+                del postings[trigram]
+
+
+def drop_trigrams():
+    """
+    Empties the trigram index and stops maintaining it until it is rebuilt
+    """
+    INDEX["messages_by_trigram"].clear()
+    TRIGRAMS["built"] = False
+    TRIGRAMS["pending"] = None
+    TRIGRAMS["generation"] += 1
+
+
+def build_trigrams():
+    """
+    Rebuilds the trigram index from every indexed message, if it was
+    dropped. The journal lock is only held to start logging changes and
+    to apply them and switch over at the end, never while building
+    """
+    with JOURNAL["lock"]:
+        if TRIGRAMS["built"]:
+            return
+        generation = TRIGRAMS["generation"]
+        TRIGRAMS["pending"] = []
+        messages = list(INDEX["messages_by_id"].values())
+
+    # A message edited or removed after this point is logged in pending,
+    # so reading a newer text than was copied here is put right by it
+    postings = {}
+    for message in messages:
+        add_postings(postings, message.message_id, message.message)
+
+    with JOURNAL["lock"]:
+        if TRIGRAMS["generation"] != generation:
+            # Dropped or cleared since the build started
+            return
+        for added, m_id, text in TRIGRAMS["pending"]:
+            (add_postings if added else remove_postings)(postings, m_id, text)
+        INDEX["messages_by_trigram"] = postings
+        TRIGRAMS["pending"] = None
+        TRIGRAMS["built"] = True
+
+
+def start_trigram_builder():
+    """
+    Starts rebuilding the trigram index in the background, if it was
+    dropped and isn't already being rebuilt
+    """
+    with TRIGRAMS["lock"]:
+        builder = TRIGRAMS["builder"]
+        if TRIGRAMS["built"] or (builder is not None and builder.is_alive()):
+            return
+        TRIGRAMS["builder"] = threading.Thread(target=build_trigrams, daemon=True)
+        TRIGRAMS["builder"].start()
+
+
+def trigrams_ready():
+    """
+    Returns:
+        (bool): True if the trigram index is complete, otherwise starts
+            rebuilding it and returns False
+    """
+    if TRIGRAMS["built"]:
+        return True
+    start_trigram_builder()
+    return False
+
+
+def wait_trigrams():
+    """
+    Waits for a background rebuild of the trigram index to finish
+    """
+    builder = TRIGRAMS["builder"]
+    if builder is not None:
+        builder.join()
+
+
+def find_trigram_candidates(query_str, within=None):
+    """
+    Finds the messages that contain every trigram of the query, a superset
+    of the messages that contain the query itself. The trigram index must
+    be complete, see trigrams_ready
+    Parameters:
+        query_str (str): at least 3 characters long
+        within (set): only message ids in it are candidates, None for any
+    Returns:
+        (set): message ids that may contain the query
+    """
+    postings = []
+    for trigram in trigrams(query_str):
+        posting = INDEX["messages_by_trigram"].get(trigram)
+        if not posting:
+            return set()
+        postings.append(posting)
+
+    if within is not None:
+        postings.append(within)
+    # Intersect starting from the smallest set so the working set stays small
+    postings.sort(key=len)
+    candidates = set(postings[0])
+    for posting in postings[1:]:
+        candidates &= posting
+        if not candidates:
+            break
+
+    return candidates
+
+
+# ____________________________Channel Index____________________________#
+
+
+def index_channel(channel_id):
+    """
+    Sets up empty member and owner sets for a newly created channel
+    Parameters:
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["members_by_channel"][channel_id] = set()
+    INDEX["owners_by_channel"][channel_id] = set()
+    VERSIONS["channels"] += 1
+    touch_channel(channel_id)
+
+
+def index_member(u_id, channel_id):
+    """
+    Records a user joining a channel
+    Parameters:
+        u_id (int)
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["members_by_channel"][channel_id].add(u_id)
+    INDEX["channels_by_user"].setdefault(u_id, set()).add(channel_id)
+    VERSIONS["members"] += 1
+    touch_channel(channel_id)
+
+
+def unindex_member(u_id, channel_id):
+    """
+    Records a user leaving or being removed from a channel
+    Parameters:
+        u_id (int)
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["members_by_channel"][channel_id].discard(u_id)
+    INDEX["channels_by_user"].get(u_id, set()).discard(channel_id)
+    VERSIONS["members"] += 1
+    touch_channel(channel_id)
+
+
+def index_owner(u_id, channel_id):
+    """
+    Records a user becoming an owner of a channel
+    Parameters:
+        u_id (int)
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["owners_by_channel"][channel_id].add(u_id)
+    VERSIONS["members"] += 1
+    touch_channel(channel_id)
+
+
+def unindex_owner(u_id, channel_id):
+    """
+    Records a user no longer being an owner of a channel
+    Parameters:
+        u_id (int)
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["owners_by_channel"][channel_id].discard(u_id)
+    VERSIONS["members"] += 1
+    touch_channel(channel_id)
+
+
+# _____________________________Member Views____________________________#
+
+
+def member_view(user):
+    """
+    Parameters:
+        user (User)
+    Returns:
+        member (dict): the user as channel_details lists its members
+    """
+    return {
+        "u_id": user.u_id,
+        "name_first": user.name_first,
+        "name_last": user.name_last,
+        "profile_img_url": user.profile_img_url,
+    }
+
+
+def find_member_views(channel):
+    """
+    Renders a channel's owners and members from the users they are, once
+    per change to the channel's members or to one of their profiles, which
+    is checked here rather than when a profile changes
+    Parameters:
+        channel (Channel)
+    Returns:
+        (owner_members, all_members) (tuple): lists shared between
+            requests, which must not be changed
+    """
+    channel_id = channel.channel_id
+    # Read before rendering, so views rendered part way through a change
+    # are cached under the version before it and never used after it
+    version = (VERSIONS["epoch"],) + channel_version(channel)
+    cached = INDEX["member_views_by_channel"].get(channel_id)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    users = INDEX["users_by_uid"]
+    views = (
+        [member_view(users[u_id]) for u_id in channel.owner_members],
+        [member_view(users[u_id]) for u_id in channel.all_members],
+    )
+    INDEX["member_views_by_channel"][channel_id] = (version, views)
+    return views
+
+
+def channel_version(channel):
+    """
+    Parameters:
+        channel (Channel)
+    Returns:
+        (channel, profiles) (tuple): changes to the channel's members, and
+            the sum of its owners' and members' profile versions. The
+            members are fixed while the first stays the same, and profile
+            versions only go up, so the sum goes up with any of their
+            profiles
+    """
+    by_user = VERSIONS["by_user"]
+    profiles = sum(by_user.get(u_id, 0) for u_id in channel.owner_members)
+    profiles += sum(by_user.get(u_id, 0) for u_id in channel.all_members)
+    return VERSIONS["by_channel"].get(channel.channel_id, 0), profiles
+
+
+def touch_channel(channel_id):
+    """
+    Drops a channel's member views and bumps its version, once its members
+    have changed
+    Parameters:
+        channel_id (int)
+    Returns:
+        None
+    """
+    INDEX["member_views_by_channel"].pop(channel_id, None)
+    VERSIONS["by_channel"][channel_id] = VERSIONS["by_channel"].get(channel_id, 0) + 1
+
+
+def reindex_profile(u_id):
+    """
+    Bumps the user's version once their name or photo has changed. Member
+    views and ETags check the versions of a channel's members when they are
+    used, so a profile change never has to visit the user's channels
+    Parameters:
+        u_id (int)
+    Returns:
+        None
+    """
+    touch_user(u_id)
+
+
+# ___________________________Scheduled Index___________________________#
+
+
+def index_scheduled(scheduled):
+    """
+    Adds a message waiting to be sent later to its channel's list
+    Parameters:
+        scheduled (dict): as stored in DATA["scheduled"]
+    Returns:
+        None
+    """
+    INDEX["scheduled_by_channel"].setdefault(scheduled["channel_id"], set()).add(
+        scheduled["message_id"]
+    )
+
+
+def unindex_scheduled(scheduled):
+    """
+    Removes a message from its channel's list once it is sent or cancelled
+    Parameters:
+        scheduled (dict): as stored in DATA["scheduled"]
+    Returns:
+        None
+    """
+    INDEX["scheduled_by_channel"].get(scheduled["channel_id"], set()).discard(
+        scheduled["message_id"]
+    )
+
+
+# ____________________________Session Index____________________________#
+
+
+def index_session(session):
+    """
+    Adds a new session to its user's sessions
+    Parameters:
+        session (Session): the session as stored in DATA["sessions"]
+    Returns:
+        None
+    """
+    INDEX["sessions_by_user"].setdefault(session.u_id, set()).add(session.session_id)
+
+
+def unindex_session(session):
+    """
+    Removes an ended session from its user's sessions
+    Parameters:
+        session (Session)
+    Returns:
+        None
+    """
+    sessions = INDEX["sessions_by_user"].get(session.u_id)
+    if sessions is not None:
+        sessions.discard(session.session_id)
+        if not sessions:
+            del INDEX["sessions_by_user"][session.u_id]
+
+
+# ____________________________Standup Index____________________________#
+
+
+def index_standup(standup):
+    """
+    Adds a channel's standup to the standup index, a channel only
+    ever has one standup which is reused each time one starts
+    Parameters:
+        standup (dict): the standup as stored in DATA["standup"]
+    Returns:
+        None
+    """
+    INDEX["standups_by_channel"][standup["channel_id"]] = standup
+
+
+# ___________________________Rebuild Index_____________________________#
+
+
+def rebuild_index(data):
+    """
+    Rebuilds every index from scratch, for when DATA has been loaded in
+    one go rather than built up change by change
+    Parameters:
+        data (dict): DATA
+    Returns:
+        None
+    """
+    clear_index()
+    for user in data["users"]:
+        index_user(user)
+    for channel in data["channels"]:
+        index_channel(channel["channel_id"])
+        for u_id in channel["all_members"]:
+            index_member(u_id, channel["channel_id"])
+        for u_id in channel["owner_members"]:
+            index_owner(u_id, channel["channel_id"])
+    index_messages(data["message_log"]["messages"], data["channels"])
+    for standup in data["standup"]:
+        index_standup(standup)
+    for scheduled in data["scheduled"].values():
+        index_scheduled(scheduled)
+    for session in data["sessions"].values():
+        index_session(session)
+
+
+# ____________________________Clear Index______________________________#
+
+
+def clear_index():
+    """
+    Empties every index, called alongside clearing DATA
+    """
+    for table in INDEX.values():
+        table.clear()
+    # An empty trigram index is complete
+    TRIGRAMS["built"] = True
+    TRIGRAMS["pending"] = None
+    TRIGRAMS["generation"] += 1
+    VERSIONS["by_user"].clear()
+    VERSIONS["by_channel"].clear()
+    VERSIONS["epoch"] = max(VERSIONS["epoch"] + 1, time.time_ns() // 1000)
@@ -0,0 +1,309 @@
+"""
+journal.py
+append-only write-ahead journal of every change made to DATA
+
+Each change is a compact JSON line naming a store function and its
+arguments. On startup the journal is replayed through the same store
+functions to rebuild DATA. Writers wait for their record to be fsynced,
+but one fsync commits every record that was queued while the previous
+one ran, so throughput stays high under concurrent writes.
+
+Offsets into the journal are logical: once a snapshot covers the start of
+the journal that part is cut off, and the journal begins with a
+["base", offset] record giving the logical offset of what follows it.
+"""
+
+
+import json
+import os
+import threading
+from functools import wraps
+
+
+global JOURNAL
+JOURNAL = {
+    # Held while a record is queued and its change applied, so the
+    # journal's order is the order the changes were made in. It is held
+    # even with no journal open, as it is what makes each change atomic
+    "lock": threading.Lock(),
+    # Signalled when records are queued and when they become durable
+    "condition": threading.Condition(threading.Lock()),
+    "file": None,
+    "path": None,
+    "buffer": [],
+    "queued": 0,
+    "durable": 0,
+    # Logical offset just past the last queued record
+    "end": 0,
+    # Number of fsyncs, each one commits a batch of records
+    "commits": 0,
+    "flusher": None,
+}
+
+# op -> store function, filled in by @journaled
+REPLAY = {}
+
+# Storage backends every change is also handed to, as backend(op, args),
+# in the same order the changes are journaled in. See sqlite_store.py
+BACKENDS = []
+
+
+def journaled(op):
+    """
+    Decorator for store functions that change DATA. Calling the function
+    applies it, journals it under op and hands it to any storage backends.
+    Replay calls the undecorated function, so nothing is stored twice
+    Parameters:
+        op (str): name the change is journaled under
+    Returns:
+        decorator
+    """
+    def decorator(function):
+        REPLAY[op] = function
+
+        @wraps(function)
+        def wrapper(*args):
+            with JOURNAL["lock"]:
+                line = encode_record(op, args)
+                # Only a change that was applied is journaled, one that
+                # raised would raise again on every replay
+                result = function(*args)
+                seq = append_record(line)
+                for backend in BACKENDS:
+                    backend(op, args)
+
+            # Wait outside the lock so other writers can join the same commit
+            if seq:
+                wait_durable(seq)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def encode_record(op, args):
+    """
+    Serialises a record before its change is applied, since the change
+    may alter the arguments
+    Parameters:
+        op (str)
+        args (tuple)
+    Returns:
+        line (str): the record, None if the journal is closed
+    """
+    if JOURNAL["file"] is None:
+        return None
+
+    return json.dumps([op, *args], separators=(",", ":")) + "\n"
+
+
+def append_record(line):
+    """
+    Queues a record for the flusher
+    Parameters:
+        line (str): from encode_record
+    Returns:
+        seq (int): sequence number of the record, None if the journal is closed
+    """
+    if line is None:
+        return None
+
+    with JOURNAL["condition"]:
+        JOURNAL["buffer"].append(line)
+        JOURNAL["queued"] += 1
+        JOURNAL["end"] += len(line)
+        JOURNAL["condition"].notify_all()
+        return JOURNAL["queued"]
+
+
+def wait_durable(seq):
+    """
+    Blocks until the record with sequence number seq has been fsynced
+    Parameters:
+        seq (int)
+    Returns:
+        None
+    """
+    with JOURNAL["condition"]:
+        while JOURNAL["durable"] < seq:
+            JOURNAL["condition"].wait()
+
+
+def run_flusher():
+    """
+    Flusher loop: writes and fsyncs everything queued since the last commit
+    in one go, then wakes the writers it committed
+    """
+    condition = JOURNAL["condition"]
+    while True:
+        with condition:
+            while not JOURNAL["buffer"]:
+                if JOURNAL["file"] is None:
+                    return
+                condition.wait()
+            batch = JOURNAL["buffer"]
+            JOURNAL["buffer"] = []
+            last = JOURNAL["queued"]
+            journal_file = JOURNAL["file"]
+
+        journal_file.write("".join(batch))
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+        with condition:
+            JOURNAL["durable"] = last
+            JOURNAL["commits"] += 1
+            condition.notify_all()
+
+
+def read_base(journal_file):
+    """
+    Reads the base record at the start of a journal, if it has one
+    Parameters:
+        journal_file (file): opened in binary mode at its start
+    Returns:
+        (base, start) (tuple): logical offset of the first record after the
+            base record, and that record's physical offset in the file
+    """
+    line = journal_file.readline()
+    if line.startswith(b'["base",') and line.endswith(b"\n"):
+        return json.loads(line)[1], len(line)
+
+    journal_file.seek(0)
+    return 0, 0
+
+
+def replay_journal(path, offset=0):
+    """
+    Rebuilds DATA by applying every complete record in the journal from the
+    logical offset on. A record torn by a crash part way through writing it
+    is dropped
+    Parameters:
+        path (str)
+        offset (int): where a snapshot already loaded into DATA left off
+    Returns:
+        (end, size) (tuple): logical and physical offsets just past the
+            last complete record
+    """
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return offset, 0
+
+    decode = json.JSONDecoder().decode
+    with open(path, "rb") as journal_file:
+        base, start = read_base(journal_file)
+        if offset < base:
+            raise ValueError(f"Journal {path} starts after offset {offset}")
+        position = start + offset - base
+        journal_file.seek(position)
+
+        for line in journal_file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                op, *args = decode(line.decode("ascii"))
+            except ValueError:
+                break
+            REPLAY[op](*args)
+            position += len(line)
+
+    return base + position - start, position
+
+
+def open_journal(path, offset=0):
+    """
+    Replays the journal at path and then starts journaling every change to it
+    Parameters:
+        path (str)
+        offset (int): where a snapshot already loaded into DATA left off
+    Returns:
+        None
+    """
+    end, size = replay_journal(path, offset)
+
+    journal_file = open(path, "a+", encoding="ascii")
+    # Drop anything after the last complete record before appending
+    journal_file.truncate(size)
+    if not size and end:
+        # Starting a journal after a snapshot, record where it carries on from
+        journal_file.write(json.dumps(["base", end]) + "\n")
+        journal_file.flush()
+        os.fsync(journal_file.fileno())
+
+    with JOURNAL["condition"]:
+        JOURNAL["file"] = journal_file
+        JOURNAL["path"] = path
+        JOURNAL["end"] = end
+        JOURNAL["flusher"] = threading.Thread(target=run_flusher, daemon=True)
+        JOURNAL["flusher"].start()
+
+
+def compact_journal(offset):
+    """
+    Cuts off the part of the journal before the logical offset, once a
+    snapshot that covers it is safely on disk. The rest is copied to a new
+    file that atomically replaces the journal
+    Parameters:
+        offset (int)
+    Returns:
+        None
+    """
+    with JOURNAL["lock"]:
+        # Nothing can be queued while the lock is held, so once everything
+        # queued is durable the flusher is idle and the file can be swapped
+        wait_durable(JOURNAL["queued"])
+        path = JOURNAL["path"]
+        if path is None:
+            return
+
+        with open(path, "rb") as journal_file:
+            base, start = read_base(journal_file)
+            journal_file.seek(start + offset - base)
+            tail = journal_file.read()
+
+        compacted_path = path + ".compact"
+        with open(compacted_path, "wb") as compacted_file:
+            compacted_file.write(json.dumps(["base", offset]).encode("ascii") + b"\n")
+            compacted_file.write(tail)
+            compacted_file.flush()
+            os.fsync(compacted_file.fileno())
+        os.replace(compacted_path, path)
+        sync_directory(path)
+
+        with JOURNAL["condition"]:
+            JOURNAL["file"].close()
+            JOURNAL["file"] = open(path, "a", encoding="ascii")
+
+
+def sync_directory(path):
+    """
+    Fsyncs the directory holding path so a rename into it is durable
+    Parameters:
+        path (str)
+    Returns:
+        None
+    """
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def close_journal():
+    """
+    Commits anything still queued and stops journaling
+    """
+    with JOURNAL["lock"]:
+        wait_durable(JOURNAL["queued"])
+        with JOURNAL["condition"]:
+            journal_file = JOURNAL["file"]
+            JOURNAL["file"] = None
+            JOURNAL["path"] = None
+            JOURNAL["condition"].notify_all()
+
+    if JOURNAL["flusher"] is not None:
+        JOURNAL["flusher"].join()
+        JOURNAL["flusher"] = None
+    if journal_file is not None:
+        journal_file.close()
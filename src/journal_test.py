@@ -0,0 +1,266 @@
+"""
+journal
+
+Every change made to DATA while the journal is open is appended to it,
+and opening the journal again replays those changes to rebuild DATA,
+as happens when the server restarts
+"""
+
+
+import json
+from copy import deepcopy
+from datetime import datetime
+from time import sleep
+import pytest
+from auth import auth_login, auth_logout, auth_register
+from channel import channel_addowner, channel_join, channel_leave, channel_messages
+from channels import channels_create, channels_list
+from data import DATA
+from error import AccessError
+from journal import open_journal, close_journal
+from message import message_send, message_edit, message_react, message_pin, message_remove
+from message import message_sendlater, message_sendlater_cancel, message_sendlater_list
+from message import resume_scheduled
+from other import clear, search
+from standup import standup_start, standup_active, standup_send, resume_standups
+from store import set_email
+from user import user_profile_setname
+
+
+def restart(path):
+    """
+    Throws away DATA, as a server restart would, and rebuilds it from the journal
+    """
+    close_journal()
+    clear()
+    open_journal(path)
+
+
+def test_journal_replay(tmp_path):
+    """
+    Test 1 - Replaying the journal rebuilds DATA exactly
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], c_id)
+    channel_addowner(user_a["token"], c_id, user_b["u_id"])
+    user_profile_setname(user_b["token"], "Jerome", "Chan")
+
+    m_id_1 = message_send(user_a["token"], c_id, "Throw it out the window")["message_id"]
+    m_id_2 = message_send(user_b["token"], c_id, "I like trains")["message_id"]
+    message_send(user_b["token"], c_id, "Remove me")
+    message_edit(user_a["token"], m_id_1, "Throw it out the door")
+    message_react(user_b["token"], m_id_1, 1)
+    message_pin(user_a["token"], m_id_2)
+    message_remove(user_b["token"], m_id_2 + 1)
+    auth_logout(user_b["token"])
+
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+
+    # The indexes are rebuilt along with DATA
+    assert channels_list(user_a["token"]) == {
+        "channels": [{"channel_id": c_id, "name": "billionaire records"}]
+    }
+    assert [msg["message_id"] for msg in search(user_a["token"], "door")["messages"]] == [m_id_1]
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        channel_messages(user_b["token"], c_id, 0)
+    assert auth_login("jerrychan@gmail.com", "w89rfh@fk")["u_id"] == user_b["u_id"]
+
+    # New message ids carry on from where they were
+    assert message_send(user_a["token"], c_id, "Back again")["message_id"] == m_id_2 + 2
+
+    close_journal()
+    clear()
+
+
+def test_journal_replay_after_clear(tmp_path):
+    """
+    Test 2 - Clearing DATA is journaled too
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    channels_create(user_a["token"], "billionaire records", True)
+    clear()
+    user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+    c_id = channels_create(user_b["token"], "the cage", True)["channel_id"]
+    channel_leave(user_b["token"], c_id)
+
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+    assert len(DATA["users"]) == 1
+
+    close_journal()
+    clear()
+
+
+def test_journal_torn_record(tmp_path):
+    """
+    Test 3 - A record cut short by a crash is dropped and journaling carries on after it
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    close_journal()
+
+    with open(path, "a") as journal_file:
+        journal_file.write('["channel",{"all_mem')
+
+    clear()
+    open_journal(path)
+    assert len(DATA["users"]) == 1
+    assert DATA["channels"] == []
+
+    channels_create(user_a["token"], "billionaire records", True)
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+
+    close_journal()
+    clear()
+
+
+def test_journal_sendlater(tmp_path):
+    """
+    Test 4 - Messages waiting to be sent later survive a restart and are
+    sent once they are armed again, cancelled ones stay cancelled
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    now = int(datetime.now().timestamp())
+    m_id_1 = message_sendlater(user_a["token"], c_id, "Out the window", now + 1)["message_id"]
+    m_id_2 = message_sendlater(user_a["token"], c_id, "Cancel me", now + 60)["message_id"]
+    m_id_3 = message_sendlater(user_a["token"], c_id, "I like trains", now + 60)["message_id"]
+    message_sendlater_cancel(user_a["token"], m_id_2)
+
+    restart(path)
+    waiting = message_sendlater_list(user_a["token"], c_id)["messages"]
+    assert [msg["message_id"] for msg in waiting] == [m_id_1, m_id_3]
+
+    # Came due while the server was down, so it is sent as soon as it is armed
+    sleep(1.5)
+    resume_scheduled()
+    for _ in range(50):
+        if channel_messages(user_a["token"], c_id, 0)["messages"]:
+            break
+        sleep(0.1)
+    sent = channel_messages(user_a["token"], c_id, 0)["messages"]
+    assert [msg["message_id"] for msg in sent] == [m_id_1]
+
+    # Sending it is journaled too, so it is not sent again after another restart
+    restart(path)
+    assert list(DATA["scheduled"]) == [m_id_3]
+    sent = channel_messages(user_a["token"], c_id, 0)["messages"]
+    assert [msg["message_id"] for msg in sent] == [m_id_1]
+
+    close_journal()
+    clear()
+
+
+def test_journal_standup(tmp_path):
+    """
+    Test 5 - A running standup keeps the messages sent to it over a restart,
+    and once it has finished it stays finished
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    time_finish = standup_start(user_a["token"], c_id, 1)["time_finish"]
+    standup_send(user_a["token"], c_id, "Throw it out the window")
+
+    restart(path)
+    assert standup_active(user_a["token"], c_id) == {"is_active": True, "time_finish": time_finish}
+    assert DATA["standup"][0]["messages"] == ["Throw it out the window"]
+
+    # Came due while the server was down, so it finishes as soon as it is armed
+    sleep(1.5)
+    resume_standups()
+    for _ in range(50):
+        if channel_messages(user_a["token"], c_id, 0)["messages"]:
+            break
+        sleep(0.1)
+
+    restart(path)
+    resume_standups()
+    sleep(0.5)
+    assert standup_active(user_a["token"], c_id) == {"is_active": False, "time_finish": None}
+    assert len(channel_messages(user_a["token"], c_id, 0)["messages"]) == 1
+
+    close_journal()
+    clear()
+
+
+def test_journal_failed_change(tmp_path):
+    """
+    Test 6 - A change that raises is not journaled, so replaying the
+    journal doesn't raise too
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    with pytest.raises(KeyError):
+        set_email(404, "jerrychan@gmail.com")
+
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+
+    close_journal()
+    clear()
+
+
+def test_journal_standup_finish_atomic(tmp_path):
+    """
+    Test 7 - A standup is finished and its messages sent in one record, so a
+    crash just before it leaves the standup running with nothing sent
+    """
+    path = str(tmp_path / "flockr.journal")
+    open_journal(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    time_finish = standup_start(user_a["token"], c_id, 1)["time_finish"]
+    standup_send(user_a["token"], c_id, "Throw it out the window")
+    sleep(1.5)
+    assert not standup_active(user_a["token"], c_id)["is_active"]
+    sent = deepcopy(channel_messages(user_a["token"], c_id, 0)["messages"])
+    assert len(sent) == 1
+    close_journal()
+
+    with open(path, encoding="ascii") as journal_file:
+        lines = journal_file.readlines()
+    op, finished_c_id, message = json.loads(lines[-1])
+    assert (op, finished_c_id, message["message_id"]) == ("standup_finish", c_id, sent[0]["message_id"])
+
+    # Crash before the finish was journaled
+    with open(path, "w", encoding="ascii") as journal_file:
+        journal_file.writelines(lines[:-1])
+    clear()
+    open_journal(path)
+    standup = DATA["standup"][0]
+    assert (standup["is_active"], standup["time_finish"]) == (True, time_finish)
+    assert standup["messages"] == ["Throw it out the window"]
+    assert not DATA["channels"][c_id - 1]["messages"]
+
+    # It is overdue, so the next poll finishes it and sends the messages once
+    assert not standup_active(user_a["token"], c_id)["is_active"]
+    assert [msg["message"] for msg in channel_messages(user_a["token"], c_id, 0)["messages"]] == [
+        sent[0]["message"]
+    ]
+
+    close_journal()
+    clear()
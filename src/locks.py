@@ -0,0 +1,129 @@
+"""
+locks.py
+locks guarding DATA against requests and scheduled jobs running at once
+
+Each lock covers a check and the change that depends on it, so two
+requests can't both pass a check before either makes its change:
+    USERS_LOCK       registering users and changing emails and handles,
+                     which must stay unique, and allocating u_ids
+    CHANNELS_LOCK    allocating channel_ids when creating channels
+    channel locks    one per channel, covering its members, owners,
+                     messages, pins, reacts and standup
+Every store function also runs under the journal's lock, which makes each
+single change atomic, message_id allocation included. It is taken whether
+or not a journal or storage backend is open, since the indexes a change
+updates are shared between channels, so changes to DATA are still applied
+one at a time across every channel. The channel locks only let requests to
+different channels check, render and wait for their fsyncs at the same
+time, which is where their gain comes from. channel_messages and search
+take no lock: they build their own copy of each message and skip any
+removed since they found it.
+
+Lock ordering, a thread may only take a lock further down this list than
+the ones it already holds:
+    USERS_LOCK -> CHANNELS_LOCK -> one channel lock -> journal lock
+No thread ever holds two channel locks at once. Channel locks are
+reentrant, so a standup finishing under its channel's lock can send its
+message to the same channel.
+"""
+
+
+import threading
+from contextlib import nullcontext
+from functools import wraps
+from index import INDEX
+
+
+USERS_LOCK = threading.RLock()
+CHANNELS_LOCK = threading.RLock()
+
+# channel_id -> that channel's lock
+CHANNEL_LOCKS = {}
+
+
+def channel_lock(channel_id):
+    """
+    Finds a channel's lock, the channel must exist
+    Parameters:
+        channel_id (int)
+    Returns:
+        lock (RLock)
+    """
+    lock = CHANNEL_LOCKS.get(channel_id)
+    if lock is None:
+        # setdefault is atomic, so racing threads end up with the same lock
+        lock = CHANNEL_LOCKS.setdefault(channel_id, threading.RLock())
+    return lock
+
+
+def lock_channel(channel_id):
+    """
+    Parameters:
+        channel_id (int)
+    Returns:
+        context manager holding the channel's lock, which does nothing
+        for a channel that doesn't exist so the caller can raise its error
+    """
+    try:
+        if channel_id in INDEX["members_by_channel"]:
+            return channel_lock(channel_id)
+    except TypeError:
+        # Unhashable channel_id, the caller's checks reject it
+        pass
+    return nullcontext()
+
+
+def lock_message_channel(message_id):
+    """
+    Parameters:
+        message_id (int)
+    Returns:
+        context manager holding the lock of the channel the message was
+        sent to, which does nothing for a message that doesn't exist
+    """
+    try:
+        channel_id = INDEX["channel_by_message"].get(message_id)
+    except TypeError:
+        channel_id = None
+    if channel_id is None:
+        return nullcontext()
+    return channel_lock(channel_id)
+
+
+def with_users_lock(function):
+    """
+    Decorator running the function under USERS_LOCK
+    """
+    @wraps(function)
+    def wrapper(*args):
+        with USERS_LOCK:
+            return function(*args)
+
+    return wrapper
+
+
+def with_channel_lock(function):
+    """
+    Decorator for functions taking (token, channel_id, ...), running the
+    function under that channel's lock
+    """
+    @wraps(function)
+    def wrapper(token, channel_id, *args):
+        with lock_channel(channel_id):
+            return function(token, channel_id, *args)
+
+    return wrapper
+
+
+def with_message_lock(function):
+    """
+    Decorator for functions taking (token, message_id, ...), running the
+    function under the lock of the channel the message was sent to. The
+    function checks the message still exists once the lock is held
+    """
+    @wraps(function)
+    def wrapper(token, message_id, *args):
+        with lock_message_channel(message_id):
+            return function(token, message_id, *args)
+
+    return wrapper
@@ -0,0 +1,98 @@
+"""
+locks
+
+Requests running at the same time on different threads never lose or
+duplicate each other's changes
+"""
+
+
+import threading
+from auth import auth_register
+from channel import channel_join, channel_details
+from channels import channels_create
+from data import DATA
+from error import InputError
+from message import message_send, message_react
+from other import clear
+
+
+THREADS = 8
+
+
+def run_threads(work):
+    """
+    Runs work(i) on THREADS threads at once, collecting any InputErrors
+    """
+    barrier = threading.Barrier(THREADS)
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            work(i)
+        except InputError as error:
+            errors.append(error)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return errors
+
+
+def test_locks_register():
+    """
+    Test 1 - Users registering at once all get their own u_id, and an email
+    can only be taken once
+    """
+    tokens = {}
+
+    def register(i):
+        tokens[i] = auth_register(f"user{i}@gmail.com", "password", "First", "Last")
+
+    assert run_threads(register) == []
+    assert sorted(user["u_id"] for user in tokens.values()) == list(range(1, THREADS + 1))
+
+    errors = run_threads(
+        lambda i: auth_register("same@gmail.com", "password", "First", "Last")
+    )
+    assert len(errors) == THREADS - 1
+    assert [user["email"] for user in DATA["users"]].count("same@gmail.com") == 1
+
+    clear()
+
+
+def test_locks_channel(user_a, user_b):
+    """
+    Test 2 - Channels created at once get their own channel_id, joining twice
+    at once joins once, and messages sent at once each get their own message_id
+    """
+    channel_ids = {}
+
+    def create(i):
+        channel_ids[i] = channels_create(user_a["token"], f"channel {i}", True)["channel_id"]
+
+    run_threads(create)
+    assert sorted(channel_ids.values()) == list(range(1, THREADS + 1))
+
+    c_id = channel_ids[0]
+    run_threads(lambda i: channel_join(user_b["token"], c_id))
+    members = channel_details(user_a["token"], c_id)["all_members"]
+    assert [member["u_id"] for member in members] == [user_a["u_id"], user_b["u_id"]]
+
+    m_ids = {}
+
+    def send(i):
+        m_ids[i] = message_send(user_b["token"], c_id, "I like trains")["message_id"]
+
+    run_threads(send)
+    assert sorted(m_ids.values()) == list(range(1, THREADS + 1))
+    assert sorted(DATA["channels"][c_id - 1]["messages"]) == list(range(1, THREADS + 1))
+
+    errors = run_threads(lambda i: message_react(user_a["token"], m_ids[0], 1))
+    assert len(errors) == THREADS - 1
+    reacted = [msg for msg in DATA["message_log"]["messages"] if msg["message_id"] == m_ids[0]]
+    assert reacted[0]["reacts"][0]["u_ids"] == [user_a["u_id"]]
+
+    clear()
@@ -5,16 +5,29 @@ Sending, removing and editing messages
 
 
 from datetime import datetime
-from threading import Timer
 from auth import decode_token
 from data import DATA
 from error import AccessError, InputError
 from find import find_uid_from_token, find_cid_from_mid
+from index import INDEX
+from locks import lock_channel, with_channel_lock, with_message_lock
+from store import (
+    allocate_message_id,
+    add_message,
+    add_scheduled,
+    remove_scheduled,
+    remove_message,
+    edit_message,
+    add_react,
+    remove_react,
+    set_pinned,
+)
 from channel_helper import (
     check_valid_channel_id,
     check_user_in_channel,
     check_is_admin,
 )
+from scheduler import schedule, cancel
 from message_helper import (
     check_already_pinned,
     check_already_reacted,
@@ -27,6 +40,8 @@ from message_helper import (
     check_time_sent_past,
     check_self_modify,
     check_owner_modify,
+    check_scheduled_message_exists,
+    check_scheduled_modify,
 )
 
 
@@ -34,19 +49,17 @@ from message_helper import (
 #                          Main Functions                              #
 ########################################################################
 
-def send_message(u_id, channel_id, message, m_id):
+def new_message(u_id, message, m_id):
     """
-    Sends a message from a user with given u_id
+    Makes the dict for a message from a user with given u_id, sent now
     Parameters:
         u_id (int)
-        channel_id (int)
         message (str)
-        m_id (int) - defaulted to None
+        m_id (int)
     Returns:
-        None
+        message (dict)
     """
-    # Make a new message dict to be added to the channel's messages
-    new_message = {
+    return {
         "message_id": m_id,
         "u_id": u_id,
         "message": message,
@@ -61,15 +74,26 @@ def send_message(u_id, channel_id, message, m_id):
         "is_pinned": False,
     }
 
+
+def send_message(u_id, channel_id, message, m_id):
+    """
+    Sends a message from a user with given u_id
+    Parameters:
+        u_id (int)
+        channel_id (int)
+        message (str)
+        m_id (int) - defaulted to None
+    Returns:
+        None
+    """
     # Add message details to the DATA's messages, and
     # message_id to the current channel and to the user's sent messages
-    DATA["message_log"]["messages"].append(new_message)
-    DATA["channels"][channel_id - 1]["messages"].append(m_id)
-    DATA["users"][u_id - 1]["user_message_id"].append(m_id)
+    add_message(new_message(u_id, message, m_id), channel_id)
 
     return
 
 
+@with_channel_lock
 def message_send(token, channel_id, message):
     """
     Sends a message to the specified channel
@@ -89,14 +113,14 @@ def message_send(token, channel_id, message):
     u_id = find_uid_from_token(decoded_token)
     check_user_in_channel(decoded_token, channel_id)
 
-    m_id = DATA["message_log"]["msg_counter"]
-    DATA["message_log"]["msg_counter"] += 1
+    m_id = allocate_message_id()
 
     send_message(u_id, channel_id, message, m_id)
 
     return {"message_id": m_id}
 
 
+@with_message_lock
 def message_remove(token, message_id):
     """
     Removes a message from the specified channel
@@ -117,28 +141,13 @@ def message_remove(token, message_id):
         if not check_is_admin(find_uid_from_token(decoded_token)):
             check_owner_modify(decoded_token, message_id)
 
-    # Remove the message_id from the channel's messages
-    for channel in DATA["channels"]:
-        for m_id in channel["messages"]:
-            if m_id == message_id:
-                channel["messages"].remove(m_id)
-
-    # Remove messages from messages DATA
-    DATA["message_log"]["messages"] = [
-        msg for msg in DATA["message_log"]["messages"]
-        if not (msg["message_id"] == message_id)
-    ]
-
-    # Remove message from user's sent messages
-    u_id = find_uid_from_token(decoded_token)
-    DATA["users"][u_id - 1]["user_message_id"] = [
-        m_id for m_id in DATA["users"][u_id - 1]["user_message_id"]
-        if not (m_id == message_id)
-    ]
+    # Remove the message from the channel, messages DATA and the sender's sent messages
+    remove_message(message_id)
 
     return {}
 
 
+@with_message_lock
 def message_edit(token, message_id, message):
     """
     Edits a given message
@@ -159,6 +168,9 @@ def message_edit(token, message_id, message):
 
     decoded_token = decode_token(token)
 
+    # Check that the message to be edited exists
+    check_message_exists(message_id)
+
     # Check that the user is editing their own message
     # unless they are an owner of the channel or Flockr
     if not check_self_modify(decoded_token, message_id):
@@ -166,13 +178,12 @@ def message_edit(token, message_id, message):
             check_owner_modify(decoded_token, message_id)
 
     # Edit the message from the DATA's message log
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id:
-            messages["message"] = message
+    edit_message(message_id, message)
 
     return {}
 
 
+@with_message_lock
 def message_react(token, message_id, react_id):
     """
     Reacts to a given message
@@ -194,14 +205,12 @@ def message_react(token, message_id, react_id):
     # Check if the user already reacted to the message with the same react_id
     check_already_reacted(decoded_token, message_id, react_id)
 
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id:
-            messages["reacts"][0]["u_ids"].append(find_uid_from_token(decoded_token))
-            messages["reacts"][0]["is_this_user_reacted"] = True
+    add_react(message_id, find_uid_from_token(decoded_token))
 
     return {}
 
 
+@with_message_lock
 def message_unreact(token, message_id, react_id):
     """
     Unreacts to a given message
@@ -223,14 +232,12 @@ def message_unreact(token, message_id, react_id):
     # Check if the user already unreacted to the message with the same react_id
     check_already_unreacted(decoded_token, message_id, react_id)
 
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id:
-            messages["reacts"][0]["u_ids"].remove(find_uid_from_token(decoded_token))
-            messages["reacts"][0]["is_this_user_reacted"] = False
+    remove_react(message_id, find_uid_from_token(decoded_token))
 
     return {}
 
 
+@with_message_lock
 def message_pin(token, message_id):
     """
     Pins a given message
@@ -257,13 +264,12 @@ def message_pin(token, message_id):
     if not check_is_admin(find_uid_from_token(decoded_token)):
         check_owner_modify(decoded_token, message_id)
 
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id:
-            messages["is_pinned"] = True
+    set_pinned(message_id, True)
 
     return {}
 
 
+@with_message_lock
 def message_unpin(token, message_id):
     """
     Unpins a given message
@@ -290,13 +296,12 @@ def message_unpin(token, message_id):
     if not check_is_admin(find_uid_from_token(decoded_token)):
         check_owner_modify(decoded_token, message_id)
 
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id:
-            messages["is_pinned"] = False
+    set_pinned(message_id, False)
 
     return {}
 
 
+@with_channel_lock
 def message_sendlater(token, channel_id, message, time_sent):
     """
     Sends a message from authorised user to the channel specified
@@ -324,12 +329,129 @@ def message_sendlater(token, channel_id, message, time_sent):
     u_id = find_uid_from_token(decoded_token)
     check_user_in_channel(decoded_token, channel_id)
 
-    m_id = DATA["message_log"]["msg_counter"]
-    DATA["message_log"]["msg_counter"] += 1
-
-    # Calculate the remaining time before sending message in seconds
-    remaining_time = time_sent - int((datetime.now()).timestamp())
-    timer = Timer(remaining_time, send_message, [u_id, channel_id, message, m_id])
-    timer.start()
+    m_id = allocate_message_id()
+
+    # Stored, so it is still sent if the server restarts before time_sent,
+    # then handed to the scheduler to be sent at time_sent
+    add_scheduled(
+        {
+            "message_id": m_id,
+            "u_id": u_id,
+            "channel_id": channel_id,
+            "message": message,
+            "time_sent": time_sent,
+        }
+    )
+    arm_scheduled(DATA["scheduled"][m_id])
 
     return {"message_id": m_id}
+
+
+def arm_scheduled(scheduled):
+    """
+    Has the scheduler send a waiting message once it is due
+    Parameters:
+        scheduled (dict): as stored in DATA["scheduled"]
+    Returns:
+        None
+    """
+    scheduled["job_id"] = schedule(
+        scheduled["time_sent"], send_scheduled, [scheduled["message_id"]]
+    )
+
+
+def resume_scheduled():
+    """
+    Arms every message waiting to be sent later, once DATA has been loaded
+    and the journal replayed, messages that came due while the server was
+    down are sent straight away
+    """
+    for scheduled in list(DATA["scheduled"].values()):
+        arm_scheduled(scheduled)
+
+
+def send_scheduled(m_id):
+    """
+    Sends a message that was waiting to be sent later, run by the scheduler
+    Parameters:
+        m_id (int)
+    Returns:
+        None
+    """
+    scheduled = DATA["scheduled"].get(m_id)
+    if scheduled is None:
+        return
+
+    # A cancel also takes the channel's lock, whichever is first wins
+    with lock_channel(scheduled["channel_id"]):
+        if m_id not in DATA["scheduled"]:
+            return
+        # Sending it takes it off the messages waiting to be sent
+        send_message(scheduled["u_id"], scheduled["channel_id"], scheduled["message"], m_id)
+
+
+@with_channel_lock
+def message_sendlater_list(token, channel_id):
+    """
+    Lists the messages waiting to be sent later to a channel
+    Parameters:
+        token (str)
+        channel_id (int)
+    Returns:
+        {messages} (dict): pending messages, soonest first
+    """
+    decoded_token = decode_token(token)
+
+    # Check the channel_id is valid
+    check_valid_channel_id(channel_id)
+
+    # Check if user is a member of the channel
+    check_user_in_channel(decoded_token, channel_id)
+
+    # Skipping any sent or cancelled since the channel's list was copied
+    waiting = map(
+        DATA["scheduled"].get, list(INDEX["scheduled_by_channel"].get(channel_id, ()))
+    )
+    pending = [
+        {
+            "message_id": scheduled["message_id"],
+            "u_id": scheduled["u_id"],
+            "message": scheduled["message"],
+            "time_sent": scheduled["time_sent"],
+        }
+        for scheduled in waiting
+        if scheduled is not None
+    ]
+    pending.sort(key=lambda scheduled: (scheduled["time_sent"], scheduled["message_id"]))
+
+    return {"messages": pending}
+
+
+def message_sendlater_cancel(token, message_id):
+    """
+    Cancels a message that is waiting to be sent later
+    Parameters:
+        token (str)
+        message_id (int)
+    Returns:
+        empty (dict)
+    """
+    decoded_token = decode_token(token)
+    u_id = find_uid_from_token(decoded_token)
+
+    # Check the message is still waiting to be sent
+    scheduled = check_scheduled_message_exists(message_id)
+
+    # Check that the user is cancelling their own message
+    # unless they are an owner of the channel or Flockr
+    check_scheduled_modify(u_id, scheduled)
+
+    # The message may have been sent since it was looked up, only
+    # cancel it if it is still waiting
+    with lock_channel(scheduled["channel_id"]):
+        if message_id not in DATA["scheduled"]:
+            raise InputError(f"Scheduled message: {message_id} does not exist")
+        remove_scheduled(message_id)
+    cancel(scheduled["job_id"])
+
+    return {}
@@ -317,3 +317,22 @@ def test_message_edit_too_long(user_a):
         message_edit(user_a["token"], c_id_1, "a" * 1001)
 
     clear()
+
+
+def test_message_edit_inexistent_message(user_a):
+    """
+    Test 10 - InputError - User tries to edit a message that no longer exists
+    """
+    # User creates a channel and sends a message
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    msg_1 = message_send(user_a["token"], c_id_1, "Throw it out the window")
+    m_id_1 = msg_1["message_id"]
+
+    # Removing the message by editing it to be empty
+    message_edit(user_a["token"], m_id_1, "")
+
+    with pytest.raises(InputError, match=rf"Message: {m_id_1} does not exist"):
+        message_edit(user_a["token"], m_id_1, "This isn't getting edited")
+
+    clear()
@@ -4,10 +4,39 @@ helper functions for message.py are sourced from here
 """
 
 
-from data import DATA
 from datetime import datetime
+from channel_helper import check_is_admin
+from data import DATA
 from error import InputError, AccessError
 from find import find_uid_from_token, find_cid_from_mid
+from index import INDEX
+
+
+def message_view(message, u_id):
+    """
+    Builds the message as the user sees it, without touching the stored
+    message which other requests may be reading or changing
+    Parameters:
+        message (Message): as stored in DATA["message_log"]
+        u_id (int): the user the message is being returned to
+    Returns:
+        view (dict)
+    """
+    m_id = message.message_id
+    return {
+        "message_id": m_id,
+        "u_id": message.u_id,
+        "message": message.message,
+        "time_created": message.time_created,
+        "reacts": [
+            {
+                "react_id": 1,
+                "u_ids": list(message.react_u_ids),
+                "is_this_user_reacted": u_id in INDEX["reacts_by_message"].get(m_id, ()),
+            }
+        ],
+        "is_pinned": message.is_pinned,
+    }
 
 
 def check_already_pinned(message_id):
@@ -19,12 +48,8 @@ def check_already_pinned(message_id):
         (void): Raises an InputError if the user is attempting
                 to pin a message that is already pinned
     """
-    pinned = False
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id and messages["is_pinned"]:
-            pinned = True
-
-    if pinned:
+    message = INDEX["messages_by_id"].get(message_id)
+    if message and message["is_pinned"]:
         raise InputError(description="Message is already pinned")
 
 
@@ -41,12 +66,7 @@ def check_already_reacted(token, message_id, react_id):
                 already reacted to the message with a given react_id
     """
     u_id = find_uid_from_token(token)
-    react_uids = []
-    for messages in DATA["message_log"]["messages"]:
-        if message_id == messages["message_id"]:
-            react_uids = messages["reacts"][0]["u_ids"]
-
-    if u_id in react_uids:
+    if u_id in INDEX["reacts_by_message"].get(message_id, ()):
         raise InputError(f"Message already has react {react_id}")
 
 
@@ -59,12 +79,8 @@ def check_already_unpinned(message_id):
         (void): Raises an InputError if the user is attempting
                 to unpin a message that is already unpinned
     """
-    pinned = False
-    for messages in DATA["message_log"]["messages"]:
-        if messages["message_id"] == message_id and messages["is_pinned"]:
-            pinned = True
-
-    if not pinned:
+    message = INDEX["messages_by_id"].get(message_id)
+    if not (message and message["is_pinned"]):
         raise InputError(description="Message is already unpinned")
 
 
@@ -81,12 +97,7 @@ def check_already_unreacted(token, message_id, react_id):
                 already unreacted to the message with a given react_id
     """
     u_id = find_uid_from_token(token)
-    react_uids = []
-    for messages in DATA["message_log"]["messages"]:
-        if message_id == messages["message_id"]:
-            react_uids = messages["reacts"][0]["u_ids"]
-
-    if u_id not in react_uids:
+    if u_id not in INDEX["reacts_by_message"].get(message_id, ()):
         raise InputError(f"Message does not have react {react_id}")
 
 
@@ -122,9 +133,8 @@ def check_message_exists(m_id):
     Returns:
         True if corresponding message exists, otherwise False
     """
-    for message in DATA["message_log"]["messages"]:
-        if message["message_id"] == m_id:
-            return True
+    if m_id in INDEX["messages_by_id"]:
+        return True
 
     raise InputError(f"Message: {m_id} does not exist")
 
@@ -167,10 +177,9 @@ def check_self_modify(token, m_id):
     Returns:
         (bool): True if the above condition is satisfied, otherwise False
     """
-    for message in DATA["message_log"]["messages"]:
-        if message["message_id"] == m_id:
-            if message["u_id"] == find_uid_from_token(token):
-                return True
+    message = INDEX["messages_by_id"].get(m_id)
+    if message and message["u_id"] == find_uid_from_token(token):
+        return True
 
     return False
 
@@ -186,8 +195,39 @@ def check_owner_modify(token, m_id):
     c_id = find_cid_from_mid(m_id)
     u_id = find_uid_from_token(token)
 
-    for owner in DATA["channels"][c_id - 1]["owner_members"]:
-        if owner["u_id"] == u_id:
-            return True
+    if u_id in INDEX["owners_by_channel"].get(c_id, ()):
+        return True
 
     raise AccessError(description="You are not authorised to alter this channel")
+
+
+def check_scheduled_message_exists(m_id):
+    """
+    Checks whether a message is still waiting to be sent later
+    Parameters:
+        m_id (int)
+    Returns:
+        scheduled (dict): the pending message, otherwise raises InputError
+    """
+    scheduled = DATA["scheduled"].get(m_id)
+    if scheduled:
+        return scheduled
+
+    raise InputError(f"Scheduled message: {m_id} does not exist")
+
+
+def check_scheduled_modify(u_id, scheduled):
+    """
+    Checks that a pending message is being changed by its sender,
+    an owner of its channel or an owner of Flockr
+    Parameters:
+        u_id (int)
+        scheduled (dict)
+    Returns:
+        (void): raises AccessError if the user is none of the above
+    """
+    if scheduled["u_id"] == u_id or check_is_admin(u_id):
+        return
+
+    if u_id not in INDEX["owners_by_channel"].get(scheduled["channel_id"], ()):
+        raise AccessError(description="You are not authorised to alter this channel")
@@ -18,6 +18,7 @@ import pytest
 from auth import auth_register
 from channel import channel_join, channel_messages
 from channels import channels_create
+from data import DATA
 from error import InputError, AccessError
 from message import message_send, message_remove
 from other import clear
@@ -251,3 +252,33 @@ def test_message_remove_invalid_token(user_a):
         message_remove(invalid_token, m_id_1)
 
     clear()
+
+
+def test_message_remove_leaves_gap(user_a):
+    """
+    Test 10 - A removed message leaves a gap in its page so later pages
+    don't shift, until most of the channel's messages are removed and the
+    gaps are closed
+    """
+    c_id_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    m_ids = [
+        message_send(user_a["token"], c_id_1, f"message {i}")["message_id"] for i in range(60)
+    ]
+
+    message_remove(user_a["token"], m_ids[0])
+    page = channel_messages(user_a["token"], c_id_1, 0)
+    assert [msg["message_id"] for msg in page["messages"]] == m_ids[49:0:-1]
+    assert page["end"] == 50
+    page = channel_messages(user_a["token"], c_id_1, 50)
+    assert [msg["message_id"] for msg in page["messages"]] == m_ids[59:49:-1]
+
+    for m_id in m_ids[1:31]:
+        message_remove(user_a["token"], m_id)
+    page = channel_messages(user_a["token"], c_id_1, 0)
+    assert [msg["message_id"] for msg in page["messages"]] == m_ids[59:30:-1]
+    assert page["end"] == -1
+    assert len(DATA["channels"][0]["messages"]) == 29
+    assert len(DATA["message_log"]["messages"]) == 29
+    assert len(DATA["users"][0]["user_message_id"]) == 29
+
+    clear()
@@ -0,0 +1,58 @@
+"""
+message_sendlater_cancel_http
+
+Testing that message_sendlater_list and message_sendlater_cancel
+work with http implementation
+"""
+
+
+from datetime import datetime
+from time import sleep
+from echo_http_test import url
+from conftest_http import user_a
+from http_channel_functions import http_channel_messages
+from http_channels_functions import http_channels_create
+from http_message_functions import (
+    http_message_sendlater,
+    http_message_sendlater_list,
+    http_message_sendlater_cancel,
+)
+
+
+def test_message_sendlater_cancel_http_success(url, user_a):
+    """
+    Test 1 - A listed message is cancelled and never sent
+    """
+    channel_1 = http_channels_create(url, user_a["token"], "billionaire records", True).json()
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_1 = int((datetime.now()).timestamp()) + 1
+    msg_1 = http_message_sendlater(url, user_a["token"], c_id_1, "Throw it out the window",
+                                   time_in_1).json()
+    m_id_1 = msg_1["message_id"]
+
+    assert http_message_sendlater_list(url, user_a["token"], c_id_1).json() == {
+        "messages": [
+            {
+                "message_id": m_id_1,
+                "u_id": user_a["u_id"],
+                "message": "Throw it out the window",
+                "time_sent": time_in_1,
+            },
+        ],
+    }
+
+    assert http_message_sendlater_cancel(url, user_a["token"], m_id_1).json() == {}
+
+    sleep(2)
+    assert http_message_sendlater_list(url, user_a["token"], c_id_1).json() == {"messages": []}
+    assert http_channel_messages(url, user_a["token"], c_id_1, 0).json()["messages"] == []
+
+
+def test_message_sendlater_cancel_http_invalid(url, user_a):
+    """
+    Test 2 - InputError - Message is not waiting to be sent
+    """
+    payload = http_message_sendlater_cancel(url, user_a["token"], 42)
+
+    assert payload.status_code == 400
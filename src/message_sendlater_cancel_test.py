@@ -0,0 +1,116 @@
+"""
+message_sendlater_cancel
+
+Takes in parameters `token`, `message_id`
+Returns an empty dictionary {}
+
+Description: Cancels a message that is waiting to be sent later so
+that it is never sent
+
+Exceptions:
+  - InputError when message_id is not a message waiting to be sent
+  - AccessError when the authorised user did not send the message and
+  is not an owner of the channel or of Flockr
+"""
+
+
+from datetime import datetime
+from time import sleep
+import pytest
+from channel import channel_join, channel_messages
+from channels import channels_create
+from error import AccessError, InputError
+from message import message_sendlater, message_sendlater_cancel, message_sendlater_list
+from other import clear
+from conftest import user_a, user_b, user_c
+
+
+def test_message_sendlater_cancel_success(user_a):
+    """
+    Test 1 - A cancelled message is never sent
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_1 = int((datetime.now()).timestamp()) + 1
+    msg_1 = message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_1)
+
+    assert message_sendlater_cancel(user_a["token"], msg_1["message_id"]) == {}
+    assert message_sendlater_list(user_a["token"], c_id_1) == {"messages": []}
+
+    sleep(2)
+    assert channel_messages(user_a["token"], c_id_1, 0)["messages"] == []
+
+    clear()
+
+
+def test_message_sendlater_cancel_by_owner(user_a, user_b):
+    """
+    Test 2 - An owner of the channel can cancel another member's message
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    channel_join(user_b["token"], c_id_1)
+
+    time_in_60 = int((datetime.now()).timestamp()) + 60
+    msg_1 = message_sendlater(user_b["token"], c_id_1, "Throw it out the window", time_in_60)
+
+    message_sendlater_cancel(user_a["token"], msg_1["message_id"])
+    assert message_sendlater_list(user_a["token"], c_id_1) == {"messages": []}
+
+    clear()
+
+
+def test_message_sendlater_cancel_twice(user_a):
+    """
+    Test 3 - InputError - Message has already been cancelled
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_60 = int((datetime.now()).timestamp()) + 60
+    msg_1 = message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_60)
+    m_id_1 = msg_1["message_id"]
+
+    message_sendlater_cancel(user_a["token"], m_id_1)
+    with pytest.raises(InputError, match=rf"Scheduled message: {m_id_1} does not exist"):
+        message_sendlater_cancel(user_a["token"], m_id_1)
+
+    clear()
+
+
+def test_message_sendlater_cancel_already_sent(user_a):
+    """
+    Test 4 - InputError - Message has already been sent
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_1 = int((datetime.now()).timestamp()) + 1
+    msg_1 = message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_1)
+    m_id_1 = msg_1["message_id"]
+
+    sleep(2)
+    with pytest.raises(InputError, match=rf"Scheduled message: {m_id_1} does not exist"):
+        message_sendlater_cancel(user_a["token"], m_id_1)
+
+    clear()
+
+
+def test_message_sendlater_cancel_unauthorised(user_a, user_b, user_c):
+    """
+    Test 5 - AccessError - A member who is not an owner cannot cancel
+    someone else's message
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    channel_join(user_b["token"], c_id_1)
+    channel_join(user_c["token"], c_id_1)
+
+    time_in_60 = int((datetime.now()).timestamp()) + 60
+    msg_1 = message_sendlater(user_b["token"], c_id_1, "Throw it out the window", time_in_60)
+
+    with pytest.raises(AccessError, match=r"You are not authorised to alter this channel"):
+        message_sendlater_cancel(user_c["token"], msg_1["message_id"])
+
+    clear()
@@ -0,0 +1,110 @@
+"""
+message_sendlater_list
+
+Takes in parameters `token`, `channel_id`
+Returns a dictionary {messages}
+
+Description: Lists the messages waiting to be sent later to the
+channel specified by channel_id, soonest first
+
+Exceptions:
+  - InputError when Channel ID is not a valid channel
+  - AccessError when the authorised user has not joined the channel
+"""
+
+
+from datetime import datetime
+from time import sleep
+import pytest
+from channels import channels_create
+from error import AccessError, InputError
+from message import message_sendlater, message_sendlater_list
+from other import clear
+from conftest import user_a, user_b
+
+
+def test_message_sendlater_list_success(user_a):
+    """
+    Test 1 - Pending messages are listed soonest first
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_60 = int((datetime.now()).timestamp()) + 60
+    msg_1 = message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_60)
+    msg_2 = message_sendlater(user_a["token"], c_id_1, "I like trains", time_in_60 - 30)
+
+    assert message_sendlater_list(user_a["token"], c_id_1) == {
+        "messages": [
+            {
+                "message_id": msg_2["message_id"],
+                "u_id": user_a["u_id"],
+                "message": "I like trains",
+                "time_sent": time_in_60 - 30,
+            },
+            {
+                "message_id": msg_1["message_id"],
+                "u_id": user_a["u_id"],
+                "message": "Throw it out the window",
+                "time_sent": time_in_60,
+            },
+        ],
+    }
+
+    clear()
+
+
+def test_message_sendlater_list_sent(user_a):
+    """
+    Test 2 - Messages are no longer listed once they have been sent
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    time_in_1 = int((datetime.now()).timestamp()) + 1
+    message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_1)
+
+    sleep(2)
+    assert message_sendlater_list(user_a["token"], c_id_1) == {"messages": []}
+
+    clear()
+
+
+def test_message_sendlater_list_other_channel(user_a):
+    """
+    Test 3 - Only messages waiting to be sent to the given channel are listed
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    channel_2 = channels_create(user_a["token"], "the cage", True)
+    c_id_2 = channel_2["channel_id"]
+
+    time_in_60 = int((datetime.now()).timestamp()) + 60
+    message_sendlater(user_a["token"], c_id_1, "Throw it out the window", time_in_60)
+
+    assert message_sendlater_list(user_a["token"], c_id_2) == {"messages": []}
+
+    clear()
+
+
+def test_message_sendlater_list_invalid_channel(user_a):
+    """
+    Test 4 - InputError - Channel ID is not valid
+    """
+    with pytest.raises(InputError, match=r"Channel: 7 does not exist"):
+        message_sendlater_list(user_a["token"], 7)
+
+    clear()
+
+
+def test_message_sendlater_list_not_member(user_a, user_b):
+    """
+    Test 5 - AccessError - User is not a member of the channel
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    with pytest.raises(AccessError, match=r"You must be a member of the channel to view its details"):
+        message_sendlater_list(user_b["token"], c_id_1)
+
+    clear()
@@ -5,10 +5,29 @@ changing admin permissions, and searching for messages
 """
 
 
+import json
+from collections import ChainMap
 from data import DATA
 from error import InputError, AccessError
 from auth import decode_token
+from auth_helper import (
+    base_handle,
+    check_email_format,
+    check_name,
+    check_password,
+    clear_token_cache,
+    free_handle,
+)
 from find import find_user_from_token, find_user_from_uid, find_uid_from_token
+from index import INDEX, find_trigram_candidates, trigrams_ready
+from locks import USERS_LOCK, CHANNELS_LOCK
+from message_helper import message_view
+from hashing import hash_passwords
+from store import add_users, clear_data, set_permission
+from outbox import clear_outbox
+from scheduler import clear_scheduler
+from sessions import clear_sessions
+from streams import clear_streams
 
 
 ########################################################################
@@ -30,6 +49,52 @@ def check_valid_pid(permission_id):
     return False
 
 
+IMPORT_FIELDS = ("email", "password", "name_first", "name_last")
+
+
+def check_import_row(line):
+    """
+    Parses and validates one line of a user import
+    Parameters:
+        line (str or bytes): a JSON object with the fields auth_register takes
+    Return:
+        row (dict): the row, or raises InputError describing what is wrong
+    """
+    try:
+        row = json.loads(line)
+    except ValueError:
+        raise InputError(description="Invalid JSON")
+    if not isinstance(row, dict):
+        raise InputError(description="Row must be a JSON object")
+    for field in IMPORT_FIELDS:
+        if not isinstance(row.get(field), str):
+            raise InputError(description=f"Missing {field}")
+
+    check_email_format(row["email"])
+    check_password(row["password"])
+    check_name(row["name_first"])
+    check_name(row["name_last"])
+    return row
+
+
+def check_import_emails(rows, errors):
+    """
+    Adds an error for each row whose email is already registered, or used
+    by an earlier row of the import
+    Parameters:
+        rows (list): of (line_number, row)
+        errors (list): of {"line", "error"}, added to
+    Return:
+        None
+    """
+    seen = set()
+    for line_number, row in rows:
+        email = row["email"]
+        if email in INDEX["users_by_email"] or email in seen:
+            errors.append({"line": line_number, "error": "Email taken by another user"})
+        seen.add(email)
+
+
 # Check if that user (w/ token) is authorised owner
 def check_is_admin(token):
     """
@@ -39,10 +104,10 @@ def check_is_admin(token):
     Return:
         (bool): "True" if the user is an admin or "False" if not
     """
-    for user in DATA["users"]:
-        if user["token"] == token:
-            if user["permission_id"] == 1:
-                return True
+    session = DATA["sessions"].get(token)
+    user = session and INDEX["users_by_uid"][session.u_id]
+    if user and user["permission_id"] == 1:
+        return True
     return False
 
 
@@ -55,11 +120,13 @@ def clear():
     """
     Clear DATA after test function is complete
     """
-    DATA["users"].clear()
-    DATA["channels"].clear()
-    DATA["message_log"]["messages"].clear()
-    DATA["message_log"]["msg_counter"] = 1
-    DATA["standup"].clear()
+    with USERS_LOCK, CHANNELS_LOCK:
+        clear_data()
+        clear_scheduler()
+        clear_token_cache()
+        clear_sessions()
+        clear_outbox()
+        clear_streams()
 
 def users_all(token):
     """
@@ -125,8 +192,77 @@ def admin_userpermission_change(token, u_id, permission_id):
     if not check_is_admin(decoded_token):
         raise AccessError(description="User is not an admin")
 
-    user = find_user_from_uid(u_id)
-    user["permission_id"] = permission_id
+    set_permission(u_id, permission_id)
+
+
+def admin_users_import(token, lines):
+    """
+    Registers a batch of users at once. Every row is checked before any
+    are added, and either every user is added or, if any row has an error,
+    none of them are
+
+    Parameters:
+        token (str)
+        lines (iterable): JSON lines, each an object with email, password,
+            name_first and name_last, read one at a time so it can be a stream
+    AccessError:
+        - The authorised user is not an owner
+    Return:
+        (dict): u_ids of the users added, in row order, and errors,
+            a list of {"line", "error"} for every row that can't be added
+    """
+    decoded_token = decode_token(token)
+    find_user_from_token(decoded_token)
+    if not check_is_admin(decoded_token):
+        raise AccessError(description="User is not an admin")
+
+    # One pass over the stream, checking everything that doesn't depend on
+    # the users already registered
+    rows = []
+    errors = []
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            rows.append((line_number, check_import_row(line)))
+        except InputError as error:
+            errors.append({"line": line_number, "error": error.description})
+    check_import_emails(rows, errors)
+    if errors:
+        return {"u_ids": [], "errors": sorted(errors, key=lambda error: error["line"])}
+
+    # Hashing before taking the lock, so registrations don't wait on it
+    passwords = hash_passwords([row["password"] for _, row in rows])
+
+    with USERS_LOCK:
+        # Check again, users may have registered while the passwords hashed
+        check_import_emails(rows, errors)
+        if errors:
+            return {"u_ids": [], "errors": errors}
+
+        handles = {}
+        taken = ChainMap(handles, INDEX["users_by_handle"])
+        new_users = []
+        for (_, row), password in zip(rows, passwords):
+            handle = free_handle(
+                base_handle(row["name_first"], row["name_last"]), taken, INDEX["handle_matches"]
+            )
+            handles[handle] = True
+            new_users.append({
+                "email": row["email"],
+                "password": password,
+                "reset_code": None,
+                "name_first": row["name_first"],
+                "name_last": row["name_last"],
+                "u_id": len(DATA["users"]) + len(new_users) + 1,
+                "handle_str": handle,
+                "permission_id": 2,
+                "user_message_id": [],
+                "profile_img_url": None,
+            })
+        add_users(new_users)
+
+    return {"u_ids": [user["u_id"] for user in new_users], "errors": []}
 
 
 def search(token, query_str):
@@ -143,18 +279,21 @@ def search(token, query_str):
     decoded_token = decode_token(token)
     u_id = find_uid_from_token(decoded_token)
 
+    if len(query_str) >= 3 and trigrams_ready():
+        # Only verify the user's own messages that contain every trigram of
+        # the query, so the cost follows the user's matches not everyone's
+        own = INDEX["messages_by_user"].get(u_id, set())
+        candidates = sorted(find_trigram_candidates(query_str, own))
+    else:
+        # Too short to have a trigram, or the trigram index is still being
+        # rebuilt, check each of the user's messages
+        candidates = list(DATA["users"][u_id - 1]["user_message_id"])
+
+    # Return each match as the caller sees it, skipping messages removed
+    # since the candidates were found
     message_match = []
-    for user_m_id in DATA["users"][u_id - 1]["user_message_id"]:
-        for message in DATA["message_log"]["messages"]:
-            if message["message_id"] == user_m_id and query_str in message["message"]:
-                message_match.append(message)
-
-    # For each message being returned, check whether or not the user calling search
-    # has reacted to each message
-    for message in message_match:
-        if u_id in message["reacts"][0]["u_ids"]:
-            message["reacts"][0]["is_this_user_reacted"] = True
-        else:
-            message["reacts"][0]["is_this_user_reacted"] = False
+    for message in map(INDEX["messages_by_id"].get, candidates):
+        if message and message["u_id"] == u_id and query_str in message["message"]:
+            message_match.append(message_view(message, u_id))
 
     return {"messages": message_match}
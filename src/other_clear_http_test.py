@@ -106,5 +106,7 @@ def test_clear_data(url, user_a):
                 "messages": [],
                 "msg_counter": 1,
             },
-        "standup": []
+        "standup": [],
+        "sessions": {},
+        "scheduled": {},
     }
@@ -40,7 +40,9 @@ def test_clear_channels_only(user_a):
                 "messages": [],
                 "msg_counter": 1,
             },
-        "standup": []
+        "standup": [],
+        "sessions": {},
+        "scheduled": {},
     }
 
 
@@ -64,5 +66,7 @@ def test_clear_users_only():
                 "messages": [],
                 "msg_counter": 1,
             },
-        "standup": []
+        "standup": [],
+        "sessions": {},
+        "scheduled": {},
     }
@@ -12,9 +12,11 @@ Returns:
 
 
 import pytest
+import index
 from auth import auth_register
 from data import DATA
-from message import message_send, message_react
+from index import TRIGRAMS, build_trigrams, drop_trigrams
+from message import message_send, message_react, message_edit, message_remove
 from channels import channels_create
 from other import search, clear
 
@@ -278,3 +280,91 @@ def test_search_success_react(user_a):
     }
 
     clear()
+
+
+def test_search_after_edit_and_remove(user_a):
+    """
+    Test 6 - Queries follow edits and removals of messages
+    """
+    # Create a channel and assign channel id to variable
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+
+    msg_1 = message_send(user_a["token"], c_id_1, "throw it out the window")
+    msg_2 = message_send(user_a["token"], c_id_1, "out of the window")
+
+    # Edited message no longer matches its old text but matches its new text
+    message_edit(user_a["token"], msg_1["message_id"], "grapefruit")
+    assert [msg["message_id"] for msg in search(user_a["token"], "throw")["messages"]] == []
+    assert [msg["message_id"] for msg in search(user_a["token"], "fruit")["messages"]] == [
+        msg_1["message_id"]
+    ]
+
+    # Removed messages are no longer found, by long or short queries
+    message_remove(user_a["token"], msg_2["message_id"])
+    assert search(user_a["token"], "window") == {"messages": []}
+    assert search(user_a["token"], "o") == {"messages": []}
+
+    clear()
+
+
+def test_search_own_messages(user_a, user_b):
+    """
+    Test 7 - Only the caller's own messages are searched, however many of
+    other users' messages match
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    for i in range(20):
+        message_send(user_a["token"], c_id_1, f"out the window {i}")
+    channel_2 = channels_create(user_b["token"], "top dawg", True)
+    msg = message_send(user_b["token"], channel_2["channel_id"], "window seat")
+
+    assert [m["message_id"] for m in search(user_b["token"], "window")["messages"]] == [
+        msg["message_id"]
+    ]
+    assert len(search(user_a["token"], "window")["messages"]) == 20
+
+    clear()
+
+
+def test_search_during_rebuild(user_a, monkeypatch):
+    """
+    Test 8 - Searches are answered while the trigram index is rebuilt, and
+    messages sent, edited and removed during the rebuild are kept in it
+    """
+    channel_1 = channels_create(user_a["token"], "billionaire records", True)
+    c_id_1 = channel_1["channel_id"]
+    msg_1 = message_send(user_a["token"], c_id_1, "throw it out the window")
+    msg_2 = message_send(user_a["token"], c_id_1, "out of the window")
+
+    # Scanned until the index is back
+    drop_trigrams()
+    monkeypatch.setattr(index, "start_trigram_builder", lambda: None)
+    assert len(search(user_a["token"], "window")["messages"]) == 2
+    assert not TRIGRAMS["built"]
+
+    # Changes made part way through the build, which doesn't hold the lock
+    add_postings = index.add_postings
+    changed = []
+
+    def add_postings_and_change(postings, m_id, text):
+        if not changed:
+            changed.append(message_send(user_a["token"], c_id_1, "window seat"))
+            message_edit(user_a["token"], msg_1["message_id"], "grapefruit")
+            message_remove(user_a["token"], msg_2["message_id"])
+        add_postings(postings, m_id, text)
+
+    monkeypatch.setattr(index, "add_postings", add_postings_and_change)
+    build_trigrams()
+    assert TRIGRAMS["built"]
+
+    assert [m["message_id"] for m in search(user_a["token"], "window")["messages"]] == [
+        changed[0]["message_id"]
+    ]
+    assert [m["message_id"] for m in search(user_a["token"], "fruit")["messages"]] == [
+        msg_1["message_id"]
+    ]
+    assert search(user_a["token"], "throw") == {"messages": []}
+
+    clear()
@@ -0,0 +1,257 @@
+"""
+outbox.py
+emails waiting to be sent, and the background sender that sends them
+
+Routes queue an email and return straight away. The sender keeps one
+SMTP connection open between batches, sends every email that is due over
+it, and closes it once it has been idle for a while. An email that fails
+is put back to be retried after a backoff that doubles with each attempt,
+and is dropped once it has used up its retries.
+"""
+
+
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from email.message import EmailMessage
+
+
+global OUTBOX
+OUTBOX = {
+    # Held while the queue and counters change, notified when an email is queued
+    "ready": threading.Condition(),
+    # (time_due, time_queued, attempts, message), in the order they were queued
+    "queue": deque(),
+    # Emails taken off the queue and not yet sent or put back
+    "sending": 0,
+    "host": "smtp.gmail.com",
+    "port": 465,
+    # SMTP over SSL, otherwise plain SMTP
+    "ssl": True,
+    "sender": "grapefruit1531@gmail.com",
+    "password": "throwitoutthewindow",
+    # Seconds to wait on the server
+    "timeout": 10,
+    # Most emails sent in one go, and seconds an unused connection is kept
+    "batch": 32,
+    "idle": 30,
+    # Attempts an email gets, and seconds before the first retry
+    "attempts": 5,
+    "backoff": 0.5,
+    "connection": None,
+    "last_used": 0,
+    "sent": 0,
+    "retried": 0,
+    "failed": 0,
+    # Seconds from being queued to being sent, for the most recent emails
+    "latencies": deque(maxlen=1024),
+    "stop": threading.Event(),
+    "thread": None,
+}
+
+
+# _______________________________Queueing________________________________#
+
+
+def queue_email(receiver, subject, body):
+    """
+    Queues an email to be sent by the background sender
+    Parameters:
+        receiver (str): email address
+        subject (str)
+        body (str)
+    Returns:
+        None
+    """
+    message = EmailMessage()
+    message["From"] = OUTBOX["sender"]
+    message["To"] = receiver
+    message["Subject"] = subject
+    message.set_content(body)
+
+    now = time.time()
+    with OUTBOX["ready"]:
+        OUTBOX["queue"].append((now, now, 0, message))
+        OUTBOX["ready"].notify()
+
+
+def outbox_metrics():
+    """
+    Returns:
+        (dict): emails queued and being sent, how many have been sent,
+            retried and dropped, and the send latency percentiles in ms
+    """
+    with OUTBOX["ready"]:
+        latencies = sorted(OUTBOX["latencies"])
+        metrics = {
+            field: OUTBOX[field] for field in ("sending", "sent", "retried", "failed")
+        }
+        metrics["queued"] = len(OUTBOX["queue"])
+
+    for name, fraction in (("p50_ms", 0.5), ("p99_ms", 0.99)):
+        index = min(len(latencies) - 1, int(len(latencies) * fraction))
+        metrics[name] = latencies[index] * 1000 if latencies else None
+    return metrics
+
+
+def flush_outbox(timeout):
+    """
+    Waits for every queued email to be sent or dropped
+    Parameters:
+        timeout (float): seconds
+    Returns:
+        (bool): True if the outbox emptied in time
+    """
+    deadline = time.time() + timeout
+    with OUTBOX["ready"]:
+        while OUTBOX["queue"] or OUTBOX["sending"]:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            OUTBOX["ready"].wait(min(remaining, 0.05))
+    return True
+
+
+def clear_outbox():
+    """
+    Drops every email still waiting and resets the counters
+    """
+    with OUTBOX["ready"]:
+        OUTBOX["queue"].clear()
+        OUTBOX["latencies"].clear()
+        for field in ("sent", "retried", "failed"):
+            OUTBOX[field] = 0
+
+
+# _______________________________Sending_________________________________#
+
+
+def connect():
+    """
+    Returns the open SMTP connection, opening and logging in if there isn't one
+    """
+    if OUTBOX["connection"] is None:
+        if OUTBOX["ssl"]:
+            connection = smtplib.SMTP_SSL(
+                OUTBOX["host"], OUTBOX["port"], timeout=OUTBOX["timeout"],
+                context=ssl.create_default_context(),
+            )
+        else:
+            connection = smtplib.SMTP(OUTBOX["host"], OUTBOX["port"], timeout=OUTBOX["timeout"])
+        if OUTBOX["password"]:
+            connection.login(OUTBOX["sender"], OUTBOX["password"])
+        OUTBOX["connection"] = connection
+    return OUTBOX["connection"]
+
+
+def disconnect():
+    """
+    Closes the SMTP connection, if one is open
+    """
+    connection = OUTBOX["connection"]
+    OUTBOX["connection"] = None
+    if connection is not None:
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+
+def take_batch(now):
+    """
+    Takes the emails that are due off the queue, the caller must hold the
+    outbox's lock
+    Returns:
+        batch (list): of queue entries
+    """
+    batch = []
+    waiting = deque()
+    queue = OUTBOX["queue"]
+    while queue and len(batch) < OUTBOX["batch"]:
+        entry = queue.popleft()
+        (batch if entry[0] <= now else waiting).append(entry)
+    queue.extendleft(reversed(waiting))
+    OUTBOX["sending"] += len(batch)
+    return batch
+
+
+def send_batch(batch):
+    """
+    Sends a batch of emails over the one connection. An email that fails
+    closes the connection and is put back with a backoff, or dropped once
+    it has no attempts left, the ones after it are put back untried
+    Parameters:
+        batch (list): of queue entries
+    Returns:
+        None
+    """
+    for position, (time_due, time_queued, attempts, message) in enumerate(batch):
+        try:
+            connect().send_message(message)
+        except (smtplib.SMTPException, OSError):
+            disconnect()
+            now = time.time()
+            with OUTBOX["ready"]:
+                if attempts + 1 >= OUTBOX["attempts"]:
+                    OUTBOX["failed"] += 1
+                else:
+                    OUTBOX["retried"] += 1
+                    time_due = now + OUTBOX["backoff"] * 2 ** attempts
+                    OUTBOX["queue"].append((time_due, time_queued, attempts + 1, message))
+                # The rest wait for the next batch, on a new connection
+                OUTBOX["queue"].extend(batch[position + 1:])
+                OUTBOX["sending"] -= len(batch) - position
+                OUTBOX["ready"].notify_all()
+            return
+
+        now = time.time()
+        OUTBOX["last_used"] = now
+        with OUTBOX["ready"]:
+            OUTBOX["sent"] += 1
+            OUTBOX["sending"] -= 1
+            OUTBOX["latencies"].append(now - time_queued)
+            OUTBOX["ready"].notify_all()
+
+
+def run_sender():
+    """
+    Sender loop: sends whatever is due, then sleeps until the next email is
+    queued or due, closing the connection once it has gone unused
+    """
+    while not OUTBOX["stop"].is_set():
+        now = time.time()
+        with OUTBOX["ready"]:
+            batch = take_batch(now)
+            if not batch:
+                queue = OUTBOX["queue"]
+                next_due = min(entry[0] for entry in queue) if queue else now + 1
+                OUTBOX["ready"].wait(min(max(next_due - now, 0.01), 1))
+
+        if batch:
+            send_batch(batch)
+        elif OUTBOX["connection"] is not None and now - OUTBOX["last_used"] > OUTBOX["idle"]:
+            disconnect()
+    disconnect()
+
+
+def start_sender():
+    """
+    Starts sending queued emails in the background
+    """
+    OUTBOX["stop"].clear()
+    OUTBOX["thread"] = threading.Thread(target=run_sender, daemon=True)
+    OUTBOX["thread"].start()
+
+
+def stop_sender():
+    """
+    Stops the background sender, emails still queued stay queued
+    """
+    OUTBOX["stop"].set()
+    with OUTBOX["ready"]:
+        OUTBOX["ready"].notify_all()
+    if OUTBOX["thread"] is not None:
+        OUTBOX["thread"].join()
+        OUTBOX["thread"] = None
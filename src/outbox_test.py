@@ -0,0 +1,145 @@
+"""
+outbox
+
+Emails are queued and sent by a background sender over one SMTP
+connection, failed sends are retried with a backoff and dropped once
+they run out of attempts
+"""
+
+
+import socketserver
+import threading
+import pytest
+from outbox import OUTBOX, clear_outbox, flush_outbox, outbox_metrics, queue_email
+from outbox import start_sender, stop_sender
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    A local SMTP server standing in for the real one, it records every
+    email it accepts and how many connections were made, and refuses the
+    first refuse emails it is sent
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuse=0):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.received = []
+        self.connections = 0
+        self.refuse = refuse
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP for smtplib to send an email
+    """
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in ready")
+        for line in self.rfile:
+            command = line.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith("MAIL"):
+                if server.refuse:
+                    server.refuse -= 1
+                    self.reply("451 try again later")
+                else:
+                    self.reply("250 OK")
+            elif command.startswith("DATA"):
+                self.reply("354 end with .")
+                body = []
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                    body.append(data.decode())
+                server.received.append("".join(body))
+                self.reply("250 OK")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server():
+    """
+    Fixture that points the outbox at a local SMTP stand-in and runs the
+    sender, the stand-in refuses as many emails as the test asks
+    """
+    settings = {field: OUTBOX[field] for field in ("host", "port", "ssl", "password", "backoff")}
+    servers = []
+
+    def start(refuse=0):
+        server = SMTPStandIn(refuse)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        OUTBOX.update(
+            host="127.0.0.1", port=server.server_address[1], ssl=False, password=None,
+            backoff=0.01,
+        )
+        start_sender()
+        return server
+
+    yield start
+    stop_sender()
+    clear_outbox()
+    OUTBOX.update(settings)
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_outbox_burst(smtp_server):
+    """
+    Test 1 - A burst of emails is sent over the one connection
+    """
+    server = smtp_server()
+    for i in range(50):
+        queue_email(f"user{i}@gmail.com", "Flockr password reset", f"code {i}")
+
+    assert flush_outbox(10)
+    assert len(server.received) == 50
+    assert "code 49" in server.received[-1]
+    assert server.connections == 1
+
+    metrics = outbox_metrics()
+    assert metrics["sent"] == 50
+    assert metrics["queued"] == 0
+    assert metrics["sending"] == 0
+    assert metrics["p50_ms"] <= metrics["p99_ms"]
+
+
+def test_outbox_retry(smtp_server):
+    """
+    Test 2 - Emails the server refuses are retried until they are sent
+    """
+    server = smtp_server(refuse=2)
+    queue_email("nbayoungboy@gmail.com", "Flockr password reset", "code 1")
+    queue_email("jerrychan@gmail.com", "Flockr password reset", "code 2")
+
+    assert flush_outbox(10)
+    assert len(server.received) == 2
+    metrics = outbox_metrics()
+    assert (metrics["sent"], metrics["retried"], metrics["failed"]) == (2, 2, 0)
+
+
+def test_outbox_give_up(smtp_server):
+    """
+    Test 3 - An email is dropped once it has used up its attempts
+    """
+    server = smtp_server(refuse=OUTBOX["attempts"])
+    queue_email("nbayoungboy@gmail.com", "Flockr password reset", "code 1")
+
+    assert flush_outbox(10)
+    assert server.received == []
+    metrics = outbox_metrics()
+    assert (metrics["sent"], metrics["retried"], metrics["failed"]) == (
+        0, OUTBOX["attempts"] - 1, 1
+    )
@@ -0,0 +1,309 @@
+"""
+records.py
+compact record types for what DATA stores about users, channels,
+messages and sessions
+
+Each is a class with __slots__ rather than a dict, so it costs one small
+object instead of a hash table per user, channel, message or session. Records can
+still be read like the dicts they replace, record["u_id"] is record.u_id,
+and to_dict() gives back the dict, which is the shape the journal,
+snapshots and http responses use. Records are only changed by store.py.
+"""
+
+
+import time
+
+
+class Record:
+    """
+    Base for the record types, a record's fields are its __slots__
+    """
+    __slots__ = ()
+
+    # record["field"] reads record.field, done in C rather than a method
+    __getitem__ = object.__getattribute__
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__
+        )
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self):
+        """
+        Returns:
+            (dict): the record as the dict it replaces
+        """
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, fields):
+        """
+        Parameters:
+            fields (dict): as returned by to_dict()
+        Returns:
+            record
+        """
+        return cls(*(fields[field] for field in cls.__slots__))
+
+
+class RemovableList(list):
+    """
+    A list of message ids that an item is removed from in O(1), by leaving
+    None in its place so nothing after it moves. Each item's position is
+    looked up in a dict built by the first removal, and once the
+    tombstones outnumber the items left they are compacted away, so
+    removing stays O(1) amortised. Tombstones are left out when comparing
+    and by live(). Besides reading, only append, remove, clear and slice
+    assignment are used on these lists
+    """
+    __slots__ = ("positions", "tombstones")
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        # key -> position, None until something is removed
+        self.positions = None
+        self.tombstones = self.count(None)
+
+    def __reduce__(self):
+        # Copies start without positions, they are rebuilt when needed
+        return type(self), (list(self),)
+
+    @staticmethod
+    def key(item):
+        """
+        Returns:
+            what an item is looked up by, the item itself
+        """
+        return item
+
+    def live(self):
+        """
+        Returns:
+            (list): the items, without the tombstones
+        """
+        if not self.tombstones:
+            return list(self)
+        return [item for item in self if item is not None]
+
+    def __eq__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        live = other.live() if isinstance(other, RemovableList) else other
+        return self.live() == live
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def append(self, item):
+        if self.positions is not None:
+            self.positions[self.key(item)] = len(self)
+        super().append(item)
+
+    def remove(self, item):
+        if self.positions is None:
+            self.positions = {
+                self.key(other): position
+                for position, other in enumerate(self)
+                if other is not None
+            }
+        position = self.positions.pop(self.key(item))
+        list.__setitem__(self, position, None)
+        self.tombstones += 1
+        if self.tombstones * 2 > len(self):
+            self.compact()
+
+    def compact(self):
+        """
+        Drops the tombstones, moving every item after one
+        """
+        list.__setitem__(self, slice(None), self.live())
+        self.positions = None
+        self.tombstones = 0
+
+    def clear(self):
+        super().clear()
+        self.positions = None
+        self.tombstones = 0
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.positions = None
+        self.tombstones = self.count(None)
+
+
+class MessageList(RemovableList):
+    """
+    The message log, a RemovableList of Message records looked up by their
+    message_id
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def key(item):
+        return item.message_id
+
+
+class User(Record):
+    """
+    A registered user
+    """
+    __slots__ = (
+        "email",
+        "password",
+        "reset_code",
+        "name_first",
+        "name_last",
+        "u_id",
+        "handle_str",
+        "permission_id",
+        "user_message_id",
+        "profile_img_url",
+    )
+
+    def __init__(
+        self,
+        email,
+        password,
+        reset_code,
+        name_first,
+        name_last,
+        u_id,
+        handle_str,
+        permission_id,
+        user_message_id,
+        profile_img_url,
+    ):
+        self.email = email
+        self.password = password
+        self.reset_code = reset_code
+        self.name_first = name_first
+        self.name_last = name_last
+        self.u_id = u_id
+        self.handle_str = handle_str
+        self.permission_id = permission_id
+        self.user_message_id = RemovableList(user_message_id)
+        self.profile_img_url = profile_img_url
+
+    def to_dict(self):
+        user = super().to_dict()
+        user["user_message_id"] = self.user_message_id.live()
+        return user
+
+
+class Channel(Record):
+    """
+    A channel, holding the u_ids of its members and owners, in the order
+    they were added, and the message_ids sent to it. Their names and photos
+    are only kept by the user, channel_details renders them from there
+    """
+    __slots__ = (
+        "all_members",
+        "channel_id",
+        "is_public",
+        "messages",
+        "name",
+        "owner_members",
+    )
+
+    def __init__(self, all_members, channel_id, is_public, messages, name, owner_members):
+        self.all_members = list(all_members)
+        self.channel_id = channel_id
+        self.is_public = is_public
+        self.messages = RemovableList(messages)
+        self.name = name
+        self.owner_members = list(owner_members)
+
+    def to_dict(self):
+        channel = super().to_dict()
+        channel["all_members"] = list(self.all_members)
+        channel["owner_members"] = list(self.owner_members)
+        channel["messages"] = self.messages.live()
+        return channel
+
+
+class Message(Record):
+    """
+    A sent message. flockr only has the one react, react_id 1, so only the
+    u_ids who reacted with it are kept, as a tuple that is replaced rather
+    than changed so responses can share it
+    """
+    __slots__ = ("message_id", "u_id", "message", "time_created", "react_u_ids", "is_pinned")
+
+    def __init__(self, message_id, u_id, message, time_created, react_u_ids, is_pinned):
+        self.message_id = message_id
+        self.u_id = u_id
+        self.message = message
+        self.time_created = time_created
+        self.react_u_ids = tuple(react_u_ids)
+        self.is_pinned = is_pinned
+
+    @property
+    def reacts(self):
+        """
+        Returns:
+            reacts (list): the reacts as they were stored in the message dict
+        """
+        return [
+            {
+                "react_id": 1,
+                "u_ids": list(self.react_u_ids),
+                "is_this_user_reacted": False,
+            }
+        ]
+
+    def to_dict(self):
+        return {
+            "message_id": self.message_id,
+            "u_id": self.u_id,
+            "message": self.message,
+            "time_created": self.time_created,
+            "reacts": self.reacts,
+            "is_pinned": self.is_pinned,
+        }
+
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(
+            fields["message_id"],
+            fields["u_id"],
+            fields["message"],
+            fields["time_created"],
+            fields["reacts"][0]["u_ids"],
+            fields["is_pinned"],
+        )
+
+
+class Session(Record):
+    """
+    A user being logged in, tokens are signed session_ids. last_seen is
+    when the session was last used, it is only kept in memory since it
+    changes on every request, so a session loaded on startup counts as
+    seen then and it is left out of comparisons and to_dict()
+    """
+    __slots__ = ("session_id", "u_id", "issued", "last_seen")
+
+    def __init__(self, session_id, u_id, issued, last_seen=None):
+        self.session_id = session_id
+        self.u_id = u_id
+        self.issued = issued
+        self.last_seen = time.time() if last_seen is None else last_seen
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        return {"session_id": self.session_id, "u_id": self.u_id, "issued": self.issued}
+
+    @classmethod
+    def from_dict(cls, fields):
+        return cls(fields["session_id"], fields["u_id"], fields["issued"])
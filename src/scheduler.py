@@ -0,0 +1,132 @@
+"""
+scheduler.py
+runs functions at a given time from a single worker thread,
+jobs wait in a min-heap ordered by when they are due
+"""
+
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+global SCHEDULER
+SCHEDULER = {
+    # Heap of (time_due, job_id), may still hold cancelled jobs
+    "heap": [],
+    # job_id -> (function, args) for every job still waiting to run
+    "jobs": {},
+    "condition": threading.Condition(),
+    "job_ids": itertools.count(1),
+    "worker": None,
+}
+
+
+def schedule(time_due, function, args):
+    """
+    Schedules function(*args) to run once time_due has passed
+    Parameters:
+        time_due (float): unix timestamp
+        function (callable)
+        args (list)
+    Returns:
+        job_id (int): used to cancel the job
+    """
+    with SCHEDULER["condition"]:
+        job_id = next(SCHEDULER["job_ids"])
+        SCHEDULER["jobs"][job_id] = (function, args)
+        heapq.heappush(SCHEDULER["heap"], (time_due, job_id))
+        start_worker()
+        # Wake the worker in case this job is due before the one it waits on
+        SCHEDULER["condition"].notify()
+
+    return job_id
+
+
+def cancel(job_id):
+    """
+    Cancels a job that has not run yet
+    Parameters:
+        job_id (int)
+    Returns:
+        (bool): True if the job was waiting and is now cancelled
+    """
+    with SCHEDULER["condition"]:
+        if SCHEDULER["jobs"].pop(job_id, None) is None:
+            return False
+
+        # Cancelled jobs are skipped lazily, rebuild the heap once they
+        # outnumber the jobs still waiting so memory follows pending jobs
+        heap = SCHEDULER["heap"]
+        if len(heap) > 2 * len(SCHEDULER["jobs"]) + 64:
+            heap[:] = [entry for entry in heap if entry[1] in SCHEDULER["jobs"]]
+            heapq.heapify(heap)
+
+    return True
+
+
+def pending_jobs():
+    """
+    Returns:
+        (int): number of jobs waiting to run
+    """
+    with SCHEDULER["condition"]:
+        return len(SCHEDULER["jobs"])
+
+
+def clear_scheduler():
+    """
+    Drops every waiting job, called alongside clearing DATA
+    """
+    with SCHEDULER["condition"]:
+        SCHEDULER["jobs"].clear()
+        SCHEDULER["heap"].clear()
+        SCHEDULER["condition"].notify()
+
+
+def start_worker():
+    """
+    Starts the worker thread if it is not already running,
+    the caller must hold the scheduler's condition
+    """
+    if SCHEDULER["worker"] is None:
+        SCHEDULER["worker"] = threading.Thread(target=run_worker, daemon=True)
+        SCHEDULER["worker"].start()
+
+
+def run_worker():
+    """
+    Worker loop: sleeps until the earliest job is due, then runs it
+    outside the lock so jobs can schedule further jobs
+    """
+    condition = SCHEDULER["condition"]
+    heap = SCHEDULER["heap"]
+    while True:
+        with condition:
+            while True:
+                if not heap:
+                    condition.wait()
+                    continue
+
+                time_due, job_id = heap[0]
+                if job_id not in SCHEDULER["jobs"]:
+                    # Job was cancelled
+                    heapq.heappop(heap)
+                    continue
+
+                delay = time_due - time.time()
+                if delay > 0:
+                    condition.wait(delay)
+                    continue
+
+                heapq.heappop(heap)
+                function, args = SCHEDULER["jobs"].pop(job_id)
+                break
+
+        try:
+            function(*args)
+        except Exception:
+            # A failing job must not take the other jobs down with it
+            traceback.print_exc()
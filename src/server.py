@@ -6,15 +6,19 @@ for Flockr
 """
 
 
+import os
 import sys
-import smtplib, ssl
-from json import dumps
-from flask import Flask, request, send_from_directory
+from flask import (
+    Flask, Response, request, send_from_directory, stream_with_context
+)
 #from email.mime.multipart import MIMEMultipart
 #from email.mime.text import MIMEText
 #Currently unavailable
 # from flask_mail import Mail, Message
 from flask_cors import CORS
+from auth_helper import TOKEN_CACHE
+from encoder import ENCODER, encode
+from hashing import HASHING
 from auth import (
     auth_register,
     auth_login,
@@ -31,20 +35,37 @@ from channel import (
     channel_removemember,
     channel_details,
     channel_messages,
+    channel_messages_since,
+    channel_stream,
 )
 from channels import channels_create, channels_list, channels_listall
-from error import InputError
+from error import AccessError, InputError
+from etags import (
+    channel_details_etag,
+    channels_list_etag,
+    channels_listall_etag,
+    users_all_etag,
+    user_profile_etag,
+)
 from message import (
     message_send,
     message_remove,
     message_edit,
     message_sendlater,
+    message_sendlater_list,
+    message_sendlater_cancel,
     message_react,
     message_unreact,
     message_pin,
     message_unpin,
+    resume_scheduled,
 )
-from other import users_all, admin_userpermission_change, search, clear
+from other import users_all, admin_userpermission_change, admin_users_import, search, clear
+from journal import open_journal
+from outbox import OUTBOX, queue_email, start_sender
+from sessions import SESSIONS, start_sweeper
+from snapshot import load_snapshot, start_snapshotter
+from sqlite_store import open_sqlite
 from user import (
     user_profile,
     user_profile_setname,
@@ -53,26 +74,63 @@ from user import (
     user_profile_uploadphoto,
 )
 from standup import (
+    resume_standups,
     standup_active,
     standup_send,
     standup_start,
 )
 
 
+def respond(data):
+    """
+    Makes a JSON response, serialised by the chosen encoder
+    Parameters:
+        data (dict)
+    Returns:
+        (Response)
+    """
+    return APP.response_class(encode(data), mimetype=ENCODER["mimetype"])
+
+
+def conditional(etag, build):
+    """
+    Answers with 304 Not Modified if the client's copy, named in
+    If-None-Match, is still current, without building the response.
+    Otherwise builds it and tags it with its ETag
+    Parameters:
+        etag (function): returns the ETag of the current response
+        build (function): returns the response
+    """
+    try:
+        tag = etag()
+    except (AccessError, InputError):
+        # build raises the error in the usual way
+        return respond(build())
+
+    if request.if_none_match.contains_weak(tag):
+        response = APP.response_class(status=304)
+    else:
+        response = respond(build())
+    response.set_etag(tag)
+    # Cached copies are checked with the server each time they are used
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 def default_handler(err):
     """
     Flask route for default handler function
     """
     response = err.get_response()
     print("response", err, err.get_response())
-    response.data = dumps(
+    response.data = encode(
         {
             "code": err.code,
             "name": "System Error",
             "message": err.get_description(),
         }
     )
-    response.content_type = "application/json"
+    response.content_type = ENCODER["mimetype"]
     return response
 
 
@@ -92,7 +150,7 @@ def echo():
     data = request.args.get("data")
     if data == "echo":
         raise InputError(description='Cannot echo "echo"')
-    return dumps({"data": data})
+    return respond({"data": data})
 
 
 ####################################################################################
@@ -111,7 +169,7 @@ def register():
         info["email"], info["password"], info["name_first"], info["name_last"]
     )
     # Return the u_id and token from auth_register function
-    return dumps(new_user)
+    return respond(new_user)
 
 
 @APP.route("/auth/login", methods=["POST"])
@@ -124,7 +182,7 @@ def login():
     # Call login function
     login_user = auth_login(info["email"], info["password"])
     # Return the u_id and token from auth_login function
-    return dumps(login_user)
+    return respond(login_user)
 
 
 @APP.route("/auth/logout", methods=["POST"])
@@ -137,7 +195,7 @@ def logout():
     # Call logout function
     logout_user = auth_logout(info["token"])
     # Return the u_id and token from auth_logout function
-    return dumps(logout_user)
+    return respond(logout_user)
 
 
 @APP.route("/auth/passwordreset/request", methods=["POST"])
@@ -145,11 +203,6 @@ def passwordreset_request():
     """
     Flask route for auth passwordreset request function that sends an email to the users account
     """
-    port = 465  # For SSL
-    smtp_server = "smtp.gmail.com"
-    sender_email = "grapefruit1531@gmail.com"
-    receiver_email = "grapefruit1531@gmail.com"
-    password =  "throwitoutthewindow"
     info = request.get_json()
 
     # Call function in auth to generate reset_code
@@ -160,12 +213,10 @@ def passwordreset_request():
     The code to reset your password is: """
     message += secret_code
 
-    context = ssl.create_default_context()
-    with smtplib.SMTP_SSL(smtp_server, port, context=context) as server:
-        server.login(sender_email, password)
-        server.sendmail(sender_email, receiver_email, message)
+    # Sent by the outbox's sender, the request doesn't wait on SMTP
+    queue_email(info["email"], "Flockr password reset", message)
 
-    return dumps({})
+    return respond({})
 
 
 @APP.route("/auth/passwordreset/reset", methods=["POST"])
@@ -177,7 +228,7 @@ def passwordreset_reset():
     reset = auth_passwordreset_reset(info["reset_code"], info["new_password"])
 
     # Return the u_id and token from auth_register function
-    return dumps(reset)
+    return respond(reset)
 
 
 
@@ -199,7 +250,7 @@ def invite():
     u_id = int(payload["u_id"])
 
     # Call channel invite function and return json for it
-    return dumps(channel_invite(token, c_id, u_id))
+    return respond(channel_invite(token, c_id, u_id))
 
 
 @APP.route("/channel/join", methods=["POST"])
@@ -213,7 +264,7 @@ def join():
     c_id = int(payload["channel_id"])
 
     # Call channel join function and return json for it
-    return dumps(channel_join(token, c_id))
+    return respond(channel_join(token, c_id))
 
 
 @APP.route("/channel/leave", methods=["POST"])
@@ -227,7 +278,7 @@ def leave():
     c_id = int(payload["channel_id"])
 
     # Call channel leave function and return json for it
-    return dumps(channel_leave(token, c_id))
+    return respond(channel_leave(token, c_id))
 
 
 @APP.route("/channel/addowner", methods=["POST"])
@@ -242,7 +293,7 @@ def addowner():
     u_id = int(payload["u_id"])
 
     # Call channel addowner function and return json for it
-    return dumps(channel_addowner(token, c_id, u_id))
+    return respond(channel_addowner(token, c_id, u_id))
 
 
 @APP.route("/channel/removeowner", methods=["POST"])
@@ -257,7 +308,7 @@ def removeowner():
     u_id = int(payload["u_id"])
 
     # Call channel removeowner function and return json for it
-    return dumps(channel_removeowner(token, c_id, u_id))
+    return respond(channel_removeowner(token, c_id, u_id))
 
 
 @APP.route("/channel/removemember", methods=["POST"])
@@ -272,7 +323,7 @@ def removemember():
     u_id = int(payload["u_id"])
 
     # Call channel removemember function and return json for it
-    return dumps(channel_removemember(token, c_id, u_id))
+    return respond(channel_removemember(token, c_id, u_id))
 
 
 @APP.route("/channel/details", methods=["GET"])
@@ -284,8 +335,11 @@ def details():
     token = request.args.get("token")
     c_id = int(request.args.get("channel_id"))
 
-    # Call channel details function and return json for it
-    return dumps(channel_details(token, c_id))
+    # Call channel details function and return json for it, unless the
+    # client's copy is current
+    return conditional(
+        lambda: channel_details_etag(token, c_id), lambda: channel_details(token, c_id)
+    )
 
 
 @APP.route("/channel/messages", methods=["GET"])
@@ -299,7 +353,41 @@ def messages():
     start = int(request.args.get("start"))
 
     # Call channel messages function and return json for it
-    return dumps(channel_messages(token, c_id, start))
+    return respond(channel_messages(token, c_id, start))
+
+
+@APP.route("/channel/messages/since", methods=["GET"])
+def messages_since():
+    """
+    Flask route for channel messages since function, which waits up to
+    timeout seconds for a change
+    """
+    # Request channel_messages_since details
+    token = request.args.get("token")
+    c_id = int(request.args.get("channel_id"))
+    seq = int(request.args.get("seq", 0))
+    timeout = float(request.args.get("timeout", 25))
+
+    # Call channel messages since function and return json for it
+    return respond(channel_messages_since(token, c_id, seq, timeout))
+
+
+@APP.route("/channel/stream", methods=["GET"])
+def stream():
+    """
+    Flask route for channel stream function, a Server-Sent Events stream
+    that stays open
+    """
+    # Request channel_stream details
+    token = request.args.get("token")
+
+    # Call channel stream function and stream its events
+    events = channel_stream(token)
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 ####################################################################################
@@ -318,7 +406,7 @@ def create_channel():
     is_public = payload["is_public"]
 
     # Call channels create function and return json for it
-    return dumps(channels_create(token, name, is_public))
+    return respond(channels_create(token, name, is_public))
 
 
 @APP.route("/channels/list", methods=["GET"])
@@ -328,8 +416,9 @@ def list_channels():
     """
     token = request.args.get("token")
 
-    # Call channels create function and return json for it
-    return dumps(channels_list(token))
+    # Call channels list function and return json for it, unless the
+    # client's copy is current
+    return conditional(lambda: channels_list_etag(token), lambda: channels_list(token))
 
 
 @APP.route("/channels/listall", methods=["GET"])
@@ -339,8 +428,9 @@ def listall_channels():
     """
     token = request.args.get("token")
 
-    # Call channels listall function and return json for it
-    return dumps(channels_listall(token))
+    # Call channels listall function and return json for it, unless the
+    # client's copy is current
+    return conditional(lambda: channels_listall_etag(token), lambda: channels_listall(token))
 
 
 ####################################################################################
@@ -356,8 +446,9 @@ def profile():
     token = request.args.get("token")
     u_id = int(request.args.get("u_id"))
 
-    # Call user profile function and return json for it
-    return dumps(user_profile(token, u_id))
+    # Call user profile function and return json for it, unless the
+    # client's copy is current
+    return conditional(lambda: user_profile_etag(token, u_id), lambda: user_profile(token, u_id))
 
 
 @APP.route("/user/profile/setname", methods=["PUT"])
@@ -371,7 +462,7 @@ def profile_setname():
     name_last = info["name_last"]
 
     # Call user profile setname and return json for it
-    return dumps(user_profile_setname(token, name_first, name_last))
+    return respond(user_profile_setname(token, name_first, name_last))
 
 
 @APP.route("/user/profile/setemail", methods=["PUT"])
@@ -384,7 +475,7 @@ def profile_setemail():
     email = info["email"]
 
     # Call user profile setemail and return json for it
-    return dumps(user_profile_setemail(token, email))
+    return respond(user_profile_setemail(token, email))
 
 
 @APP.route("/user/profile/sethandle", methods=["PUT"])
@@ -397,7 +488,7 @@ def profile_sethandle():
     handle_str = info["handle_str"]
 
     # Call user profile sethandle and return json for it
-    return dumps(user_profile_sethandle(token, handle_str))
+    return respond(user_profile_sethandle(token, handle_str))
 
 
 @APP.route("/users/all", methods=["GET"])
@@ -407,8 +498,8 @@ def users_all_http():
     """
     token = request.args.get("token")
 
-    # Call users all and return json for it
-    return dumps(users_all(token))
+    # Call users all and return json for it, unless the client's copy is current
+    return conditional(lambda: users_all_etag(token), lambda: users_all(token))
 
 
 @APP.route("/user/profile/uploadphoto", methods=["POST"])
@@ -425,7 +516,7 @@ def user_profile_uploadphoto_http():
     y_end = int(info["y_end"])
 
     # Call user_profile_uploadphoto and return json for it
-    return dumps(user_profile_uploadphoto(token, img_url, x_start, y_start, x_end, y_end))
+    return respond(user_profile_uploadphoto(token, img_url, x_start, y_start, x_end, y_end))
 
 
 @APP.route("/src/static/<path:path>")
@@ -452,7 +543,7 @@ def msg_send():
     message = payload["message"]
 
     # Call message send and return json for it
-    return dumps(message_send(token, c_id, message))
+    return respond(message_send(token, c_id, message))
 
 
 @APP.route("/message/remove", methods=["DELETE"])
@@ -465,7 +556,7 @@ def msg_delete():
     m_id = int(payload["message_id"])
 
     # Call message remove and return json for it
-    return dumps(message_remove(token, m_id))
+    return respond(message_remove(token, m_id))
 
 
 @APP.route("/message/edit", methods=["PUT"])
@@ -479,7 +570,7 @@ def msg_edit():
     message = payload["message"]
 
     # Call message edit and return json for it
-    return dumps(message_edit(token, m_id, message))
+    return respond(message_edit(token, m_id, message))
 
 
 @APP.route("/message/sendlater", methods=["POST"])
@@ -494,7 +585,32 @@ def msg_sendlater():
     time_sent = int(payload["time_sent"])
 
     # Call message sendlater and return json for it
-    return dumps(message_sendlater(token, c_id, message, time_sent))
+    return respond(message_sendlater(token, c_id, message, time_sent))
+
+
+@APP.route("/message/sendlater/list", methods=["GET"])
+def msg_sendlater_list():
+    """
+    Flask route for message sendlater list function
+    """
+    token = request.args.get("token")
+    c_id = int(request.args.get("channel_id"))
+
+    # Call message sendlater list and return json for it
+    return respond(message_sendlater_list(token, c_id))
+
+
+@APP.route("/message/sendlater/cancel", methods=["POST"])
+def msg_sendlater_cancel():
+    """
+    Flask route for message sendlater cancel function
+    """
+    payload = request.get_json()
+    token = payload["token"]
+    m_id = int(payload["message_id"])
+
+    # Call message sendlater cancel and return json for it
+    return respond(message_sendlater_cancel(token, m_id))
 
 
 @APP.route("/message/react", methods=["POST"])
@@ -508,7 +624,7 @@ def msg_react():
     react_id = int(payload["react_id"])
 
     # Call message react and return json for it
-    return dumps(message_react(token, m_id, react_id))
+    return respond(message_react(token, m_id, react_id))
 
 
 @APP.route("/message/unreact", methods=["POST"])
@@ -522,7 +638,7 @@ def msg_unreact():
     react_id = int(payload["react_id"])
 
     # Call message unreact and return json for it
-    return dumps(message_unreact(token, m_id, react_id))
+    return respond(message_unreact(token, m_id, react_id))
 
 
 @APP.route("/message/pin", methods=["POST"])
@@ -535,7 +651,7 @@ def msg_pin():
     m_id = int(payload["message_id"])
 
     # Call message pin and return json for it
-    return dumps(message_pin(token, m_id))
+    return respond(message_pin(token, m_id))
 
 
 @APP.route("/message/unpin", methods=["POST"])
@@ -548,7 +664,7 @@ def msg_unpin():
     m_id = int(payload["message_id"])
 
     # Call message pin and return json for it
-    return dumps(message_unpin(token, m_id))
+    return respond(message_unpin(token, m_id))
 
 
 ####################################################################################
@@ -565,7 +681,7 @@ def active_standup():
     c_id = int(request.args.get("channel_id"))
 
     # Call standup active and return json for it
-    return dumps(standup_active(token, c_id))
+    return respond(standup_active(token, c_id))
 
 @APP.route("/standup/start", methods=["POST"])
 def start_standup():
@@ -578,7 +694,7 @@ def start_standup():
     length = int(payload["length"])
 
     # Call standup start and return json for it
-    return dumps(standup_start(token, c_id, length))
+    return respond(standup_start(token, c_id, length))
 
 @APP.route("/standup/send", methods=["POST"])
 def send_standup():
@@ -591,7 +707,7 @@ def send_standup():
     message = payload["message"]
 
     # Call standup start and return json for it
-    return dumps(standup_send(token, c_id, message))
+    return respond(standup_send(token, c_id, message))
 
 
 ####################################################################################
@@ -611,7 +727,20 @@ def admin_permission_change():
     permission_id = int(payload["permission_id"])
 
     # Call admin_userpermission_change function and return json for it
-    return dumps(admin_userpermission_change(token, u_id, permission_id))
+    return respond(admin_userpermission_change(token, u_id, permission_id))
+
+
+@APP.route("/admin/users/import", methods=["POST"])
+def admin_import_users():
+    """
+    Flask route for admin users import function, the body is JSON lines,
+    one user per line, read as it arrives
+    """
+    # Request admin_users_import details
+    token = request.args.get("token")
+
+    # Call admin_users_import function and return json for it
+    return respond(admin_users_import(token, request.stream))
 
 
 @APP.route("/search", methods=["GET"])
@@ -624,7 +753,7 @@ def searches():
     query_str = str(request.args.get("query_str"))
 
     # Call search function and return json for it
-    return dumps(search(token, query_str))
+    return respond(search(token, query_str))
 
 
 @APP.route("/clear", methods=["DELETE"])
@@ -633,8 +762,39 @@ def http_clear():
     Flask route for clear function
     """
     # Call clear function to erase all stored data
-    return dumps(clear())
+    return respond(clear())
 
 
 if __name__ == "__main__":
+    # How many verified tokens are kept, and for how many seconds
+    TOKEN_CACHE["size"] = int(os.environ.get("FLOCKR_TOKEN_CACHE_SIZE", TOKEN_CACHE["size"]))
+    TOKEN_CACHE["ttl"] = float(os.environ.get("FLOCKR_TOKEN_CACHE_TTL", TOKEN_CACHE["ttl"]))
+    # Load DATA from the SQLite backend and keep writing to it, if one is configured
+    if os.environ.get("FLOCKR_SQLITE"):
+        open_sqlite(os.environ["FLOCKR_SQLITE"])
+    # Otherwise rebuild DATA from the latest snapshot and the journal written
+    # since, then keep journaling and snapshotting, if a journal is configured
+    elif os.environ.get("FLOCKR_JOURNAL"):
+        JOURNAL_PATH = os.environ["FLOCKR_JOURNAL"]
+        SNAPSHOT_PATH = os.environ.get("FLOCKR_SNAPSHOT", JOURNAL_PATH + ".snapshot")
+        open_journal(JOURNAL_PATH, load_snapshot(SNAPSHOT_PATH))
+        start_snapshotter(
+            SNAPSHOT_PATH, float(os.environ.get("FLOCKR_SNAPSHOT_INTERVAL", 300))
+        )
+    # Only once DATA is fully loaded, so nothing is sent part way through
+    # replaying the journal
+    resume_scheduled()
+    resume_standups()
+    # KDF new password hashes are made with, "scrypt" or "pbkdf2_sha256",
+    # and how many processes run it
+    HASHING["kdf"] = os.environ.get("FLOCKR_KDF", HASHING["kdf"])
+    HASHING["workers"] = int(os.environ.get("FLOCKR_HASH_WORKERS", HASHING["workers"]))
+    # Expire sessions left unused for FLOCKR_SESSION_TIMEOUT seconds
+    SESSIONS["timeout"] = float(os.environ.get("FLOCKR_SESSION_TIMEOUT", SESSIONS["timeout"]))
+    start_sweeper(float(os.environ.get("FLOCKR_SESSION_SWEEP_INTERVAL", 60)))
+    # SMTP server the outbox sends password reset emails through
+    OUTBOX["host"] = os.environ.get("FLOCKR_SMTP_HOST", OUTBOX["host"])
+    OUTBOX["port"] = int(os.environ.get("FLOCKR_SMTP_PORT", OUTBOX["port"]))
+    OUTBOX["ssl"] = os.environ.get("FLOCKR_SMTP_SSL", "1") != "0"
+    start_sender()
     APP.run(port=0)  # Do not edit this port
@@ -0,0 +1,172 @@
+"""
+sessions.py
+starting and ending sessions, and expiring the ones left idle
+
+Every session waits in a min-heap ordered by when it would expire if it
+isn't used again. The sweeper pops the sessions that are due, ends the
+ones that really have been idle for the timeout and pushes the rest back
+at their new expiry, so it only ever looks at sessions that may be due.
+"""
+
+
+import heapq
+import secrets
+import threading
+import time
+from data import DATA
+from index import INDEX
+from store import add_session, remove_session
+
+
+global SESSIONS
+SESSIONS = {
+    # Held while the expiry heap is changed
+    "lock": threading.Lock(),
+    # Heap of (time_due, session_id), may still hold ended sessions
+    "expiry": [],
+    # Seconds a session can go unused before it is expired
+    "timeout": 24 * 60 * 60,
+    "stop": threading.Event(),
+    "thread": None,
+}
+
+
+# ____________________________Start/End_________________________________#
+
+
+def start_session(u_id):
+    """
+    Logs a user in with a new session, alongside any they already have
+    Parameters:
+        u_id (int)
+    Returns:
+        session_id (str)
+    """
+    now = time.time()
+    session_id = secrets.token_urlsafe(16)
+    add_session({"session_id": session_id, "u_id": u_id, "issued": now})
+
+    with SESSIONS["lock"]:
+        heapq.heappush(SESSIONS["expiry"], (now + SESSIONS["timeout"], session_id))
+    return session_id
+
+
+def end_session(session_id):
+    """
+    Logs a session out
+    Parameters:
+        session_id (str)
+    Returns:
+        None
+    """
+    remove_session(session_id)
+
+    # Ended sessions are skipped lazily, rebuild the heap once they
+    # outnumber the sessions still going so memory follows active sessions
+    with SESSIONS["lock"]:
+        heap = SESSIONS["expiry"]
+        if len(heap) > 2 * len(DATA["sessions"]) + 64:
+            heap[:] = [entry for entry in heap if entry[1] in DATA["sessions"]]
+            heapq.heapify(heap)
+
+
+def end_user_sessions(u_id):
+    """
+    Logs a user out of every session they have
+    Parameters:
+        u_id (int)
+    Returns:
+        None
+    """
+    for session_id in list(INDEX["sessions_by_user"].get(u_id, ())):
+        end_session(session_id)
+
+
+# ______________________________Sweeping_________________________________#
+
+
+def sweep_sessions(now=None):
+    """
+    Ends every session that has gone unused for the timeout
+    Parameters:
+        now (float): unix timestamp, the current time if not given
+    Returns:
+        (int): number of sessions expired
+    """
+    if now is None:
+        now = time.time()
+
+    expired = []
+    with SESSIONS["lock"]:
+        heap = SESSIONS["expiry"]
+        while heap and heap[0][0] <= now:
+            session_id = heapq.heappop(heap)[1]
+            session = DATA["sessions"].get(session_id)
+            if session is None:
+                # Logged out already
+                continue
+            time_due = session.last_seen + SESSIONS["timeout"]
+            if time_due <= now:
+                expired.append(session_id)
+            else:
+                heapq.heappush(heap, (time_due, session_id))
+
+    # Ended outside the lock, since ending a session waits on the journal
+    for session_id in expired:
+        remove_session(session_id)
+    return len(expired)
+
+
+def watch_sessions():
+    """
+    Rebuilds the expiry heap from every session in DATA, for when DATA has
+    been loaded in one go rather than built up session by session
+    """
+    timeout = SESSIONS["timeout"]
+    with SESSIONS["lock"]:
+        heap = SESSIONS["expiry"]
+        heap[:] = [
+            (session.last_seen + timeout, session.session_id)
+            for session in DATA["sessions"].values()
+        ]
+        heapq.heapify(heap)
+
+
+def clear_sessions():
+    """
+    Empties the expiry heap, called alongside clearing DATA
+    """
+    with SESSIONS["lock"]:
+        SESSIONS["expiry"].clear()
+
+
+def run_sweeper(interval):
+    """
+    Sweeper loop: expires idle sessions every interval seconds
+    """
+    while not SESSIONS["stop"].wait(interval):
+        sweep_sessions()
+
+
+def start_sweeper(interval):
+    """
+    Starts expiring idle sessions in the background every interval seconds
+    Parameters:
+        interval (float): seconds
+    Returns:
+        None
+    """
+    watch_sessions()
+    SESSIONS["stop"].clear()
+    SESSIONS["thread"] = threading.Thread(target=run_sweeper, args=(interval,), daemon=True)
+    SESSIONS["thread"].start()
+
+
+def stop_sweeper():
+    """
+    Stops the background sweeper
+    """
+    SESSIONS["stop"].set()
+    if SESSIONS["thread"] is not None:
+        SESSIONS["thread"].join()
+        SESSIONS["thread"] = None
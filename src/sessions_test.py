@@ -0,0 +1,98 @@
+"""
+sessions
+
+Each login starts its own session, logging out ends only that session, and
+the sweeper ends sessions that have gone unused for the session timeout
+"""
+
+
+import time
+import pytest
+from auth import auth_login, auth_logout, auth_register, decode_token
+from auth import auth_passwordreset_request, auth_passwordreset_reset
+from data import DATA
+from error import AccessError
+from index import INDEX
+from other import clear
+from sessions import SESSIONS, sweep_sessions
+from user import user_profile
+
+
+def test_sessions_several_logins():
+    """
+    Test 1 - A user can be logged in more than once, logging out ends one session
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    token_2 = auth_login("nbayoungboy@gmail.com", "youngboynba123")["token"]
+    token_3 = auth_login("nbayoungboy@gmail.com", "youngboynba123")["token"]
+    assert len({user_a["token"], token_2, token_3}) == 3
+    assert len(INDEX["sessions_by_user"][user_a["u_id"]]) == 3
+
+    auth_logout(token_2)
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        user_profile(token_2, user_a["u_id"])
+    assert user_profile(user_a["token"], user_a["u_id"])["user"]["u_id"] == user_a["u_id"]
+    assert user_profile(token_3, user_a["u_id"])["user"]["u_id"] == user_a["u_id"]
+
+    clear()
+
+
+def test_sessions_passwordreset_ends_all():
+    """
+    Test 2 - Resetting the password logs the user out of every session
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    token_2 = auth_login("nbayoungboy@gmail.com", "youngboynba123")["token"]
+
+    auth_passwordreset_reset(auth_passwordreset_request("nbayoungboy@gmail.com"), "newpass123")
+
+    for token in (user_a["token"], token_2):
+        with pytest.raises(AccessError, match=r"Invalid Token"):
+            user_profile(token, user_a["u_id"])
+    assert user_a["u_id"] not in INDEX["sessions_by_user"]
+
+    clear()
+
+
+def test_sessions_sweep_idle():
+    """
+    Test 3 - The sweeper ends idle sessions and keeps the ones still in use
+    """
+    timeout = SESSIONS["timeout"]
+    SESSIONS["timeout"] = 100
+    try:
+        start = time.time()
+        user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+        user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+
+        assert sweep_sessions(start + 50) == 0
+
+        # user_b makes a request 80 seconds later
+        DATA["sessions"][decode_token(user_b["token"])].last_seen = start + 80
+        assert sweep_sessions(start + 120) == 1
+        with pytest.raises(AccessError, match=r"Invalid Token"):
+            user_profile(user_a["token"], user_a["u_id"])
+        DATA["sessions"][decode_token(user_b["token"])].last_seen = start + 80
+
+        assert sweep_sessions(start + 200) == 1
+        assert DATA["sessions"] == {}
+        assert SESSIONS["expiry"] == []
+    finally:
+        SESSIONS["timeout"] = timeout
+
+    clear()
+
+
+def test_sessions_bounded():
+    """
+    Test 4 - Sessions that have been logged out don't pile up
+    """
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    for _ in range(500):
+        auth_logout(auth_login("nbayoungboy@gmail.com", "youngboynba123")["token"])
+
+    assert len(DATA["sessions"]) == 1
+    assert len(INDEX["sessions_by_user"][user_a["u_id"]]) == 1
+    assert len(SESSIONS["expiry"]) <= 2 * len(DATA["sessions"]) + 64
+
+    clear()
@@ -0,0 +1,272 @@
+"""
+snapshot.py
+periodic snapshots of DATA, so startup loads the latest snapshot and only
+replays the part of the journal written after it
+
+A snapshot is a marshal dump of users, channels, message_log, standups,
+sessions and messages waiting to be sent later along with the journal
+offset it was taken at. Messages are stored by
+column rather than as a million small records, which keeps the file
+compact and lets startup rebuild them in one pass.
+"""
+
+
+import gc
+import marshal
+import mmap
+import os
+import threading
+from data import DATA
+from index import rebuild_index
+from journal import JOURNAL, compact_journal, sync_directory
+from records import User, Channel, Message, Session
+
+
+MAGIC = "flockr-snapshot"
+VERSION = 5
+
+# What is stored of each message waiting to be sent later, its scheduler
+# job is armed again once the journal has been replayed
+SCHEDULED_FIELDS = ("message_id", "u_id", "channel_id", "message", "time_sent")
+
+global SNAPSHOT
+SNAPSHOT = {
+    "path": None,
+    # Journal offset the latest snapshot was taken at
+    "offset": 0,
+    "thread": None,
+    "stop": threading.Event(),
+}
+
+
+# ____________________________Encode/Decode______________________________#
+
+
+def encode_snapshot(offset):
+    """
+    Copies DATA into the tuple that is written to disk, DATA mustn't change
+    part way through, so the caller either holds the journal lock or is a
+    forked copy of the server
+    Parameters:
+        offset (int): journal offset DATA is up to
+    Returns:
+        snapshot (tuple)
+    """
+    messages = DATA["message_log"]["messages"].live()
+    return (
+        MAGIC,
+        VERSION,
+        offset,
+        [user.to_dict() for user in DATA["users"]],
+        [channel.to_dict() for channel in DATA["channels"]],
+        DATA["standup"],
+        DATA["message_log"]["msg_counter"],
+        [message.message_id for message in messages],
+        [message.u_id for message in messages],
+        [message.message for message in messages],
+        [message.time_created for message in messages],
+        # Only the messages somebody has reacted to or pinned are stored
+        {message.message_id: message.react_u_ids for message in messages if message.react_u_ids},
+        {message.message_id for message in messages if message.is_pinned},
+        [session.to_dict() for session in DATA["sessions"].values()],
+        [
+            {field: scheduled[field] for field in SCHEDULED_FIELDS}
+            for scheduled in DATA["scheduled"].values()
+        ],
+    )
+
+
+def decode_snapshot(snapshot):
+    """
+    Replaces DATA with the contents of a snapshot and rebuilds the indexes
+    Parameters:
+        snapshot (tuple)
+    Returns:
+        offset (int): journal offset the snapshot was taken at
+    """
+    (
+        magic,
+        version,
+        offset,
+        users,
+        channels,
+        standups,
+        msg_counter,
+        m_ids,
+        u_ids,
+        texts,
+        times_created,
+        reacts,
+        pinned,
+        sessions,
+        scheduled,
+    ) = snapshot
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a flockr snapshot")
+
+    messages = [
+        Message(m_id, u_id, text, time_created, reacts.get(m_id, ()), m_id in pinned)
+        for m_id, u_id, text, time_created in zip(m_ids, u_ids, texts, times_created)
+    ]
+
+    DATA["users"][:] = [User.from_dict(user) for user in users]
+    DATA["channels"][:] = [Channel.from_dict(channel) for channel in channels]
+    DATA["standup"][:] = standups
+    DATA["message_log"]["messages"][:] = messages
+    DATA["message_log"]["msg_counter"] = msg_counter
+    DATA["sessions"].clear()
+    DATA["sessions"].update(
+        (session["session_id"], Session.from_dict(session)) for session in sessions
+    )
+    DATA["scheduled"].clear()
+    DATA["scheduled"].update(
+        (waiting["message_id"], dict(waiting, job_id=None)) for waiting in scheduled
+    )
+
+    # Standups that were running and messages waiting to be sent later are
+    # only armed once the rest of the journal has been replayed too
+    rebuild_index(DATA)
+
+    return offset
+
+
+# ____________________________Write/Load_________________________________#
+
+
+def write_snapshot(path):
+    """
+    Writes a snapshot of DATA to path, replacing the previous one
+    atomically, then cuts the journal it covers off the journal
+    Parameters:
+        path (str)
+    Returns:
+        offset (int): journal offset the snapshot was taken at
+    """
+    temp_path = path + ".tmp"
+    if hasattr(os, "fork"):
+        # Holding the journal lock stops any change being made, so DATA and
+        # the offset agree. It is only held while a child process is forked
+        # with a copy-on-write view of DATA, which encodes and writes it
+        with JOURNAL["lock"]:
+            offset = JOURNAL["end"]
+            pid = os.fork()
+            if not pid:
+                dump_snapshot_child(temp_path, offset)
+        _, status = os.waitpid(pid, 0)
+        if status:
+            raise OSError(f"Writing snapshot {path} failed")
+    else:
+        with JOURNAL["lock"]:
+            offset = JOURNAL["end"]
+            blob = marshal.dumps(encode_snapshot(offset))
+        write_blob(temp_path, blob)
+
+    os.replace(temp_path, path)
+    sync_directory(path)
+    SNAPSHOT["offset"] = offset
+
+    compact_journal(offset)
+    return offset
+
+
+def dump_snapshot_child(temp_path, offset):
+    """
+    Run in the forked child: encodes DATA, writes it to temp_path and
+    exits, without returning to the caller
+    Parameters:
+        temp_path (str)
+        offset (int): journal offset DATA is up to
+    """
+    # Any error leaves status at 1, which the parent raises
+    status = 1
+    try:
+        write_blob(temp_path, marshal.dumps(encode_snapshot(offset)))
+        status = 0
+    finally:
+        # Skips the parent's exit handlers, which aren't the child's to run
+        os._exit(status)
+
+
+def write_blob(path, blob):
+    """
+    Writes blob to path and fsyncs it
+    Parameters:
+        path (str)
+        blob (bytes)
+    Returns:
+        None
+    """
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(blob)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+
+
+def load_snapshot(path):
+    """
+    Loads DATA from the snapshot at path, if there is one
+    Parameters:
+        path (str)
+    Returns:
+        offset (int): journal offset to replay the journal from
+    """
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return 0
+
+    # Nothing loaded here is garbage, so don't let the collector
+    # walk the heap over and over while it grows
+    gc.disable()
+    try:
+        with open(path, "rb") as snapshot_file:
+            with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                snapshot = marshal.loads(view)
+        offset = decode_snapshot(snapshot)
+        # What was loaded lives as long as the server does, keep it out of
+        # every later collection too
+        gc.freeze()
+    finally:
+        gc.enable()
+
+    SNAPSHOT["offset"] = offset
+    return offset
+
+
+# ______________________________Snapshotter______________________________#
+
+
+def run_snapshotter(path, interval):
+    """
+    Snapshotter loop: writes a snapshot every interval seconds
+    if anything has been journaled since the last one
+    """
+    while not SNAPSHOT["stop"].wait(interval):
+        if JOURNAL["end"] != SNAPSHOT["offset"]:
+            write_snapshot(path)
+
+
+def start_snapshotter(path, interval):
+    """
+    Starts writing a snapshot to path in the background every interval seconds
+    Parameters:
+        path (str)
+        interval (float): seconds
+    Returns:
+        None
+    """
+    SNAPSHOT["path"] = path
+    SNAPSHOT["stop"].clear()
+    SNAPSHOT["thread"] = threading.Thread(
+        target=run_snapshotter, args=(path, interval), daemon=True
+    )
+    SNAPSHOT["thread"].start()
+
+
+def stop_snapshotter():
+    """
+    Stops the background snapshotter, letting a snapshot it is writing finish
+    """
+    SNAPSHOT["stop"].set()
+    if SNAPSHOT["thread"] is not None:
+        SNAPSHOT["thread"].join()
+        SNAPSHOT["thread"] = None
+    SNAPSHOT["path"] = None
@@ -0,0 +1,231 @@
+"""
+snapshot
+
+A snapshot holds DATA as it was at some point in the journal. Restarting
+loads the snapshot and replays only the journal written after it, and
+writing a snapshot cuts the journal it covers off the journal
+"""
+
+
+import os
+import threading
+from copy import deepcopy
+from datetime import datetime
+from time import perf_counter, sleep
+from auth import auth_register
+from channel import channel_addowner, channel_join, channel_leave, channel_messages
+from channels import channels_create, channels_list
+from data import DATA
+from journal import open_journal, close_journal
+from message import message_send, message_edit, message_react, message_pin
+from message import message_sendlater, message_sendlater_cancel, message_sendlater_list
+from other import clear, search
+import snapshot
+from snapshot import write_snapshot, load_snapshot
+from standup import standup_start, standup_active, standup_send, resume_standups
+
+
+def restart(journal_path, snapshot_path):
+    """
+    Throws away DATA, as a server restart would, and rebuilds it from the
+    snapshot and the journal written after it
+    """
+    close_journal()
+    clear()
+    open_journal(journal_path, load_snapshot(snapshot_path))
+
+
+def test_snapshot_restore(tmp_path):
+    """
+    Test 1 - Loading the snapshot and replaying the rest of the journal rebuilds DATA exactly
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], c_id)
+    m_id_1 = message_send(user_a["token"], c_id, "Throw it out the window")["message_id"]
+    m_id_2 = message_send(user_b["token"], c_id, "I like trains")["message_id"]
+    message_react(user_b["token"], m_id_1, 1)
+    message_pin(user_a["token"], m_id_2)
+
+    write_snapshot(snapshot_path)
+
+    channel_addowner(user_a["token"], c_id, user_b["u_id"])
+    message_edit(user_a["token"], m_id_1, "Throw it out the door")
+    c_id_2 = channels_create(user_b["token"], "the cage", True)["channel_id"]
+    channel_leave(user_b["token"], c_id_2)
+
+    before = deepcopy(DATA)
+    restart(journal_path, snapshot_path)
+    assert DATA == before
+
+    # The indexes are rebuilt along with DATA
+    assert channels_list(user_b["token"]) == {
+        "channels": [{"channel_id": c_id, "name": "billionaire records"}]
+    }
+    assert [msg["message_id"] for msg in search(user_a["token"], "door")["messages"]] == [m_id_1]
+    assert message_send(user_a["token"], c_id, "Back again")["message_id"] == m_id_2 + 1
+
+    # A second snapshot carries on from the offset the journal was compacted to
+    write_snapshot(snapshot_path)
+    message_send(user_b["token"], c_id, "One more")
+    before = deepcopy(DATA)
+    restart(journal_path, snapshot_path)
+    assert DATA == before
+
+    close_journal()
+    clear()
+
+
+def test_snapshot_compacts_journal(tmp_path):
+    """
+    Test 2 - The journal only keeps what was written after the snapshot
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    for _ in range(50):
+        message_send(user_a["token"], c_id, "Throw it out the window")
+    size = os.path.getsize(journal_path)
+
+    write_snapshot(snapshot_path)
+    assert os.path.getsize(journal_path) < size / 10
+
+    # Journaling carries on into the compacted journal
+    message_send(user_a["token"], c_id, "I like trains")
+    before = deepcopy(DATA)
+    restart(journal_path, snapshot_path)
+    assert DATA == before
+    assert len(DATA["message_log"]["messages"]) == 51
+
+    close_journal()
+    clear()
+
+
+def test_snapshot_standup(tmp_path):
+    """
+    Test 3 - A standup that was running when the snapshot was taken is still running
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    time_finish = standup_start(user_a["token"], c_id, 60)["time_finish"]
+
+    write_snapshot(snapshot_path)
+    restart(journal_path, snapshot_path)
+    assert standup_active(user_a["token"], c_id) == {
+        "is_active": True,
+        "time_finish": time_finish,
+    }
+
+    close_journal()
+    clear()
+
+
+def test_snapshot_sendlater(tmp_path):
+    """
+    Test 4 - Messages waiting to be sent later are kept in the snapshot,
+    and one cancelled after it stays cancelled
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    time_sent = int(datetime.now().timestamp()) + 60
+    m_id_1 = message_sendlater(user_a["token"], c_id, "Out the window", time_sent)["message_id"]
+    m_id_2 = message_sendlater(user_a["token"], c_id, "I like trains", time_sent)["message_id"]
+
+    write_snapshot(snapshot_path)
+    message_sendlater_cancel(user_a["token"], m_id_2)
+    restart(journal_path, snapshot_path)
+    assert message_sendlater_list(user_a["token"], c_id)["messages"] == [
+        {
+            "message_id": m_id_1,
+            "u_id": user_a["u_id"],
+            "message": "Out the window",
+            "time_sent": time_sent,
+        }
+    ]
+
+    close_journal()
+    clear()
+
+
+def test_snapshot_standup_finished(tmp_path):
+    """
+    Test 5 - A standup that finished after the snapshot was taken is not
+    running again after a restart, and its messages are only sent once
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    standup_start(user_a["token"], c_id, 1)
+    standup_send(user_a["token"], c_id, "Throw it out the window")
+
+    write_snapshot(snapshot_path)
+    sleep(1.5)
+    assert not standup_active(user_a["token"], c_id)["is_active"]
+    sent = deepcopy(channel_messages(user_a["token"], c_id, 0)["messages"])
+    assert len(sent) == 1
+
+    restart(journal_path, snapshot_path)
+    resume_standups()
+    sleep(0.5)
+    assert standup_active(user_a["token"], c_id) == {"is_active": False, "time_finish": None}
+    assert channel_messages(user_a["token"], c_id, 0)["messages"] == sent
+
+    close_journal()
+    clear()
+
+
+def test_snapshot_writes_not_held_up(tmp_path, monkeypatch):
+    """
+    Test 6 - Changes can still be made while a snapshot is being encoded,
+    they are left out of it and replayed from the journal instead
+    """
+    journal_path = str(tmp_path / "flockr.journal")
+    snapshot_path = str(tmp_path / "flockr.snapshot")
+    open_journal(journal_path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    m_id = message_send(user_a["token"], c_id, "Throw it out the window")["message_id"]
+
+    encode = snapshot.encode_snapshot
+
+    def slow_encode(offset):
+        sleep(1)
+        return encode(offset)
+
+    monkeypatch.setattr(snapshot, "encode_snapshot", slow_encode)
+    writer = threading.Thread(target=write_snapshot, args=(snapshot_path,))
+    writer.start()
+    sleep(0.2)
+    start = perf_counter()
+    message_edit(user_a["token"], m_id, "Throw it out the door")
+    message_send(user_a["token"], c_id, "I like trains")
+    assert perf_counter() - start < 0.5
+    assert writer.is_alive()
+    writer.join()
+
+    before = deepcopy(DATA)
+    restart(journal_path, snapshot_path)
+    assert DATA == before
+
+    close_journal()
+    clear()
@@ -0,0 +1,664 @@
+"""
+sqlite_store.py
+SQLite storage backend, a durable mirror of DATA. Every change made
+through store.py is also written to an SQLite database so DATA can be
+loaded back from it on startup
+
+Requests are still served from DATA alone, which is loaded into memory in
+full, so the database lets the server restart without losing anything but
+does not let it hold more than fits in RAM. The tables are normalised,
+with indexes on message_id, channel_id, u_id, session_id and email, for
+looking at the data outside the server.
+"""
+
+
+import sqlite3
+from data import DATA
+from index import rebuild_index
+from journal import JOURNAL, BACKENDS
+from records import User, Channel, Message, Session
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    u_id INTEGER PRIMARY KEY,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL,
+    reset_code TEXT,
+    name_first TEXT NOT NULL,
+    name_last TEXT NOT NULL,
+    handle_str TEXT NOT NULL,
+    permission_id INTEGER NOT NULL,
+    profile_img_url TEXT
+);
+CREATE INDEX IF NOT EXISTS users_by_email ON users (email);
+
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    is_public INTEGER NOT NULL
+);
+
+-- Members' details are only kept in users, seq keeps all_members and
+-- owner_members in the order they were added
+CREATE TABLE IF NOT EXISTS members (
+    seq INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    u_id INTEGER NOT NULL,
+    is_owner INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_by_channel ON members (channel_id);
+CREATE INDEX IF NOT EXISTS members_by_user ON members (u_id);
+
+-- seq keeps the message log, channel and sender lists in the order
+-- messages were sent in, which is not message_id order with sendlater
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    u_id INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    time_created INTEGER NOT NULL,
+    is_pinned INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_by_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS messages_by_channel ON messages (channel_id, seq);
+CREATE INDEX IF NOT EXISTS messages_by_user ON messages (u_id, seq);
+
+-- flockr only has the one react, react_id 1. is_this_user_reacted
+-- depends on who is asking so it isn't stored
+CREATE TABLE IF NOT EXISTS reacts (
+    seq INTEGER PRIMARY KEY,
+    message_id INTEGER NOT NULL,
+    u_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reacts_by_message ON reacts (message_id);
+
+-- last_seen is only kept in memory, a session loaded counts as seen then
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    u_id INTEGER NOT NULL,
+    issued REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_user ON sessions (u_id);
+
+-- Messages waiting to be sent by message_sendlater
+CREATE TABLE IF NOT EXISTS scheduled (
+    message_id INTEGER PRIMARY KEY,
+    u_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    time_sent INTEGER NOT NULL
+);
+
+-- A channel only ever has the one standup, which is reused each time one
+-- starts, seq keeps them in the order they were first started
+CREATE TABLE IF NOT EXISTS standups (
+    seq INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL UNIQUE,
+    is_active INTEGER NOT NULL,
+    time_finish INTEGER,
+    standup_user INTEGER
+);
+
+-- Messages buffered in a running standup, in the order they were sent
+CREATE TABLE IF NOT EXISTS standup_messages (
+    seq INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS standup_messages_by_channel ON standup_messages (channel_id);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+global SQLITE
+SQLITE = {
+    "connection": None,
+}
+
+# op -> function writing that change to the database, filled in by @handles
+HANDLERS = {}
+
+
+def handles(op):
+    """
+    Decorator registering the function that writes the change journaled
+    under op to the database
+    Parameters:
+        op (str)
+    Returns:
+        decorator
+    """
+    def decorator(function):
+        HANDLERS[op] = function
+        return function
+
+    return decorator
+
+
+def apply_change(op, args):
+    """
+    Storage backend: writes a change that has just been made to DATA to
+    the database, committing it straight away
+    Parameters:
+        op (str)
+        args (tuple)
+    Returns:
+        None
+    """
+    connection = SQLITE["connection"]
+    with connection:
+        HANDLERS[op](connection, *args)
+
+
+# _________________________________Users_________________________________#
+
+
+def user_row(user):
+    """
+    Returns:
+        (tuple): the user as a row of the users table
+    """
+    return (
+        user["u_id"],
+        user["email"],
+        user["password"],
+        user["reset_code"],
+        user["name_first"],
+        user["name_last"],
+        user["handle_str"],
+        user["permission_id"],
+        user["profile_img_url"],
+    )
+
+
+@handles("user")
+def insert_user(connection, user):
+    """
+    Writes store.add_user
+    """
+    connection.execute("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", user_row(user))
+
+
+@handles("users")
+def insert_users(connection, users):
+    """
+    Writes store.add_users, in the one transaction
+    """
+    connection.executemany(
+        "INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", map(user_row, users)
+    )
+
+
+@handles("email")
+def update_email(connection, u_id, email):
+    """
+    Writes store.set_email
+    """
+    connection.execute("UPDATE users SET email = ? WHERE u_id = ?", (email, u_id))
+
+
+@handles("name")
+def update_name(connection, u_id, name_first, name_last):
+    """
+    Writes store.set_name
+    """
+    connection.execute(
+        "UPDATE users SET name_first = ?, name_last = ? WHERE u_id = ?",
+        (name_first, name_last, u_id),
+    )
+
+
+@handles("handle")
+def update_handle(connection, u_id, handle_str):
+    """
+    Writes store.set_handle
+    """
+    connection.execute("UPDATE users SET handle_str = ? WHERE u_id = ?", (handle_str, u_id))
+
+
+@handles("photo")
+def update_photo(connection, u_id, profile_img_url):
+    """
+    Writes store.set_profile_img_url
+    """
+    connection.execute(
+        "UPDATE users SET profile_img_url = ? WHERE u_id = ?", (profile_img_url, u_id)
+    )
+
+
+@handles("permission")
+def update_permission(connection, u_id, permission_id):
+    """
+    Writes store.set_permission
+    """
+    connection.execute(
+        "UPDATE users SET permission_id = ? WHERE u_id = ?", (permission_id, u_id)
+    )
+
+
+@handles("password")
+def update_password(connection, u_id, password):
+    """
+    Writes store.set_password
+    """
+    connection.execute("UPDATE users SET password = ? WHERE u_id = ?", (password, u_id))
+
+
+@handles("reset_code")
+def update_reset_code(connection, u_id, reset_code):
+    """
+    Writes store.set_reset_code
+    """
+    connection.execute("UPDATE users SET reset_code = ? WHERE u_id = ?", (reset_code, u_id))
+
+
+# ________________________________Sessions_______________________________#
+
+
+@handles("session")
+def insert_session(connection, session):
+    """
+    Writes store.add_session
+    """
+    connection.execute(
+        "INSERT INTO sessions VALUES (?, ?, ?)",
+        (session["session_id"], session["u_id"], session["issued"]),
+    )
+
+
+@handles("end_session")
+def delete_session(connection, session_id):
+    """
+    Writes store.remove_session
+    """
+    connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+# ________________________________Channels_______________________________#
+
+
+@handles("channel")
+def insert_channel(connection, channel):
+    """
+    Writes store.add_channel
+    """
+    connection.execute(
+        "INSERT INTO channels VALUES (?, ?, ?)",
+        (channel["channel_id"], channel["name"], channel["is_public"]),
+    )
+
+
+def insert_member(connection, channel_id, is_owner, u_id):
+    """
+    Adds a user to a channel's members or owners
+    """
+    connection.execute(
+        "INSERT INTO members (channel_id, u_id, is_owner) VALUES (?, ?, ?)",
+        (channel_id, u_id, is_owner),
+    )
+
+
+@handles("join")
+def insert_joined_member(connection, channel_id, u_id):
+    """
+    Writes store.add_member
+    """
+    insert_member(connection, channel_id, False, u_id)
+
+
+@handles("addowner")
+def insert_owner(connection, channel_id, u_id):
+    """
+    Writes store.add_owner
+    """
+    insert_member(connection, channel_id, True, u_id)
+
+
+@handles("leave")
+def delete_member(connection, channel_id, u_id):
+    """
+    Writes store.remove_member
+    """
+    connection.execute(
+        "DELETE FROM members WHERE channel_id = ? AND u_id = ? AND NOT is_owner",
+        (channel_id, u_id),
+    )
+
+
+@handles("removeowner")
+def delete_owner(connection, channel_id, u_id):
+    """
+    Writes store.remove_owner
+    """
+    connection.execute(
+        "DELETE FROM members WHERE channel_id = ? AND u_id = ? AND is_owner",
+        (channel_id, u_id),
+    )
+
+
+# ________________________________Messages_______________________________#
+
+
+@handles("message_id")
+def update_msg_counter(connection):
+    """
+    Writes store.allocate_message_id
+    """
+    connection.execute(
+        "INSERT OR REPLACE INTO counters VALUES ('msg_counter', ?)",
+        (DATA["message_log"]["msg_counter"],),
+    )
+
+
+@handles("message")
+def insert_message(connection, message, channel_id):
+    """
+    Writes store.add_message
+    """
+    connection.execute(
+        "INSERT INTO messages (message_id, channel_id, u_id, message, time_created, "
+        "is_pinned) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            message["message_id"],
+            channel_id,
+            message["u_id"],
+            message["message"],
+            message["time_created"],
+            message["is_pinned"],
+        ),
+    )
+    connection.executemany(
+        "INSERT INTO reacts (message_id, u_id) VALUES (?, ?)",
+        [(message["message_id"], u_id) for u_id in message["reacts"][0]["u_ids"]],
+    )
+    # A message sent later is no longer waiting
+    connection.execute("DELETE FROM scheduled WHERE message_id = ?", (message["message_id"],))
+
+
+@handles("remove")
+def delete_message(connection, m_id):
+    """
+    Writes store.remove_message
+    """
+    connection.execute("DELETE FROM messages WHERE message_id = ?", (m_id,))
+    connection.execute("DELETE FROM reacts WHERE message_id = ?", (m_id,))
+
+
+@handles("edit")
+def update_message(connection, m_id, text):
+    """
+    Writes store.edit_message
+    """
+    connection.execute("UPDATE messages SET message = ? WHERE message_id = ?", (text, m_id))
+
+
+@handles("react")
+def insert_react(connection, m_id, u_id):
+    """
+    Writes store.add_react
+    """
+    connection.execute("INSERT INTO reacts (message_id, u_id) VALUES (?, ?)", (m_id, u_id))
+
+
+@handles("unreact")
+def delete_react(connection, m_id, u_id):
+    """
+    Writes store.remove_react
+    """
+    connection.execute(
+        "DELETE FROM reacts WHERE seq = "
+        "(SELECT MIN(seq) FROM reacts WHERE message_id = ? AND u_id = ?)",
+        (m_id, u_id),
+    )
+
+
+@handles("pin")
+def update_pinned(connection, m_id, is_pinned):
+    """
+    Writes store.set_pinned
+    """
+    connection.execute(
+        "UPDATE messages SET is_pinned = ? WHERE message_id = ?", (is_pinned, m_id)
+    )
+
+
+@handles("schedule")
+def insert_scheduled(connection, scheduled):
+    """
+    Writes store.add_scheduled
+    """
+    connection.execute(
+        "INSERT INTO scheduled VALUES (?, ?, ?, ?, ?)",
+        (
+            scheduled["message_id"],
+            scheduled["u_id"],
+            scheduled["channel_id"],
+            scheduled["message"],
+            scheduled["time_sent"],
+        ),
+    )
+
+
+@handles("unschedule")
+def delete_scheduled(connection, m_id):
+    """
+    Writes store.remove_scheduled
+    """
+    connection.execute("DELETE FROM scheduled WHERE message_id = ?", (m_id,))
+
+
+# ________________________________Standups_______________________________#
+
+
+@handles("standup")
+def upsert_standup(connection, channel_id, u_id, time_finish):
+    """
+    Writes store.start_standup
+    """
+    connection.execute(
+        "INSERT INTO standups (channel_id, is_active, time_finish, standup_user) "
+        "VALUES (?, 1, ?, ?) ON CONFLICT (channel_id) DO UPDATE SET "
+        "is_active = 1, time_finish = excluded.time_finish, standup_user = excluded.standup_user",
+        (channel_id, time_finish, u_id),
+    )
+
+
+@handles("standup_send")
+def insert_standup_message(connection, channel_id, handle_str, message):
+    """
+    Writes store.add_standup_message
+    """
+    connection.execute(
+        "INSERT INTO standup_messages (channel_id, sender, message) VALUES (?, ?, ?)",
+        (channel_id, handle_str, message),
+    )
+
+
+@handles("standup_finish")
+def update_standup_finished(connection, channel_id, message=None):
+    """
+    Writes store.finish_standup
+    """
+    if message is not None:
+        insert_message(connection, message, channel_id)
+    connection.execute(
+        "UPDATE standups SET is_active = 0, time_finish = NULL, standup_user = NULL "
+        "WHERE channel_id = ?",
+        (channel_id,),
+    )
+    connection.execute("DELETE FROM standup_messages WHERE channel_id = ?", (channel_id,))
+
+
+# _________________________________Clear_________________________________#
+
+
+@handles("clear")
+def delete_all(connection):
+    """
+    Writes store.clear_data
+    """
+    for table in (
+        "users",
+        "channels",
+        "members",
+        "messages",
+        "reacts",
+        "sessions",
+        "scheduled",
+        "standups",
+        "standup_messages",
+        "counters",
+    ):
+        connection.execute(f"DELETE FROM {table}")
+
+
+# ______________________________Open/Load________________________________#
+
+
+def load_data(connection):
+    """
+    Replaces DATA with what is stored in the database and rebuilds the indexes
+    Parameters:
+        connection (sqlite3.Connection)
+    Returns:
+        None
+    """
+    connection.row_factory = sqlite3.Row
+
+    users = []
+    for row in connection.execute("SELECT * FROM users ORDER BY u_id"):
+        user = {
+            "email": row["email"],
+            "password": row["password"],
+            "reset_code": row["reset_code"],
+            "name_first": row["name_first"],
+            "name_last": row["name_last"],
+            "u_id": row["u_id"],
+            "handle_str": row["handle_str"],
+            "permission_id": row["permission_id"],
+            "user_message_id": [],
+            "profile_img_url": row["profile_img_url"],
+        }
+        users.append(user)
+
+    channels = []
+    for row in connection.execute("SELECT * FROM channels ORDER BY channel_id"):
+        channels.append(
+            {
+                "all_members": [],
+                "channel_id": row["channel_id"],
+                "is_public": bool(row["is_public"]),
+                "messages": [],
+                "name": row["name"],
+                "owner_members": [],
+            }
+        )
+    for row in connection.execute("SELECT * FROM members ORDER BY seq"):
+        members = "owner_members" if row["is_owner"] else "all_members"
+        channels[row["channel_id"] - 1][members].append(row["u_id"])
+
+    messages = []
+    reacts = {}
+    for row in connection.execute("SELECT * FROM messages ORDER BY seq"):
+        react = {
+            "react_id": 1,
+            "u_ids": [],
+            "is_this_user_reacted": False,
+        }
+        reacts[row["message_id"]] = react
+        messages.append(
+            {
+                "message_id": row["message_id"],
+                "u_id": row["u_id"],
+                "message": row["message"],
+                "time_created": row["time_created"],
+                "reacts": [react],
+                "is_pinned": bool(row["is_pinned"]),
+            }
+        )
+        channels[row["channel_id"] - 1]["messages"].append(row["message_id"])
+        users[row["u_id"] - 1]["user_message_id"].append(row["message_id"])
+    for row in connection.execute("SELECT message_id, u_id FROM reacts ORDER BY seq"):
+        reacts[row["message_id"]]["u_ids"].append(row["u_id"])
+
+    standups = {}
+    for row in connection.execute("SELECT * FROM standups ORDER BY seq"):
+        standups[row["channel_id"]] = {
+            "channel_id": row["channel_id"],
+            "messages": [],
+            "sender": [],
+            "is_active": bool(row["is_active"]),
+            "time_finish": row["time_finish"],
+            "standup_user": row["standup_user"],
+        }
+    for row in connection.execute("SELECT * FROM standup_messages ORDER BY seq"):
+        standups[row["channel_id"]]["messages"].append(row["message"])
+        standups[row["channel_id"]]["sender"].append(row["sender"])
+
+    counter = connection.execute(
+        "SELECT value FROM counters WHERE name = 'msg_counter'"
+    ).fetchone()
+
+    DATA["users"][:] = [User.from_dict(user) for user in users]
+    DATA["channels"][:] = [Channel.from_dict(channel) for channel in channels]
+    DATA["message_log"]["messages"][:] = [Message.from_dict(message) for message in messages]
+    DATA["message_log"]["msg_counter"] = counter["value"] if counter else 1
+    DATA["standup"][:] = standups.values()
+    DATA["sessions"].clear()
+    for row in connection.execute("SELECT * FROM sessions"):
+        session = Session(row["session_id"], row["u_id"], row["issued"])
+        DATA["sessions"][session.session_id] = session
+    DATA["scheduled"].clear()
+    for row in connection.execute("SELECT * FROM scheduled"):
+        DATA["scheduled"][row["message_id"]] = {
+            "message_id": row["message_id"],
+            "u_id": row["u_id"],
+            "channel_id": row["channel_id"],
+            "message": row["message"],
+            "time_sent": row["time_sent"],
+            "job_id": None,
+        }
+    rebuild_index(DATA)
+
+
+def open_sqlite(path):
+    """
+    Loads everything in the SQLite database at path into DATA, creating
+    the database if needed, and then mirrors every change to it
+    Parameters:
+        path (str): ":memory:" for a database that isn't kept
+    Returns:
+        None
+    """
+    connection = sqlite3.connect(path, check_same_thread=False)
+    with connection:
+        connection.execute("PRAGMA journal_mode = WAL")
+        # Each change is still committed before its request returns, WAL
+        # only waits on fsync at checkpoints
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+
+    # Held so no change can be made part way through loading
+    with JOURNAL["lock"]:
+        load_data(connection)
+        SQLITE["connection"] = connection
+        BACKENDS.append(apply_change)
+
+
+def close_sqlite():
+    """
+    Stops writing changes to the database and closes it
+    """
+    with JOURNAL["lock"]:
+        if apply_change in BACKENDS:
+            BACKENDS.remove(apply_change)
+        if SQLITE["connection"] is not None:
+            SQLITE["connection"].close()
+            SQLITE["connection"] = None
+
@@ -0,0 +1,198 @@
+"""
+sqlite_store
+
+With the SQLite backend open every change made to DATA is mirrored to
+the database, and opening the database again loads DATA back from it, as
+happens when the server restarts. Reads are always served from DATA
+
+The whole suite can also be run against the backend with
+FLOCKR_SQLITE=:memory: python3 -m pytest
+"""
+
+
+import os
+import sqlite3
+from copy import deepcopy
+from datetime import datetime
+from time import sleep
+import pytest
+from auth import auth_login, auth_logout, auth_register
+from channel import channel_addowner, channel_join, channel_leave, channel_messages
+from channels import channels_create, channels_list
+from data import DATA
+from error import AccessError
+from message import message_send, message_edit, message_react, message_unreact, message_pin
+from message import message_remove, message_sendlater, message_sendlater_cancel
+from message import message_sendlater_list, send_scheduled
+from other import clear, search, admin_userpermission_change
+from sqlite_store import open_sqlite, close_sqlite
+from standup import standup_start, standup_active, standup_send
+from user import user_profile_setname, user_profile_setemail, user_profile_sethandle
+
+
+# The suite is already running against the backend, which has to stay open
+pytestmark = pytest.mark.skipif(
+    bool(os.environ.get("FLOCKR_SQLITE")), reason="SQLite backend is already open"
+)
+
+
+def restart(path):
+    """
+    Throws away DATA, as a server restart would, and loads it from the database
+    """
+    close_sqlite()
+    DATA["users"].clear()
+    DATA["channels"].clear()
+    DATA["message_log"]["messages"].clear()
+    DATA["standup"].clear()
+    DATA["scheduled"].clear()
+    open_sqlite(path)
+
+
+def test_sqlite_reload(tmp_path):
+    """
+    Test 1 - Loading the database rebuilds DATA exactly
+    """
+    path = str(tmp_path / "flockr.db")
+    open_sqlite(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    user_b = auth_register("jerrychan@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+    user_c = auth_register("jamalmurray27@gmail.com", "NuggetsInFive41", "Jamal", "Murray")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    c_id_2 = channels_create(user_c["token"], "the cage", False)["channel_id"]
+    channel_join(user_b["token"], c_id)
+    channel_join(user_c["token"], c_id)
+    channel_addowner(user_a["token"], c_id, user_b["u_id"])
+    channel_leave(user_c["token"], c_id)
+    user_profile_setname(user_b["token"], "Jerome", "Chan")
+    user_profile_setemail(user_c["token"], "jamal@gmail.com")
+    user_profile_sethandle(user_c["token"], "bluearrow")
+    admin_userpermission_change(user_a["token"], user_c["u_id"], 1)
+
+    m_id_1 = message_send(user_a["token"], c_id, "Throw it out the window")["message_id"]
+    m_id_2 = message_send(user_b["token"], c_id, "I like trains")["message_id"]
+    message_send(user_b["token"], c_id, "Remove me")
+    message_send(user_c["token"], c_id_2, "Mile high")
+    message_edit(user_a["token"], m_id_1, "Throw it out the door")
+    message_react(user_b["token"], m_id_1, 1)
+    message_react(user_a["token"], m_id_1, 1)
+    message_unreact(user_b["token"], m_id_1, 1)
+    message_pin(user_a["token"], m_id_2)
+    message_remove(user_b["token"], m_id_2 + 1)
+    auth_logout(user_b["token"])
+
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+
+    # The indexes are rebuilt along with DATA
+    assert channels_list(user_a["token"]) == {
+        "channels": [{"channel_id": c_id, "name": "billionaire records"}]
+    }
+    assert [msg["message_id"] for msg in search(user_a["token"], "door")["messages"]] == [m_id_1]
+    with pytest.raises(AccessError, match=r"Invalid Token"):
+        channel_messages(user_b["token"], c_id, 0)
+    assert auth_login("jerrychan@gmail.com", "w89rfh@fk")["u_id"] == user_b["u_id"]
+    assert message_send(user_a["token"], c_id, "Back again")["message_id"] == m_id_2 + 3
+
+    # Clearing empties the database too
+    clear()
+    restart(path)
+    assert DATA["users"] == []
+    assert DATA["message_log"]["msg_counter"] == 1
+
+    close_sqlite()
+    clear()
+
+
+def test_sqlite_indexes(tmp_path):
+    """
+    Test 2 - Looking users and messages up by their keys uses an index
+    """
+    path = str(tmp_path / "flockr.db")
+    open_sqlite(path)
+    close_sqlite()
+
+    connection = sqlite3.connect(path)
+    lookups = [
+        "SELECT * FROM sessions WHERE session_id = 'abc'",
+        "SELECT * FROM sessions WHERE u_id = 1",
+        "SELECT * FROM users WHERE email = 'jerrychan@gmail.com'",
+        "SELECT * FROM messages WHERE message_id = 1",
+        "SELECT * FROM messages WHERE channel_id = 1 ORDER BY seq",
+        "SELECT * FROM messages WHERE u_id = 1 ORDER BY seq",
+        "SELECT * FROM members WHERE channel_id = 1",
+        "SELECT * FROM members WHERE u_id = 1",
+    ]
+    for lookup in lookups:
+        plan = " ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + lookup))
+        assert "USING INDEX" in plan or "USING INTEGER PRIMARY KEY" in plan
+    connection.close()
+
+    clear()
+
+
+def test_sqlite_sendlater(tmp_path):
+    """
+    Test 3 - Messages waiting to be sent later are loaded back, and ones
+    that were sent or cancelled are not
+    """
+    path = str(tmp_path / "flockr.db")
+    open_sqlite(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    time_sent = int(datetime.now().timestamp()) + 60
+    m_id_1 = message_sendlater(user_a["token"], c_id, "Out the window", time_sent)["message_id"]
+    m_id_2 = message_sendlater(user_a["token"], c_id, "Cancel me", time_sent)["message_id"]
+    message_sendlater(user_a["token"], c_id, "Too late", time_sent + 1)
+    message_sendlater_cancel(user_a["token"], m_id_2)
+
+    # Sent by hand, as the scheduler would once it is due
+    send_scheduled(m_id_2 + 1)
+    restart(path)
+    assert message_sendlater_list(user_a["token"], c_id)["messages"] == [
+        {
+            "message_id": m_id_1,
+            "u_id": user_a["u_id"],
+            "message": "Out the window",
+            "time_sent": time_sent,
+        }
+    ]
+    sent = channel_messages(user_a["token"], c_id, 0)["messages"]
+    assert [msg["message_id"] for msg in sent] == [m_id_2 + 1]
+
+    close_sqlite()
+    clear()
+
+
+def test_sqlite_standup(tmp_path):
+    """
+    Test 4 - Standups are loaded back with the messages sent to them, and
+    one that finished is not running again
+    """
+    path = str(tmp_path / "flockr.db")
+    open_sqlite(path)
+
+    user_a = auth_register("nbayoungboy@gmail.com", "youngboynba123", "Kentrell", "Gaulden")
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    c_id_2 = channels_create(user_a["token"], "the cage", True)["channel_id"]
+    standup_start(user_a["token"], c_id_2, 60)
+    standup_start(user_a["token"], c_id, 1)
+    standup_send(user_a["token"], c_id, "Throw it out the window")
+    standup_send(user_a["token"], c_id_2, "I like trains")
+
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+
+    sleep(1.5)
+    assert not standup_active(user_a["token"], c_id)["is_active"]
+    before = deepcopy(DATA)
+    restart(path)
+    assert DATA == before
+    assert len(channel_messages(user_a["token"], c_id, 0)["messages"]) == 1
+
+    close_sqlite()
+    clear()
@@ -4,16 +4,19 @@ standup functions and properties
 """
 
 
-from threading import Timer
-from data import DATA
 from auth import decode_token
+from data import DATA
 from find import find_uid_from_token, find_user_from_token
+from index import INDEX
+from locks import with_channel_lock
 from channel import check_valid_channel_id, check_user_in_channel
+from scheduler import schedule
+from store import add_standup_message
 from standup_helper import (
     find_standup,
     standup_running,
     standup_not_running,
-    standup_finish_switch,
+    standup_finish,
     standup_activate,
     standup_msg_long
 )
@@ -24,6 +27,7 @@ from standup_helper import (
 ########################################################################
 
 
+@with_channel_lock
 def standup_active(token, channel_id):
     """
     Takes in (token, channel_id)
@@ -45,22 +49,20 @@ def standup_active(token, channel_id):
     decoded_token = decode_token(token)
     find_user_from_token(decoded_token)
 
-    # Call function to set finished standups as not active
-    standup_finish_switch()
+    # Finish this channel's standup if it is due but the scheduler
+    # hasn't got to it yet
+    standup_finish(channel_id)
 
-    status = False
-    # Search through the data to check if the channel_id is in the standup data
-    for standup in DATA["standup"]:
-        if standup["channel_id"] == channel_id:
-            status = standup["is_active"]
-            finish = standup["time_finish"]
-            # Standup is found
-            return {"is_active": status, "time_finish": finish}
+    standup = INDEX["standups_by_channel"].get(channel_id)
+    if standup:
+        # Standup is found
+        return {"is_active": standup["is_active"], "time_finish": standup["time_finish"]}
 
     # No standup is found so status will be false and time finish will be none
-    return {"is_active": status, "time_finish": None}
+    return {"is_active": False, "time_finish": None}
 
 
+@with_channel_lock
 def standup_start(token, channel_id, length):
     """
     standup_start
@@ -94,16 +96,17 @@ def standup_start(token, channel_id, length):
     # Activate the standup
     standup_activate(u_id, channel_id, length)
 
-    # Use a timer
-    Timer(float(length), standup_finish_switch).start()
-
     standup = find_standup(channel_id)
     finish = standup["time_finish"]
 
+    # Have the scheduler finish the standup once it is due
+    arm_standup(standup)
+
     # Return the finish time
     return {"time_finish": finish}
 
 
+@with_channel_lock
 def standup_send(token, channel_id, message):
     """
     standup_send
@@ -142,8 +145,33 @@ def standup_send(token, channel_id, message):
     standup_msg_long(message)
 
     # Add message to the list
-    standup = find_standup(channel_id)
-    standup["messages"].append(message)
-    standup["sender"].append(user["handle_str"])
+    add_standup_message(channel_id, user["handle_str"], message)
 
     return {}
+
+
+########################################################################
+#                          Scheduling                                  #
+########################################################################
+
+
+def arm_standup(standup):
+    """
+    Has the scheduler finish a running standup once it is due
+    Parameters:
+        standup (dict): as stored in DATA["standup"]
+    Returns:
+        None
+    """
+    schedule(standup["time_finish"], standup_finish, [standup["channel_id"]])
+
+
+def resume_standups():
+    """
+    Arms every standup that was running, once DATA has been loaded and the
+    journal replayed, standups that came due while the server was down are
+    finished straight away
+    """
+    for standup in list(DATA["standup"]):
+        if standup["is_active"]:
+            arm_standup(standup)
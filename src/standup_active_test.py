@@ -15,11 +15,15 @@ Exceptions:
 """
 
 
+import threading
 from time import sleep
 import pytest
 from channels import channels_create
 from error import InputError, AccessError
-from standup import standup_active, standup_start
+from index import INDEX
+from scheduler import pending_jobs
+import standup
+from standup import standup_active, standup_start, standup_send
 from other import clear
 from data import DATA
 from conftest import user_a, user_b
@@ -157,3 +161,88 @@ def test_standup_active_invalid_token(user_a):
         standup_active(invalid_token, c_id_1)
 
     clear()
+
+
+def test_standup_active_finishes_on_time(user_a):
+    """
+    Test 7 - A standup finishes at its own finish time without being polled,
+    sending the messages sent during it
+    """
+    c_id_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    standup_start(user_a["token"], c_id_1, 1)
+    standup_send(user_a["token"], c_id_1, "Throw it out the window")
+
+    # Nothing polls the standup, the scheduler finishes it
+    sleep(1.5)
+    assert not INDEX["standups_by_channel"][c_id_1]["is_active"]
+    assert len(DATA["channels"][c_id_1 - 1]["messages"]) == 1
+
+    clear()
+
+
+def test_standup_active_by_channel(user_a, monkeypatch):
+    """
+    Test 8 - Polling a standup looks it up by its channel, never going
+    through every standup
+    """
+    c_ids = [channels_create(user_a["token"], f"channel {i}", True)["channel_id"] for i in range(5)]
+    for c_id in c_ids:
+        standup_start(user_a["token"], c_id, 200)
+
+    class Unscannable(list):
+        """
+        Standups that can't be gone through
+        """
+        def __iter__(self):
+            raise AssertionError("standups were scanned")
+
+    monkeypatch.setitem(DATA, "standup", Unscannable(DATA["standup"]))
+    for c_id in c_ids:
+        assert standup_active(user_a["token"], c_id)["is_active"]
+    monkeypatch.undo()
+
+    clear()
+
+
+def test_standup_active_other_channel(user_a, monkeypatch):
+    """
+    Test 9 - Polling one channel's standup doesn't finish another channel's
+    standup, even once it is overdue
+    """
+    c_id_1 = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    c_id_2 = channels_create(user_a["token"], "the cage", True)["channel_id"]
+
+    # Without the scheduler both standups are left to be finished by polls
+    monkeypatch.setattr(standup, "schedule", lambda time_due, function, args: None)
+    standup_start(user_a["token"], c_id_1, 1)
+    standup_start(user_a["token"], c_id_2, 1)
+    standup_send(user_a["token"], c_id_1, "Throw it out the window")
+
+    sleep(1.5)
+    assert not standup_active(user_a["token"], c_id_2)["is_active"]
+    assert INDEX["standups_by_channel"][c_id_1]["is_active"]
+    assert not DATA["channels"][c_id_1 - 1]["messages"]
+
+    assert not standup_active(user_a["token"], c_id_1)["is_active"]
+    assert len(DATA["channels"][c_id_1 - 1]["messages"]) == 1
+
+    clear()
+
+
+def test_standup_active_no_thread_each(user_a):
+    """
+    Test 10 - Many standups running at once share the scheduler's thread
+    rather than starting a thread each
+    """
+    c_ids = [channels_create(user_a["token"], f"channel {i}", True)["channel_id"] for i in range(50)]
+    standup_start(user_a["token"], c_ids[0], 200)
+    threads = threading.active_count()
+    jobs = pending_jobs()
+
+    for c_id in c_ids[1:]:
+        standup_start(user_a["token"], c_id, 200)
+
+    assert threading.active_count() == threads
+    assert pending_jobs() == jobs + len(c_ids) - 1
+
+    clear()
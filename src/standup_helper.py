@@ -4,10 +4,11 @@ helper functions for standup.py are sourced from here
 """
 
 from datetime import datetime, timedelta
-from auth import encode_token
-from data import DATA
 from error import InputError
-from message import message_send
+from index import INDEX
+from locks import lock_channel
+from message import new_message
+from store import allocate_message_id, start_standup, finish_standup
 
 
 def get_finish_time(length):
@@ -33,11 +34,7 @@ def find_standup(channel_id):
     Returns:
         standup (dict)
     """
-    for standup in DATA["standup"]:
-        if standup["channel_id"] == channel_id:
-            channel_standup = standup
-
-    return channel_standup
+    return INDEX["standups_by_channel"][channel_id]
 
 
 def standup_running(channel_id):
@@ -49,9 +46,9 @@ def standup_running(channel_id):
         Raises InputError if the standup is already running
         Otherwise, None
     """
-    for standup in DATA["standup"]:
-        if standup["channel_id"] == channel_id and standup["is_active"]:
-            raise InputError(description="Standup is already running")
+    standup = INDEX["standups_by_channel"].get(channel_id)
+    if standup and standup["is_active"]:
+        raise InputError(description="Standup is already running")
 
 
 def standup_not_running(channel_id):
@@ -63,50 +60,20 @@ def standup_not_running(channel_id):
         Raises InputError if the standup isn't running
         Otherwise, None
     """
-    active = False
-    for standup in DATA["standup"]:
-        if standup["channel_id"] == channel_id and  standup["is_active"]:
-            active = True
-
-    if not active:
+    standup = INDEX["standups_by_channel"].get(channel_id)
+    if not (standup and standup["is_active"]):
         raise InputError(description="Standup is not running")
 
 
-def make_standup(u_id, channel_id, length):
+def standup_package(standup):
     """
-    Function that makes a new standup for the given channel
-    and adds it to the data
-    Parameters:
-        u_id (int)
-        channel_id (int)
-        length (int)
-    Returns:
-        None
-    """
-    finish_time = get_finish_time(length)
-
-    # Make a new standup based on channel_id, u_id and the finish time
-    new_standup = {
-        "channel_id": channel_id,
-        "messages": [],
-        "sender": [],
-        "is_active": True,
-        "time_finish": finish_time,
-        "standup_user": u_id,
-    }
-
-    DATA["standup"].append(new_standup)
-
-
-def standup_append(standup):
-    """
-    Retrieves messages from a standup and sends them to the channel
+    Packages the messages sent during a standup into the one message
     Parameters:
         standup (dict)
     Returns:
-        None
+        message (dict): sent as the user who started the standup, who may
+            have logged out since
     """
-    # Standup send
     standup_msg = ""
     index = 0
     for message in standup["messages"]:
@@ -118,33 +85,33 @@ def standup_append(standup):
     # remove trailing newline
     standup_msg.rstrip()
 
-    token = encode_token(standup["standup_user"])
+    return new_message(standup["standup_user"], standup_msg, allocate_message_id())
 
-    # Sends the message
-    message_send(token, standup["channel_id"], standup_msg)
 
-
-def standup_finish_switch():
+def standup_finish(channel_id):
     """
-    Stops the standup and resets all standup information
-    This function could be called from server frequently (every second while it is running)
-    Once the time has passed / is finished it will call the append function to package the message
+    Stops a channel's standup once its finish time has passed and resets its
+    information, only ever touching that channel's standup
+    This is run by the scheduler when the standup is due to finish and also on
+    standup_active polls, whichever comes first packages and sends the messages
     Parameters:
-        None
+        channel_id (int)
     Returns:
         None
     """
     now = (datetime.now()).timestamp()
-    for standup in DATA["standup"]:
-        if (standup["time_finish"]) and (now > standup["time_finish"]):
-            # If there are messages call standup_append to package any messages and send them
-            if standup["messages"]:
-                standup_append(standup)
-            standup["messages"] = []
-            standup["sender"] = []
-            standup["time_finish"] = None
-            standup["standup_user"] = None
-            standup["is_active"] = False
+    # The channel's lock is held while the standup is checked and finished so
+    # the scheduler and a standup_active poll can't both send its messages
+    with lock_channel(channel_id):
+        standup = INDEX["standups_by_channel"].get(channel_id)
+        if not (standup and standup["time_finish"] and now >= standup["time_finish"]):
+            # No standup, or it was restarted and is not due yet
+            return
+
+        # If there are messages package them, finishing the standup sends
+        # the package as part of the same change
+        message = standup_package(standup) if standup["messages"] else None
+        finish_standup(channel_id, message)
 
 
 def standup_activate(u_id, channel_id, length):
@@ -158,17 +125,7 @@ def standup_activate(u_id, channel_id, length):
     Returns:
         None
     """
-    standup_found = False
-    finish_time = get_finish_time(length)
-    for standup in DATA["standup"]:
-        if standup["channel_id"] == channel_id:
-            standup_found = True
-            standup["time_finish"] = finish_time
-            standup["standup_user"] = u_id
-            standup["is_active"] = True
-
-    if not standup_found:
-        make_standup(u_id, channel_id, length)
+    start_standup(channel_id, u_id, get_finish_time(length))
 
 
 def standup_msg_long(message):
@@ -0,0 +1,527 @@
+"""
+store.py
+every lasting change to DATA is made through these functions so that
+it can be journaled, and replayed from the journal on startup
+
+Validation happens before these are called, they only apply a change
+to DATA and keep the indexes in step with it. New users, channels,
+messages and sessions are passed in as dicts, which is how they are journaled, and
+stored as records
+"""
+
+
+from data import DATA
+from index import (
+    INDEX,
+    index_user,
+    reindex_email,
+    reindex_handle,
+    index_message,
+    unindex_message,
+    reindex_message_text,
+    index_react,
+    unindex_react,
+    index_channel,
+    index_member,
+    unindex_member,
+    index_owner,
+    unindex_owner,
+    reindex_profile,
+    index_scheduled,
+    unindex_scheduled,
+    index_standup,
+    index_session,
+    unindex_session,
+    clear_index,
+)
+from journal import journaled
+from records import User, Channel, Message, Session
+from streams import end_streams, message_fields, publish
+
+
+# _________________________________Users_________________________________#
+
+
+@journaled("user")
+def add_user(user):
+    """
+    Adds a newly registered user
+    Parameters:
+        user (dict)
+    Returns:
+        None
+    """
+    user = User.from_dict(user)
+    DATA["users"].append(user)
+    index_user(user)
+
+
+@journaled("users")
+def add_users(users):
+    """
+    Adds a batch of imported users all at once, as one journal record so
+    either all of them or none of them are stored
+    Parameters:
+        users (list): of dicts, with consecutive u_ids
+    Returns:
+        None
+    """
+    for user in users:
+        user = User.from_dict(user)
+        DATA["users"].append(user)
+        index_user(user)
+
+
+@journaled("email")
+def set_email(u_id, email):
+    """
+    Parameters:
+        u_id (int)
+        email (str)
+    Returns:
+        None
+    """
+    user = INDEX["users_by_uid"][u_id]
+    old_email = user.email
+    user.email = email
+    reindex_email(user, old_email)
+
+
+@journaled("name")
+def set_name(u_id, name_first, name_last):
+    """
+    Parameters:
+        u_id (int)
+        name_first (str)
+        name_last (str)
+    Returns:
+        None
+    """
+    user = INDEX["users_by_uid"][u_id]
+    user.name_first = name_first
+    user.name_last = name_last
+    reindex_profile(u_id)
+
+
+@journaled("handle")
+def set_handle(u_id, handle_str):
+    """
+    Parameters:
+        u_id (int)
+        handle_str (str)
+    Returns:
+        None
+    """
+    user = INDEX["users_by_uid"][u_id]
+    old_handle = user.handle_str
+    user.handle_str = handle_str
+    reindex_handle(user, old_handle)
+
+
+@journaled("photo")
+def set_profile_img_url(u_id, profile_img_url):
+    """
+    Parameters:
+        u_id (int)
+        profile_img_url (str)
+    Returns:
+        None
+    """
+    INDEX["users_by_uid"][u_id].profile_img_url = profile_img_url
+    reindex_profile(u_id)
+
+
+@journaled("permission")
+def set_permission(u_id, permission_id):
+    """
+    Parameters:
+        u_id (int)
+        permission_id (int)
+    Returns:
+        None
+    """
+    INDEX["users_by_uid"][u_id].permission_id = permission_id
+
+
+@journaled("password")
+def set_password(u_id, password):
+    """
+    Sets the user's password hash
+    Parameters:
+        u_id (int)
+        password (str): already hashed
+    Returns:
+        None
+    """
+    INDEX["users_by_uid"][u_id].password = password
+
+
+@journaled("reset_code")
+def set_reset_code(u_id, reset_code):
+    """
+    Parameters:
+        u_id (int)
+        reset_code (str): None once it has been used
+    Returns:
+        None
+    """
+    INDEX["users_by_uid"][u_id].reset_code = reset_code
+
+
+# ________________________________Sessions_______________________________#
+
+
+@journaled("session")
+def add_session(session):
+    """
+    Logs a user in with a new session
+    Parameters:
+        session (dict)
+    Returns:
+        None
+    """
+    session = Session.from_dict(session)
+    DATA["sessions"][session.session_id] = session
+    index_session(session)
+
+
+@journaled("end_session")
+def remove_session(session_id):
+    """
+    Ends a session, logging it out. The sweeper may expire a session just
+    as it is logged out, so a session that has already ended is ignored
+    Parameters:
+        session_id (str)
+    Returns:
+        None
+    """
+    session = DATA["sessions"].pop(session_id, None)
+    if session is not None:
+        unindex_session(session)
+        end_streams(session.u_id, session_id)
+
+
+# ________________________________Channels_______________________________#
+
+
+@journaled("channel")
+def add_channel(channel):
+    """
+    Adds a newly created channel
+    Parameters:
+        channel (dict)
+    Returns:
+        None
+    """
+    channel = Channel.from_dict(channel)
+    DATA["channels"].append(channel)
+    index_channel(channel.channel_id)
+
+
+@journaled("join")
+def add_member(channel_id, u_id):
+    """
+    Parameters:
+        channel_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    DATA["channels"][channel_id - 1].all_members.append(u_id)
+    index_member(u_id, channel_id)
+
+
+@journaled("leave")
+def remove_member(channel_id, u_id):
+    """
+    Parameters:
+        channel_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    channel = DATA["channels"][channel_id - 1]
+    channel.all_members = [member for member in channel.all_members if member != u_id]
+    unindex_member(u_id, channel_id)
+
+
+@journaled("addowner")
+def add_owner(channel_id, u_id):
+    """
+    Parameters:
+        channel_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    DATA["channels"][channel_id - 1].owner_members.append(u_id)
+    index_owner(u_id, channel_id)
+
+
+@journaled("removeowner")
+def remove_owner(channel_id, u_id):
+    """
+    Parameters:
+        channel_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    channel = DATA["channels"][channel_id - 1]
+    channel.owner_members = [owner for owner in channel.owner_members if owner != u_id]
+    unindex_owner(u_id, channel_id)
+
+
+# ________________________________Messages_______________________________#
+
+
+@journaled("message_id")
+def allocate_message_id():
+    """
+    Hands out the next message_id
+    Returns:
+        m_id (int)
+    """
+    m_id = DATA["message_log"]["msg_counter"]
+    DATA["message_log"]["msg_counter"] += 1
+    return m_id
+
+
+@journaled("message")
+def add_message(message, channel_id):
+    """
+    Adds a sent message to the log, its channel and its sender
+    Parameters:
+        message (dict)
+        channel_id (int)
+    Returns:
+        None
+    """
+    append_message(message, channel_id)
+
+
+def append_message(message, channel_id):
+    """
+    Adds a message to the log, its channel and its sender, for add_message
+    and finish_standup
+    Parameters:
+        message (dict)
+        channel_id (int)
+    Returns:
+        None
+    """
+    message = Message.from_dict(message)
+    # Indexed first, so a reader that finds the message_id in a list
+    # can always look the message up
+    index_message(message, channel_id)
+    DATA["message_log"]["messages"].append(message)
+    DATA["channels"][channel_id - 1].messages.append(message.message_id)
+    DATA["users"][message.u_id - 1].user_message_id.append(message.message_id)
+    # A message sent later is no longer waiting once it is sent, in the
+    # same journal record so it can't be sent twice or lost
+    drop_scheduled(message.message_id)
+    publish(channel_id, "send", message_fields(message))
+
+
+@journaled("remove")
+def remove_message(m_id):
+    """
+    Removes a message from the log, its channel and its sender
+    Parameters:
+        m_id (int)
+    Returns:
+        None
+    """
+    message = INDEX["messages_by_id"][m_id]
+    c_id = INDEX["channel_by_message"][m_id]
+
+    # Each leaves a tombstone in its list rather than moving what follows
+    DATA["channels"][c_id - 1].messages.remove(m_id)
+    DATA["message_log"]["messages"].remove(message)
+    DATA["users"][message.u_id - 1].user_message_id.remove(m_id)
+    unindex_message(m_id)
+    publish(c_id, "remove", {"message_id": m_id})
+
+
+@journaled("edit")
+def edit_message(m_id, text):
+    """
+    Parameters:
+        m_id (int)
+        text (str)
+    Returns:
+        None
+    """
+    message = INDEX["messages_by_id"][m_id]
+    old_text = message.message
+    message.message = text
+    reindex_message_text(message, old_text)
+    publish(INDEX["channel_by_message"][m_id], "edit", {"message_id": m_id, "message": text})
+
+
+@journaled("react")
+def add_react(m_id, u_id):
+    """
+    Parameters:
+        m_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    message = INDEX["messages_by_id"][m_id]
+    message.react_u_ids = message.react_u_ids + (u_id,)
+    index_react(m_id, u_id)
+    publish(INDEX["channel_by_message"][m_id], "react", {"message_id": m_id, "u_id": u_id})
+
+
+@journaled("unreact")
+def remove_react(m_id, u_id):
+    """
+    Parameters:
+        m_id (int)
+        u_id (int)
+    Returns:
+        None
+    """
+    message = INDEX["messages_by_id"][m_id]
+    u_ids = list(message.react_u_ids)
+    u_ids.remove(u_id)
+    message.react_u_ids = tuple(u_ids)
+    unindex_react(m_id, u_id)
+    publish(INDEX["channel_by_message"][m_id], "unreact", {"message_id": m_id, "u_id": u_id})
+
+
+@journaled("pin")
+def set_pinned(m_id, is_pinned):
+    """
+    Parameters:
+        m_id (int)
+        is_pinned (bool)
+    Returns:
+        None
+    """
+    INDEX["messages_by_id"][m_id].is_pinned = is_pinned
+    publish(
+        INDEX["channel_by_message"][m_id], "pin", {"message_id": m_id, "is_pinned": is_pinned}
+    )
+
+
+@journaled("schedule")
+def add_scheduled(scheduled):
+    """
+    Adds a message to be sent later, the caller has it sent when it is due
+    Parameters:
+        scheduled (dict): message_id, u_id, channel_id, message and time_sent
+    Returns:
+        None
+    """
+    # job_id is the scheduler job that sends it, it only lives in memory
+    scheduled = dict(scheduled, job_id=None)
+    DATA["scheduled"][scheduled["message_id"]] = scheduled
+    index_scheduled(scheduled)
+
+
+@journaled("unschedule")
+def remove_scheduled(m_id):
+    """
+    Cancels a message that was to be sent later
+    Parameters:
+        m_id (int)
+    Returns:
+        None
+    """
+    drop_scheduled(m_id)
+
+
+def drop_scheduled(m_id):
+    """
+    Drops a message from those waiting to be sent later, if it is one
+    Parameters:
+        m_id (int)
+    Returns:
+        None
+    """
+    scheduled = DATA["scheduled"].pop(m_id, None)
+    if scheduled is not None:
+        unindex_scheduled(scheduled)
+
+
+# ________________________________Standups_______________________________#
+
+
+@journaled("standup")
+def start_standup(channel_id, u_id, time_finish):
+    """
+    Starts a channel's standup, reusing the one it had before if any
+    Parameters:
+        channel_id (int)
+        u_id (int): the user who started it, its messages are sent as them
+        time_finish (int)
+    Returns:
+        None
+    """
+    standup = INDEX["standups_by_channel"].get(channel_id)
+    if standup is None:
+        standup = {"channel_id": channel_id, "messages": [], "sender": []}
+        DATA["standup"].append(standup)
+        index_standup(standup)
+    standup["is_active"] = True
+    standup["time_finish"] = time_finish
+    standup["standup_user"] = u_id
+
+
+@journaled("standup_send")
+def add_standup_message(channel_id, handle_str, message):
+    """
+    Buffers a message in a channel's running standup
+    Parameters:
+        channel_id (int)
+        handle_str (str): of the user who sent it
+        message (str)
+    Returns:
+        None
+    """
+    standup = INDEX["standups_by_channel"][channel_id]
+    standup["messages"].append(message)
+    standup["sender"].append(handle_str)
+
+
+@journaled("standup_finish")
+def finish_standup(channel_id, message=None):
+    """
+    Stops a channel's standup and empties it, sending the message its
+    buffered messages were packaged into
+    Parameters:
+        channel_id (int)
+        message (dict): None if nothing was sent during the standup
+    Returns:
+        None
+    """
+    standup = INDEX["standups_by_channel"][channel_id]
+    standup["messages"] = []
+    standup["sender"] = []
+    standup["time_finish"] = None
+    standup["standup_user"] = None
+    standup["is_active"] = False
+    # Sent in the same journal record, so a crash can neither leave the
+    # standup running to be sent again nor finish it without its message
+    if message is not None:
+        append_message(message, channel_id)
+
+
+# _________________________________Clear_________________________________#
+
+
+@journaled("clear")
+def clear_data():
+    """
+    Empties DATA and every index
+    """
+    DATA["users"].clear()
+    DATA["channels"].clear()
+    DATA["message_log"]["messages"].clear()
+    DATA["message_log"]["msg_counter"] = 1
+    DATA["standup"].clear()
+    DATA["sessions"].clear()
+    DATA["scheduled"].clear()
+    clear_index()
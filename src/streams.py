@@ -0,0 +1,291 @@
+"""
+streams.py
+in-process pub/sub of channel activity, and a log of each channel's recent
+changes, for clients that would otherwise poll channel_messages to find
+out what changed
+
+A subscriber is one open stream, for one user, with its own bounded
+queue. store.py publishes each message change to the subscribers who
+are members of the message's channel at that moment, so joining or
+leaving a channel takes effect straight away. Publishing never blocks:
+a subscriber whose queue is full is marked overflowed, and its stream
+ends telling the client to fetch the channel again. A stream also ends
+as soon as the session it was opened with is logged out or expires.
+
+Every change also gets the channel's next sequence number and goes in the
+channel's change log, which keeps the latest log_size changes for clients
+that long-poll for the changes since the last sequence number they saw.
+Sequence numbers start from the time the server started, in microseconds,
+so they keep increasing across restarts. A client asking for changes the
+log no longer has, from before a restart say, is told to fetch the
+channel again.
+
+publish runs under the journal's lock and takes STREAMS["lock"] and the
+channel's change lock, both only ever held briefly with nothing taken
+under them.
+"""
+
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from itertools import islice
+from data import DATA
+from index import INDEX
+
+
+global STREAMS
+STREAMS = {
+    "lock": threading.Lock(),
+    # u_id -> that user's open subscribers
+    "subscribers": {},
+    # Events a subscriber can fall behind by before it is overflowed
+    "queue_size": 256,
+    # Seconds between keepalive comments on an idle stream
+    "heartbeat": 15,
+    "published": 0,
+    # channel_id -> seq, log and changed, the condition waiters wait on
+    "changes": {},
+    # Changes kept per channel, and the sequence number channels start from
+    "log_size": 1024,
+    "base": time.time_ns() // 1000,
+    # Longest a long-poll is held open, in seconds
+    "max_wait": 30,
+}
+
+
+# _______________________________Publishing______________________________#
+
+
+def publish(channel_id, event, fields):
+    """
+    Hands an event to every subscriber who is a member of the channel
+    Parameters:
+        channel_id (int)
+        event (str): "send", "edit", "remove", "react", "unreact" or "pin"
+        fields (dict): the event's data, channel_id is added to it
+    Returns:
+        None
+    """
+    log_change(channel_id, event, fields)
+
+    subscribers = STREAMS["subscribers"]
+    if not subscribers:
+        return
+
+    members = INDEX["members_by_channel"].get(channel_id, ())
+    # Serialised once, however many subscribers it goes to
+    data = None
+    with STREAMS["lock"]:
+        for u_id in members if len(members) < len(subscribers) else list(subscribers):
+            if u_id not in members:
+                continue
+            for subscriber in subscribers.get(u_id, ()):
+                if data is None:
+                    data = json.dumps(dict(fields, channel_id=channel_id))
+                try:
+                    subscriber["queue"].put_nowait((event, data))
+                except queue.Full:
+                    subscriber["overflowed"] = True
+        STREAMS["published"] += 1
+
+
+def channel_changes(channel_id):
+    """
+    Finds a channel's change log, starting it if the channel has none yet
+    Parameters:
+        channel_id (int)
+    Returns:
+        changes (dict): seq, log and changed
+    """
+    changes = STREAMS["changes"].get(channel_id)
+    if changes is None:
+        # setdefault is atomic, so racing threads end up with the same log
+        changes = STREAMS["changes"].setdefault(
+            channel_id,
+            {
+                "seq": STREAMS["base"],
+                "log": deque(maxlen=STREAMS["log_size"]),
+                "changed": threading.Condition(),
+            },
+        )
+    return changes
+
+
+def log_change(channel_id, event, fields):
+    """
+    Gives a change the channel's next sequence number, logs it and wakes
+    anyone waiting on the channel
+    """
+    changes = channel_changes(channel_id)
+    with changes["changed"]:
+        changes["seq"] += 1
+        changes["log"].append(dict(fields, seq=changes["seq"], event=event))
+        changes["changed"].notify_all()
+
+
+def changes_since(channel_id, seq, timeout):
+    """
+    Returns the channel's changes after seq, waiting up to timeout seconds
+    for one if there are none yet
+    Parameters:
+        channel_id (int)
+        seq (int): the last sequence number the client has seen
+        timeout (float): seconds, at most max_wait
+    Returns:
+        (dict): seq, the channel's latest sequence number, changes, each
+            with its seq and event, and reset, True if the changes since
+            seq are no longer all logged and the channel should be fetched again
+    """
+    changes = channel_changes(channel_id)
+    deadline = time.monotonic() + min(timeout, STREAMS["max_wait"])
+    with changes["changed"]:
+        while changes["seq"] == seq:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            changes["changed"].wait(remaining)
+
+        latest = changes["seq"]
+        log = changes["log"]
+        oldest = log[0]["seq"] if log else latest + 1
+        if seq > latest or seq < oldest - 1:
+            return {"seq": latest, "changes": [], "reset": True}
+        # Sequence numbers in the log are consecutive
+        return {
+            "seq": latest,
+            "changes": list(islice(log, seq - oldest + 1, None)),
+            "reset": False,
+        }
+
+
+def message_fields(message):
+    """
+    Returns:
+        (dict): a newly sent message as channel_messages returns it
+    """
+    return {
+        "message_id": message.message_id,
+        "u_id": message.u_id,
+        "message": message.message,
+        "time_created": message.time_created,
+        "reacts": [
+            {
+                "react_id": 1,
+                "u_ids": list(message.react_u_ids),
+                "is_this_user_reacted": False,
+            }
+        ],
+        "is_pinned": message.is_pinned,
+    }
+
+
+# ______________________________Subscribing______________________________#
+
+
+def subscribe(u_id, session_id):
+    """
+    Opens a subscriber for a user
+    Parameters:
+        u_id (int)
+        session_id (str): the session the stream is opened with
+    Returns:
+        subscriber (dict): u_id, session_id, queue, overflowed and ended
+    """
+    subscriber = {
+        "u_id": u_id,
+        "session_id": session_id,
+        "queue": queue.Queue(STREAMS["queue_size"]),
+        "overflowed": False,
+        "ended": False,
+    }
+    with STREAMS["lock"]:
+        STREAMS["subscribers"].setdefault(u_id, []).append(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber):
+    """
+    Closes a subscriber, it is sent nothing more
+    """
+    with STREAMS["lock"]:
+        subscribers = STREAMS["subscribers"]
+        user_subscribers = subscribers.get(subscriber["u_id"], [])
+        if subscriber in user_subscribers:
+            user_subscribers.remove(subscriber)
+        if not user_subscribers:
+            subscribers.pop(subscriber["u_id"], None)
+
+
+def event_stream(subscriber):
+    """
+    Yields a subscriber's events as Server-Sent Events, with a keepalive
+    comment whenever the stream has been idle for the heartbeat. Ends once
+    the subscriber overflows or its session ends, and closes the subscriber
+    Parameters:
+        subscriber (dict): as returned by subscribe
+    Returns:
+        generator of str
+    """
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event, data = subscriber["queue"].get(timeout=STREAMS["heartbeat"])
+            except queue.Empty:
+                event = None
+            # Checked before every event, not just when idle, so a busy
+            # channel can't keep a logged out session's stream going
+            if subscriber["ended"] or subscriber["session_id"] not in DATA["sessions"]:
+                return
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            if subscriber["overflowed"]:
+                yield "event: overflow\ndata: {}\n\n"
+                return
+            yield f"event: {event}\ndata: {data}\n\n"
+    finally:
+        unsubscribe(subscriber)
+
+
+def end_streams(u_id, session_id):
+    """
+    Ends the streams opened with a session, once it is logged out or
+    expires, waking any that are waiting for an event
+    Parameters:
+        u_id (int): the session's user
+        session_id (str)
+    Returns:
+        None
+    """
+    with STREAMS["lock"]:
+        for subscriber in STREAMS["subscribers"].get(u_id, ()):
+            if subscriber["session_id"] == session_id:
+                subscriber["ended"] = True
+                try:
+                    subscriber["queue"].put_nowait(("end", "{}"))
+                except queue.Full:
+                    # It is ended by the next event it takes off the queue
+                    pass
+
+
+def clear_streams():
+    """
+    Overflows every open subscriber, so their streams end, and drops the
+    change logs, called alongside clearing DATA
+    """
+    with STREAMS["lock"]:
+        for user_subscribers in STREAMS["subscribers"].values():
+            for subscriber in user_subscribers:
+                subscriber["overflowed"] = True
+                try:
+                    subscriber["queue"].put_nowait(("overflow", "{}"))
+                except queue.Full:
+                    pass
+        STREAMS["subscribers"].clear()
+    STREAMS["changes"].clear()
+    # Sequence numbers given out before aren't reused
+    STREAMS["base"] = time.time_ns() // 1000
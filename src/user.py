@@ -4,8 +4,6 @@ Displays profile, sets new names, emails
 and handles
 """
 
-import requests
-from PIL import Image
 from flask import request
 from auth import encode_token, decode_token
 from auth_helper import (
@@ -14,11 +12,15 @@ from auth_helper import (
     check_name,
     check_handle_unique,
     check_handle_valid,
-    check_valid_http_status,
-    check_if_jpeg,
-    check_img_dimension_valid,
+    check_crop_valid,
+    check_fetched_jpeg,
+    check_fetched_status,
+    decode_image,
+    fetch_image,
 )
 from find import find_user_from_token, find_user_from_uid
+from locks import with_users_lock
+from store import set_name, set_email, set_handle, set_profile_img_url
 
 
 ########################################################################
@@ -66,12 +68,12 @@ def user_profile_setname(token, name_first, name_last):
     check_name(name_last)
 
     user = find_user_from_token(decoded_token)
-    user["name_first"] = name_first
-    user["name_last"] = name_last
+    set_name(user["u_id"], name_first, name_last)
 
     return {}
 
 
+@with_users_lock
 def user_profile_setemail(token, email):
     """
     Changing email of user
@@ -86,11 +88,12 @@ def user_profile_setemail(token, email):
     check_email_unique(email)
 
     user = find_user_from_token(decoded_token)
-    user["email"] = email.lower()
+    set_email(user["u_id"], email.lower())
 
     return {}
 
 
+@with_users_lock
 def user_profile_sethandle(token, handle_str):
     """
     Changing handle of user
@@ -105,7 +108,7 @@ def user_profile_sethandle(token, handle_str):
     check_handle_unique(handle_str)
 
     user = find_user_from_token(decoded_token)
-    user["handle_str"] = handle_str
+    set_handle(user["u_id"], handle_str)
 
     return {}
 
@@ -124,23 +127,22 @@ def user_profile_uploadphoto(token, img_url, x_start, y_start, x_end, y_end):
         dict: (empty)
     """
     decoded_token = decode_token(token)
-    check_valid_http_status(img_url)
-    check_if_jpeg(img_url)
-    check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end)
+    user = find_user_from_token(decoded_token)
 
-    # Grab image from internet
-    payload = requests.get(img_url, stream=True)
-    payload.raw.decode_content = True
+    # Grab image from internet once, everything after works from its body
+    fetched = fetch_image(img_url)
+    check_fetched_status(fetched)
+    check_fetched_jpeg(fetched)
+    image = decode_image(fetched["body"])
+    check_crop_valid(image.size, x_start, y_start, x_end, y_end)
 
     # Crop and image if necessary
-    image = Image.open(payload.raw)
     crop_area = (x_start, y_start, x_end, y_end)
     image_cropped = image.crop(crop_area)
 
     # Save image and assign url
-    user = find_user_from_token(decoded_token)
-    filename = "src/static/" + encode_token(user["token"])[40:50] + str(user["u_id"]) + ".jpg"
+    filename = "src/static/" + encode_token(user["u_id"])[40:50] + str(user["u_id"]) + ".jpg"
     image_cropped.save(filename)
-    user["profile_img_url"] = request.host_url + filename
+    set_profile_img_url(user["u_id"], request.host_url + filename)
 
     return {}
@@ -14,7 +14,7 @@ Exceptions:
 
 
 import pytest
-from auth import auth_register
+from auth import auth_register, auth_login
 from user import user_profile, user_profile_setemail
 from error import InputError
 from other import clear
@@ -87,3 +87,20 @@ def test_user_profile_setemail_duplicate_email(user_a):
         user_profile_setemail(user_a["token"], "nbayoungboy@gmail.com")
 
     clear()
+
+
+def test_user_profile_setemail_login_new_email(user_a):
+    """
+    Test 7 - User can only log in with their new email after changing it
+    """
+    user_profile_setemail(user_a["token"], "nbayoungboynewmail@gmail.com")
+
+    assert auth_login("nbayoungboynewmail@gmail.com", "youngboynba123")["u_id"] == user_a["u_id"]
+
+    with pytest.raises(InputError, match=r"Email does not belong to a user"):
+        auth_login("nbayoungboy@gmail.com", "youngboynba123")
+
+    # Old email is free to be registered again
+    auth_register("nbayoungboy@gmail.com", "w89rfh@fk", "Jerry", "Chan")
+
+    clear()
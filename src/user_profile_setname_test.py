@@ -15,6 +15,8 @@ Exceptions:
 
 import pytest
 from auth import auth_register
+from channel import channel_details, channel_join
+from channels import channels_create
 from user import user_profile, user_profile_setname
 from error import InputError, AccessError
 from other import clear
@@ -132,3 +134,20 @@ def test_user_profile_setname_token():
         user_profile_setname("random", "Geoffery", "Smith")
 
     clear()
+
+
+def test_user_profile_setname_channel_details(user_a, user_b):
+    """
+    Test 9 - Channels show a member's new name once they have changed it
+    """
+    c_id = channels_create(user_a["token"], "billionaire records", True)["channel_id"]
+    channel_join(user_b["token"], c_id)
+    channel_details(user_a["token"], c_id)
+
+    user_profile_setname(user_a["token"], "Ken", "Gaulden")
+
+    details = channel_details(user_b["token"], c_id)
+    assert details["owner_members"][0]["name_first"] == "Ken"
+    assert [member["name_first"] for member in details["all_members"]] == ["Ken", "Jerry"]
+
+    clear()
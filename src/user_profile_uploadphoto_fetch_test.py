@@ -0,0 +1,110 @@
+"""
+user_profile_uploadphoto_fetch_test
+
+Testing that user_profile_uploadphoto fetches its image only once,
+against a local HTTP server standing in for the internet
+"""
+
+
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from flask import Flask
+from PIL import Image
+from auth_helper import IMAGE_FETCH
+from error import InputError
+from other import clear
+from user import user_profile, user_profile_uploadphoto
+from conftest import user_a
+
+
+@pytest.fixture
+def image_server():
+    """
+    Fixture that serves images from a local HTTP server and records the
+    path of every request made to it
+    """
+    photo = io.BytesIO()
+    Image.new("RGB", (64, 48), "red").save(photo, "JPEG")
+    routes = {
+        "/photo.jpg": (200, "image/jpeg", photo.getvalue()),
+        "/photo.png": (200, "image/png", b"not a jpeg"),
+        "/missing.jpg": (404, "text/html", b"not found"),
+        "/large.jpg": (200, "image/jpeg", bytes(64 * 1024)),
+    }
+    fetched = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            fetched.append(self.path)
+            status, content_type, body = routes[self.path]
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", fetched
+    server.shutdown()
+    server.server_close()
+
+
+def test_user_profile_uploadphoto_single_fetch(user_a, image_server, tmp_path, monkeypatch):
+    """
+    Test 1 - An upload fetches its image exactly once, and saves the crop
+    """
+    host, fetched = image_server
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src" / "static").mkdir(parents=True)
+
+    with Flask(__name__).test_request_context(base_url="http://localhost:5000/"):
+        user_profile_uploadphoto(user_a["token"], f"{host}/photo.jpg", 8, 8, 40, 32)
+    assert fetched == ["/photo.jpg"]
+
+    img_url = user_profile(user_a["token"], user_a["u_id"])["user"]["profile_img_url"]
+    assert img_url.startswith("http://localhost:5000/src/static/")
+    saved = Image.open(img_url[len("http://localhost:5000/"):])
+    assert saved.size == (32, 24)
+
+    clear()
+
+
+def test_user_profile_uploadphoto_single_fetch_errors(user_a, image_server):
+    """
+    Test 2 - InputError - Each rejected upload fetches its image once
+    """
+    host, fetched = image_server
+    errors = {
+        "/missing.jpg": r"Invalid HTTP status code",
+        "/photo.png": r"Image uploaded is not a JPG",
+        "/photo.jpg": r"Dimensions provided are invalid",
+    }
+    for path, error in errors.items():
+        with pytest.raises(InputError, match=error):
+            user_profile_uploadphoto(user_a["token"], f"{host}{path}", 0, 0, 65, 48)
+    assert fetched == list(errors)
+
+    clear()
+
+
+def test_user_profile_uploadphoto_too_large(user_a, image_server, monkeypatch):
+    """
+    Test 3 - InputError - Images larger than the cap aren't read
+    """
+    host, fetched = image_server
+    monkeypatch.setitem(IMAGE_FETCH, "max_bytes", 1024)
+
+    with pytest.raises(InputError, match=r"Image is too large"):
+        user_profile_uploadphoto(user_a["token"], f"{host}/large.jpg", 0, 0, 5, 5)
+    with pytest.raises(InputError, match=r"Image could not be fetched"):
+        user_profile_uploadphoto(user_a["token"], "not a url", 0, 0, 5, 5)
+    assert fetched == ["/large.jpg"]
+
+    clear()
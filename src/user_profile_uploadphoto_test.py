@@ -9,9 +9,11 @@ raise the correct errors
 import pytest
 from auth import auth_register
 from auth_helper import (
-    check_valid_http_status,
-    check_if_jpeg,
-    check_img_dimension_valid,
+    fetch_image,
+    decode_image,
+    check_fetched_status,
+    check_fetched_jpeg,
+    check_crop_valid,
 )
 from error import InputError
 from other import clear
@@ -28,9 +30,12 @@ def test_user_profile_uploadphoto_valid_dimension(user_a):
     x_end = 5
     y_end = 5
 
-    # Check that the image dimensions are valid and that the http status returns success
-    assert check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end) == True
-    assert check_valid_http_status(img_url) == True
+    # Fetch the image once, check the http status returns success and that
+    # the image dimensions are valid
+    fetched = fetch_image(img_url)
+    assert check_fetched_status(fetched) == True
+    size = decode_image(fetched["body"]).size
+    assert check_crop_valid(size, x_start, y_start, x_end, y_end) == True
 
     clear()
 
@@ -44,7 +49,7 @@ def test_user_profile_uploadphoto_invalid_status(user_a):
 
     # InputError - invalid status code
     with pytest.raises(InputError, match=r"Invalid HTTP status code"):
-        check_valid_http_status(img_url)
+        check_fetched_status(fetch_image(img_url))
 
     clear()
 
@@ -56,9 +61,10 @@ def test_user_profile_uploadphoto_valid_format(user_a):
     # Provide valid image in PNG format
     img_url = "https://personal.psu.edu/xqz5228/jpg.jpg"
         
-    # Check that the image dimensions are valid and that the http status returns success
-    assert check_if_jpeg(img_url) == True
-    assert check_valid_http_status(img_url) == True
+    # Check that the image is a jpeg and that the http status returns success
+    fetched = fetch_image(img_url)
+    assert check_fetched_jpeg(fetched) == True
+    assert check_fetched_status(fetched) == True
 
     clear()
 
@@ -71,7 +77,7 @@ def test_user_profile_uploadphoto_invalid_format(user_a):
     img_url = "https://www.freeiconspng.com/thumbs/profile-icon-png/profile-icon-9.png"
 
     with pytest.raises(InputError, match=r"Image uploaded is not a JPG"):
-        check_if_jpeg(img_url)
+        check_fetched_jpeg(fetch_image(img_url))
 
     clear()
 
@@ -86,8 +92,9 @@ def test_user_profile_uploadphoto_invalid_dimension_1(user_a):
     x_end = 5
     y_end = 5
 
+    size = decode_image(fetch_image(img_url)["body"]).size
     with pytest.raises(InputError, match=r"Dimensions provided are invalid"):
-        check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end)
+        check_crop_valid(size, x_start, y_start, x_end, y_end)
 
     clear()
 
@@ -102,8 +109,9 @@ def test_user_profile_uploadphoto_invalid_dimension_2(user_a):
     x_end = 5
     y_end = 5
 
+    size = decode_image(fetch_image(img_url)["body"]).size
     with pytest.raises(InputError, match=r"Dimensions provided are invalid"):
-        check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end)
+        check_crop_valid(size, x_start, y_start, x_end, y_end)
 
     clear()
 
@@ -118,8 +126,9 @@ def test_user_profile_uploadphoto_invalid_dimension_3(user_a):
     x_end = -696969
     y_end = 5
 
+    size = decode_image(fetch_image(img_url)["body"]).size
     with pytest.raises(InputError, match=r"Dimensions provided are invalid"):
-        check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end)
+        check_crop_valid(size, x_start, y_start, x_end, y_end)
 
     clear()
 
@@ -134,7 +143,8 @@ def test_user_profile_uploadphoto_invalid_dimension_4(user_a):
     x_end = 5
     y_end = -696969
 
+    size = decode_image(fetch_image(img_url)["body"]).size
     with pytest.raises(InputError, match=r"Dimensions provided are invalid"):
-        check_img_dimension_valid(img_url, x_start, y_start, x_end, y_end)
+        check_crop_valid(size, x_start, y_start, x_end, y_end)
 
     clear()